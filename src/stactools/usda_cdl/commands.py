@@ -1,14 +1,35 @@
 import logging
 import os
 import pathlib
-from typing import List
+from typing import List, Optional, Tuple
 
 import click
 from click import Command, Group, Path
 
-from stactools.usda_cdl import stac, tile
-from stactools.usda_cdl.download import download_zips
-from stactools.usda_cdl.tile import DEFAULT_WINDOW_SIZE
+from stactools.usda_cdl import (
+    export,
+    grid,
+    layout,
+    manifest,
+    pipeline,
+    stac,
+    tile,
+    validation,
+)
+from stactools.usda_cdl.concurrency import Engine
+from stactools.usda_cdl.constants import AssetType
+from stactools.usda_cdl.download import DEFAULT_DOWNLOAD_WORKERS, download_zips
+from stactools.usda_cdl.headers import HeaderCache
+from stactools.usda_cdl.profiling import Profile
+from stactools.usda_cdl.progress import ProgressBar
+from stactools.usda_cdl.tile import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_READ_AHEAD,
+    DEFAULT_WINDOW_SIZE,
+    ConstantTiles,
+    EmptyMask,
+    Schedule,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -28,22 +49,137 @@ def create_usda_cdl_command(cli: Group) -> Command:
         short_help="Creates a STAC collection",
     )
     @click.argument("OUTFILE")
-    def create_collection_command(outfile: str) -> None:
+    @click.option(
+        "--schema-cache",
+        help="Validate against the schemas in this cache file (see "
+        "cache-schemas), without fetching them",
+        type=Path(exists=True, dir_okay=False),
+        envvar="STACTOOLS_USDA_CDL_SCHEMA_CACHE",
+    )
+    @click.option(
+        "-i",
+        "--items",
+        "items_",
+        help="Add the items in this newline-delimited JSON file (e.g. from "
+        "create-items or process), can be given more than once",
+        type=Path(exists=True, dir_okay=False),
+        multiple=True,
+    )
+    @click.option(
+        "--layout",
+        "layout_",
+        help="How to arrange the items: all in the collection (flat) or in "
+        "sub-catalogs by item type, year and spatial bucket (hierarchical)",
+        type=click.Choice([layout_.value for layout_ in layout.Layout]),
+        default=layout.Layout.Flat.value,
+        show_default=True,
+    )
+    @click.option(
+        "--bucket-size",
+        help="Size, in meters, of the hierarchical layout's spatial buckets",
+        default=layout.DEFAULT_BUCKET_SIZE,
+        show_default=True,
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        help="Number of threads that write the collection's files",
+        default=layout.DEFAULT_SAVE_WORKERS,
+        show_default=True,
+    )
+    def create_collection_command(
+        outfile: str,
+        schema_cache: Optional[str],
+        items_: List[str],
+        layout_: str,
+        bucket_size: int,
+        workers: int,
+    ) -> None:
         """
-        Creates a STAC Collection.
+        Creates a STAC Collection, optionally with items.
 
         Args:
             outfile (str): The filename of the output collection.
         """
+        if schema_cache:
+            validation.use_schema_cache(pathlib.Path(schema_cache))
         collection = stac.create_collection()
         collection.set_self_href(outfile)
         collection.validate()
-        collection.save()
+        if not items_:
+            collection.save()
+            return
+        layout.add_items(
+            collection,
+            export.read_ndjson(pathlib.Path(infile) for infile in items_),
+            layout.Layout.from_str(layout_),
+            bucket_size,
+        )
+        hrefs = layout.save(
+            collection, catalog_type=collection.catalog_type, max_workers=workers
+        )
+        logger.info(f"Wrote {len(hrefs)} catalogs and items")
+
+    @usda_cdl.command(
+        "update-collection", short_help="Adds new items to a saved collection"
+    )
+    @click.argument("COLLECTION", type=Path(exists=True, dir_okay=False))
+    @click.argument("INFILES", nargs=-1, required=True, type=Path(exists=True))
+    @click.option(
+        "--replace",
+        help="Rewrite items that are already in the collection",
+        is_flag=True,
+    )
+    def update_collection_command(
+        collection: str, infiles: List[str], replace: bool
+    ) -> None:
+        """
+        Adds the items in newline-delimited JSON files (e.g. from create-items
+        or process) to a saved collection, extending its extent and
+        summaries. Items go into the collection's sub-catalogs if it has
+        them (see create-collection --layout). Only the new items' files, the
+        sub-catalogs they're added to and the collection file are written.
+
+        Args:
+            collection (str): The collection file.
+            infiles (str): The items, one per line.
+        """
+        written = stac.update_collection(
+            collection,
+            export.read_ndjson(pathlib.Path(infile) for infile in infiles),
+            replace,
+        )
+        logger.info(f"Wrote {max(len(written) - 1, 0)} items and the collection")
 
     @usda_cdl.command("create-item", short_help="Creates a STAC item")
     @click.argument("HREFS", nargs=-1)
     @click.argument("OUTFILE", nargs=1)
-    def create_item_command(hrefs: List[str], outfile: str) -> None:
+    @click.option(
+        "--fast",
+        help="Compute tiles' geometry and projection from their names, "
+        "without opening them",
+        is_flag=True,
+    )
+    @click.option(
+        "--header-cache",
+        help="An SQLite file in which to cache the COGs' headers, "
+        "so unchanged COGs aren't opened again",
+        type=Path(dir_okay=False),
+    )
+    @click.option(
+        "--schema-cache",
+        help="Validate against the schemas in this cache file (see "
+        "cache-schemas), without fetching them",
+        type=Path(exists=True, dir_okay=False),
+        envvar="STACTOOLS_USDA_CDL_SCHEMA_CACHE",
+    )
+    def create_item_command(
+        hrefs: List[str],
+        outfile: str,
+        fast: bool,
+        header_cache: Optional[str],
+        schema_cache: Optional[str],
+    ) -> None:
         """
         Creates a STAC Item from the provided hrefs.
 
@@ -54,15 +190,402 @@ def create_usda_cdl_command(cli: Group) -> Command:
             hrefs (str): HREFs to COGs.
             outfile (str): The output file.
         """
-        item = stac.create_item_from_hrefs(hrefs)
+        if schema_cache:
+            validation.use_schema_cache(pathlib.Path(schema_cache))
+        if header_cache:
+            with HeaderCache(pathlib.Path(header_cache)) as cache:
+                item = stac.create_item_from_hrefs(hrefs, fast=fast, cache=cache)
+            stats = cache.stats
+            logger.info(
+                f"Header cache: {stats.hits} hits, {stats.misses} misses "
+                f"({stats.hit_rate:.0%} hit rate)"
+            )
+        else:
+            item = stac.create_item_from_hrefs(hrefs, fast=fast)
         item.set_self_href(outfile)
         item.make_asset_hrefs_relative()
         item.validate()
         item.save_object(include_self_link=False)
 
+    @usda_cdl.command(
+        "create-items", short_help="Creates STAC items from tiles, in bulk"
+    )
+    @click.argument("SOURCES", nargs=-1)
+    @click.argument("OUTFILE", nargs=1)
+    @click.option(
+        "--tile-list",
+        help="A file listing tile hrefs, one per line, to add to the sources",
+        type=Path(exists=True, dir_okay=False),
+    )
+    @click.option(
+        "-f",
+        "--format",
+        "format_",
+        help="Output format [default: geoparquet for .parquet and .geoparquet "
+        "files, otherwise ndjson]",
+        type=click.Choice([format_.value for format_ in export.Format]),
+    )
+    @click.option(
+        "--batch-size",
+        help="Number of items written at a time",
+        default=export.DEFAULT_BATCH_SIZE,
+        show_default=True,
+    )
+    @click.option(
+        "--fast",
+        help="Compute tiles' geometry and projection from their names, "
+        "without opening them",
+        is_flag=True,
+    )
+    @click.option(
+        "--verify",
+        help="With --fast, open this many tiles, picked at random, to check "
+        "them against their names",
+        default=0,
+        show_default=True,
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        help="Number of item creation workers",
+        default=1,
+        show_default=True,
+    )
+    @click.option(
+        "--engine",
+        help="Create items in threads or processes",
+        type=click.Choice([engine.value for engine in Engine]),
+        default=Engine.Thread.value,
+        show_default=True,
+    )
+    @click.option(
+        "--header-cache",
+        help="An SQLite file in which to cache the tiles' headers, "
+        "so unchanged tiles aren't opened again",
+        type=Path(dir_okay=False),
+    )
+    def create_items_command(
+        sources: List[str],
+        outfile: str,
+        tile_list: Optional[str],
+        format_: Optional[str],
+        batch_size: int,
+        fast: bool,
+        verify: int,
+        workers: int,
+        engine: str,
+        header_cache: Optional[str],
+    ) -> None:
+        """
+        Creates STAC Items from tiles, streaming them to a newline-delimited
+        JSON or stac-geoparquet file for bulk loading.
+
+        Items aren't validated. Writing geoparquet requires the optional
+        stac-geoparquet dependency.
+
+        Args:
+            sources (str): Tile files, directories of tiles, or glob patterns.
+            outfile (str): The output file.
+        """
+        tiles = export.find_tiles(sources)
+        if tile_list:
+            tiles.extend(export.read_tile_list(pathlib.Path(tile_list)))
+        if not tiles:
+            raise click.UsageError("No tiles found")
+        cache = HeaderCache(pathlib.Path(header_cache)) if header_cache else None
+        try:
+            items = stac.iter_items_from_tiles(
+                tiles,
+                fast=fast,
+                verify=verify,
+                max_workers=workers,
+                engine=Engine.from_str(engine),
+                cache=cache,
+            )
+            count = export.write_items(
+                items,
+                pathlib.Path(outfile),
+                export.Format.from_str(format_) if format_ else None,
+                batch_size,
+            )
+        finally:
+            if cache:
+                cache.close()
+        logger.info(f"Wrote {count} items from {len(tiles)} tiles to {outfile}")
+
+    @usda_cdl.command(
+        "cache-schemas", short_help="Cache the JSON schemas used for validation"
+    )
+    @click.argument("OUTFILE")
+    def cache_schemas_command(outfile: str) -> None:
+        """
+        Fetches the JSON schemas that this package's items and collection are
+        validated against (and the schemas they reference) into a file, so
+        that validation can be done offline with --schema-cache.
+
+        Args:
+            outfile (str): The schema cache file.
+        """
+        uris = validation.cache_schemas(pathlib.Path(outfile))
+        logger.info(f"Cached {len(uris)} schemas in {outfile}")
+
+    @usda_cdl.command(
+        "validate-items", short_help="Validate newline-delimited JSON items"
+    )
+    @click.argument("INFILE", type=Path(exists=True, dir_okay=False))
+    @click.option(
+        "--schema-cache",
+        help="Validate against the schemas in this cache file (see "
+        "cache-schemas), without fetching them",
+        type=Path(exists=True, dir_okay=False),
+        envvar="STACTOOLS_USDA_CDL_SCHEMA_CACHE",
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        help="Number of validation processes",
+        default=1,
+        show_default=True,
+    )
+    @click.option(
+        "--batch-size",
+        help="Number of items each process validates at a time",
+        default=validation.DEFAULT_BATCH_SIZE,
+        show_default=True,
+    )
+    def validate_items_command(
+        infile: str, schema_cache: Optional[str], workers: int, batch_size: int
+    ) -> None:
+        """
+        Validates every item in a newline-delimited JSON file (e.g. from
+        create-items), and reports the failures, counted by schema and error.
+
+        Args:
+            infile (str): The items, one per line.
+        """
+        report = validation.validate_ndjson(
+            pathlib.Path(infile),
+            pathlib.Path(schema_cache) if schema_cache else None,
+            workers,
+            batch_size,
+        )
+        if report.ok:
+            click.echo(f"All {report.count} items are valid")
+            return
+        click.echo(f"{len(report.failures)} of {report.count} items are invalid:")
+        for schema_uri, path, keyword, count in report.summary():
+            click.echo(f"  {count} x {keyword} at {path} ({schema_uri})")
+        for failure in report.failures[:10]:
+            click.echo(failure.message, err=True)
+        raise click.ClickException("Validation failed")
+
     @usda_cdl.command("tile", short_help="Tile a geotiff (zipped or not zipped)")
     @click.argument("infile")
     @click.argument("destination")
+    @click.option(
+        "-s",
+        "--size",
+        help="Size, in pixels, of each tile. Give more than once to tile at "
+        "several nested sizes from one read of the source",
+        default=[DEFAULT_WINDOW_SIZE],
+        multiple=True,
+        show_default=True,
+    )
+    @click.option(
+        "-e",
+        "--engine",
+        help="Run the tiling workers as threads or as processes " "[default: thread]",
+        type=click.Choice([engine.value for engine in Engine]),
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        help="Number of tiling workers",
+        default=DEFAULT_MAX_WORKERS,
+        show_default=True,
+    )
+    @click.option(
+        "--schedule",
+        help="Read each window separately, or each strip of windows at once "
+        "[default: window, or strip with several sizes]",
+        type=click.Choice([schedule.value for schedule in Schedule]),
+    )
+    @click.option(
+        "--read-ahead",
+        help="Number of strips to read ahead with the strip schedule",
+        default=DEFAULT_READ_AHEAD,
+        show_default=True,
+    )
+    @click.option(
+        "--max-in-flight",
+        help="Maximum number of tiles (or process chunks) queued at once "
+        "[default: twice the number of workers]",
+        type=int,
+    )
+    @click.option(
+        "--resume/--no-resume",
+        help="Skip tiles and empty windows recorded in the destination's manifest",
+        default=True,
+        show_default=True,
+    )
+    @click.option(
+        "--shard-index",
+        help="Which shard of the windows to tile, from 0 to shard-count - 1",
+        default=0,
+        show_default=True,
+    )
+    @click.option(
+        "--shard-count",
+        help="Number of shards the windows are split into",
+        default=1,
+        show_default=True,
+    )
+    @click.option(
+        "--stage/--no-stage",
+        help="Extract a zipped geotiff before tiling it "
+        "[default: only if it is large]",
+        default=None,
+    )
+    @click.option(
+        "--scratch-dir",
+        help="Directory to extract zipped geotiffs into "
+        "[default: the system temporary directory]",
+    )
+    @click.option(
+        "--keep-staged",
+        help="Keep (and reuse) the extracted geotiff",
+        is_flag=True,
+    )
+    @click.option(
+        "--constant-tiles",
+        help="Write tiles holding a single value like any other, with a cheaper "
+        "encoding, or not at all (recording their value in the manifest)",
+        type=click.Choice([constant_tiles.value for constant_tiles in ConstantTiles]),
+        default=ConstantTiles.Encode.value,
+        show_default=True,
+    )
+    @click.option(
+        "--histograms/--no-histograms",
+        help="Write each tile's per-value pixel counts to a sidecar, for its item",
+        default=True,
+        show_default=True,
+    )
+    @click.option(
+        "--profile",
+        "profile_path",
+        help="Write per-stage timings (p50/p95/max) and throughput to this JSON file",
+    )
+    def tile_file(
+        infile: Path,
+        destination: Path,
+        size: Tuple[int, ...],
+        engine: Optional[str],
+        workers: int,
+        schedule: Optional[str],
+        read_ahead: int,
+        max_in_flight: Optional[int],
+        resume: bool,
+        shard_index: int,
+        shard_count: int,
+        stage: Optional[bool],
+        scratch_dir: Optional[str],
+        keep_staged: bool,
+        constant_tiles: str,
+        histograms: bool,
+        profile_path: Optional[str],
+    ) -> None:
+        """Tiles the input file, placing the tiles in the destination directory.
+
+        Windows outside the source, or over TIFF blocks that were never
+        written (sparse files only), are skipped without being read. The
+        published CDL GeoTIFFs are fully written, so for them every window
+        inside the source is read, and empty ones are skipped afterwards.
+
+        With several sizes, the strip schedule and thread engine are always
+        used, and sharding isn't available."""
+        if len(size) > 1:
+            if shard_count != 1:
+                raise click.UsageError("Can't shard when tiling at several sizes")
+            if engine not in (None, Engine.Thread.value):
+                raise click.UsageError(
+                    "Several sizes can only be tiled with the thread engine"
+                )
+            if schedule not in (None, Schedule.Strip.value):
+                raise click.UsageError(
+                    "Several sizes can only be tiled with the strip schedule"
+                )
+        os.makedirs(str(destination), exist_ok=True)
+        infile_as_path = pathlib.Path(str(infile))
+        profile = Profile() if profile_path else None
+        with ProgressBar() as progress:
+            if len(size) > 1:
+                tile.tile_pyramid(
+                    infile_as_path,
+                    pathlib.Path(str(destination)),
+                    list(size),
+                    max_workers=workers,
+                    read_ahead=read_ahead,
+                    max_in_flight=max_in_flight,
+                    resume=resume,
+                    stage=stage,
+                    scratch_directory=(
+                        pathlib.Path(scratch_dir) if scratch_dir else None
+                    ),
+                    keep_staged=keep_staged,
+                    constant_tiles=ConstantTiles.from_str(constant_tiles),
+                    histograms=histograms,
+                    profile=profile,
+                    progress=progress,
+                )
+            elif infile_as_path.suffix == ".zip":
+                tile.tile_zipfile(
+                    infile_as_path,
+                    pathlib.Path(str(destination)),
+                    size[0],
+                    max_workers=workers,
+                    engine=Engine.from_str(engine or Engine.Thread.value),
+                    schedule=Schedule.from_str(schedule or Schedule.Window.value),
+                    read_ahead=read_ahead,
+                    max_in_flight=max_in_flight,
+                    resume=resume,
+                    shard_index=shard_index,
+                    shard_count=shard_count,
+                    stage=stage,
+                    scratch_directory=(
+                        pathlib.Path(scratch_dir) if scratch_dir else None
+                    ),
+                    keep_staged=keep_staged,
+                    constant_tiles=ConstantTiles.from_str(constant_tiles),
+                    histograms=histograms,
+                    profile=profile,
+                    progress=progress,
+                )
+            else:
+                tile.tile_geotiff(
+                    infile_as_path,
+                    pathlib.Path(str(destination)),
+                    size[0],
+                    max_workers=workers,
+                    engine=Engine.from_str(engine or Engine.Thread.value),
+                    schedule=Schedule.from_str(schedule or Schedule.Window.value),
+                    read_ahead=read_ahead,
+                    max_in_flight=max_in_flight,
+                    resume=resume,
+                    shard_index=shard_index,
+                    shard_count=shard_count,
+                    constant_tiles=ConstantTiles.from_str(constant_tiles),
+                    histograms=histograms,
+                    profile=profile,
+                    progress=progress,
+                )
+        if profile and profile_path:
+            profile.save(pathlib.Path(profile_path))
+
+    @usda_cdl.command(
+        "tile-many", short_help="Tile several aligned geotiffs in a single pass"
+    )
+    @click.argument("infiles", nargs=-1, required=True)
+    @click.argument("destination", nargs=1)
     @click.option(
         "-s",
         "--size",
@@ -70,25 +593,291 @@ def create_usda_cdl_command(cli: Group) -> Command:
         default=DEFAULT_WINDOW_SIZE,
         show_default=True,
     )
-    def tile_file(infile: Path, destination: Path, size: int) -> None:
-        """Tiles the input file, placing the tiles in the destination directory."""
+    @click.option(
+        "-w",
+        "--workers",
+        help="Number of tiling workers",
+        default=DEFAULT_MAX_WORKERS,
+        show_default=True,
+    )
+    @click.option(
+        "--max-in-flight",
+        help="Maximum number of windows queued at once "
+        "[default: twice the number of workers]",
+        type=int,
+    )
+    @click.option(
+        "--empty-mask",
+        help="Skip windows where the reference (cropland) layer is empty, or "
+        "only where every layer is empty",
+        type=click.Choice([empty_mask.value for empty_mask in EmptyMask]),
+        default=EmptyMask.Reference.value,
+        show_default=True,
+    )
+    @click.option(
+        "--shard-index",
+        help="Which shard of the windows to tile, from 0 to shard-count - 1",
+        default=0,
+        show_default=True,
+    )
+    @click.option(
+        "--shard-count",
+        help="Number of shards the windows are split into",
+        default=1,
+        show_default=True,
+    )
+    @click.option(
+        "--constant-tiles",
+        help="Write tiles holding a single value like any other, or with a "
+        "cheaper encoding",
+        type=click.Choice([ConstantTiles.Encode.value, ConstantTiles.Fast.value]),
+        default=ConstantTiles.Encode.value,
+        show_default=True,
+    )
+    @click.option(
+        "--histograms/--no-histograms",
+        help="Write each tile's per-value pixel counts to a sidecar, for its item",
+        default=True,
+        show_default=True,
+    )
+    @click.option(
+        "--profile",
+        "profile_path",
+        help="Write per-stage timings (p50/p95/max) and throughput to this JSON file",
+    )
+    def tile_many_files(
+        infiles: List[Path],
+        destination: Path,
+        size: int,
+        workers: int,
+        max_in_flight: Optional[int],
+        empty_mask: str,
+        shard_index: int,
+        shard_count: int,
+        constant_tiles: str,
+        histograms: bool,
+        profile_path: Optional[str],
+    ) -> None:
+        """Tiles the input files (zipped or not), which must be aligned layers for
+        the same year, placing the tiles in the destination directory."""
         os.makedirs(str(destination), exist_ok=True)
-        infile_as_path = pathlib.Path(str(infile))
-        if infile_as_path.suffix == ".zip":
-            tile.tile_zipfile(infile_as_path, pathlib.Path(str(destination)), size)
-        else:
-            tile.tile_geotiff(infile_as_path, pathlib.Path(str(destination)), size)
+        profile = Profile() if profile_path else None
+        with ProgressBar() as progress:
+            tile.tile_many(
+                [pathlib.Path(str(infile)) for infile in infiles],
+                pathlib.Path(str(destination)),
+                size,
+                max_workers=workers,
+                max_in_flight=max_in_flight,
+                empty_mask=EmptyMask.from_str(empty_mask),
+                shard_index=shard_index,
+                shard_count=shard_count,
+                constant_tiles=ConstantTiles.from_str(constant_tiles),
+                histograms=histograms,
+                profile=profile,
+                progress=progress,
+            )
+        if profile and profile_path:
+            profile.save(pathlib.Path(profile_path))
+
+    @usda_cdl.command(
+        "merge-manifests", short_help="Merge the tiling manifests of all shards"
+    )
+    @click.argument("INFILES", nargs=-1, required=True, type=click.Path(exists=True))
+    @click.argument("OUTFILE", nargs=1)
+    def merge_manifests(infiles: List[str], outfile: str) -> None:
+        """Merges the tiling manifests written by every shard of a sharded
+        tiling run into one manifest.
+
+        This will error if a shard's manifest is missing or repeated, or if a
+        window is missing from, or duplicated across, the shards.
+
+        Args:
+            infiles (str): The shards' manifests.
+            outfile (str): The merged manifest.
+        """
+        merged = manifest.merge(
+            [manifest.Manifest.load(pathlib.Path(infile)) for infile in infiles],
+            pathlib.Path(outfile),
+        )
+        merged.save()
+
+    @usda_cdl.command(
+        "index-tiles", short_help="Index which tiles exist in a tile directory"
+    )
+    @click.argument("DIRECTORY", type=Path(exists=True, file_okay=False))
+    def index_tiles_command(directory: str) -> None:
+        """Writes a compact index of the tiles of every (merged) tiling manifest
+        in a directory, one per source file and tile size, for tiles-for-bbox.
+
+        Indexes are also built on demand, so this is only needed to build
+        them ahead of time, e.g. before uploading the tiles.
+
+        Args:
+            directory (str): The directory of tiles and their manifests.
+        """
+        for path in grid.index_directory(pathlib.Path(directory)):
+            logger.info(f"Wrote {path}")
+
+    @usda_cdl.command(
+        "tiles-for-bbox", short_help="List the tiles that cover a bounding box"
+    )
+    @click.option(
+        "-b",
+        "--bbox",
+        help="The bounding box: left, bottom, right and top",
+        type=float,
+        nargs=4,
+        required=True,
+    )
+    @click.option("-y", "--year", help="The year of the tiles", type=int, required=True)
+    @click.option(
+        "-a",
+        "--asset-type",
+        help="The asset type of the tiles",
+        type=click.Choice([asset_type.value for asset_type in AssetType]),
+        default=AssetType.Cropland.value,
+        show_default=True,
+    )
+    @click.option(
+        "-s",
+        "--size",
+        help="The size of the tiles, in pixels",
+        default=DEFAULT_WINDOW_SIZE,
+        show_default=True,
+    )
+    @click.option(
+        "--crs",
+        help="The CRS of the bounding box, e.g. EPSG:4326 for lon/lat "
+        "[default: the tiles' CRS, EPSG:5070]",
+    )
+    @click.option(
+        "-d",
+        "--directory",
+        help="Only list tiles that exist in this directory (per its tile index)",
+        type=Path(exists=True, file_okay=False),
+    )
+    def tiles_for_bbox_command(
+        bbox: Tuple[float, float, float, float],
+        year: int,
+        asset_type: str,
+        size: int,
+        crs: Optional[str],
+        directory: Optional[str],
+    ) -> None:
+        """Prints the tiles that cover a bounding box, one per line, computed
+        from the tile grid rather than by listing tiles.
+
+        Without a directory, every tile of the CONUS grid is assumed to exist.
+        """
+        for href in grid.tiles_for_bbox(
+            bbox,
+            year,
+            AssetType.from_str(asset_type),
+            size,
+            crs,
+            pathlib.Path(directory) if directory else None,
+        ):
+            click.echo(href)
+
+    @usda_cdl.command(
+        "process", short_help="Download, tile and create items, as a pipeline"
+    )
+    @click.argument("years", nargs=-1, type=int)
+    @click.argument("destination", nargs=1)
+    @click.option(
+        "-s",
+        "--size",
+        help="Size, in pixels, of each tile",
+        default=DEFAULT_WINDOW_SIZE,
+        show_default=True,
+    )
+    @click.option(
+        "--download-workers",
+        help="Number of files downloaded at once",
+        default=DEFAULT_DOWNLOAD_WORKERS,
+        show_default=True,
+    )
+    @click.option(
+        "--tile-jobs",
+        help="Number of zipfiles tiled at once",
+        default=1,
+        show_default=True,
+    )
+    @click.option(
+        "--tile-workers",
+        help="Number of tiling workers for each zipfile",
+        default=DEFAULT_MAX_WORKERS,
+        show_default=True,
+    )
+    @click.option(
+        "--item-workers",
+        help="Number of item creation workers",
+        default=1,
+        show_default=True,
+    )
+    @click.option(
+        "--fast/--no-fast",
+        help="Compute tiles' geometry and projection from their names, "
+        "without opening them",
+        default=True,
+        show_default=True,
+    )
+    def process(
+        years: List[int],
+        destination: Path,
+        size: int,
+        download_workers: int,
+        tile_jobs: int,
+        tile_workers: int,
+        item_workers: int,
+        fast: bool,
+    ) -> None:
+        """Downloads the USDA CDL zip files for some years (by default, all of
+        them), tiles them and writes their items, one newline-delimited JSON
+        file per year, into the destination directory.
+
+        Each zip file is tiled as soon as it's downloaded, and the items of
+        each item type are appended to the year's file as soon as the zip
+        files that hold it are tiled. Run the command again to pick up where
+        an interrupted run left off.
+        """
+        with ProgressBar() as progress:
+            paths = pipeline.process(
+                years,
+                pathlib.Path(str(destination)),
+                size,
+                download_workers=download_workers,
+                tile_jobs=tile_jobs,
+                tile_workers=tile_workers,
+                item_workers=item_workers,
+                fast=fast,
+                progress=progress,
+            )
+        for path in paths:
+            logger.info(f"Items: {path}")
 
     @usda_cdl.command("download", short_help="Download zipped source GeoTIFFs")
     @click.argument("years", nargs=-1, type=int)
     @click.argument("destination", nargs=1)
-    def download(years: List[int], destination: Path) -> None:
+    @click.option(
+        "-w",
+        "--workers",
+        help="Number of files downloaded at once",
+        default=DEFAULT_DOWNLOAD_WORKERS,
+        show_default=True,
+    )
+    def download(years: List[int], destination: Path, workers: int) -> None:
         """Downloads the USDA CDL zip files to the destination directory. It's a
         lot of data, so this will take a while.
 
         If you just want to download specific years' data, provide those years
-        on the command line before the destination directory.
+        on the command line before the destination directory. Interrupted
+        downloads are resumed when the command is run again.
         """
-        download_zips(years, pathlib.Path(str(destination)))
+        with ProgressBar() as progress:
+            download_zips(
+                years, pathlib.Path(str(destination)), progress, max_workers=workers
+            )
 
     return usda_cdl
@@ -0,0 +1,82 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Callable, Deque, Iterable, Iterator, Optional, Set, TypeVar
+
+from .constants import StrEnum
+
+IN_FLIGHT_PER_WORKER = 2
+
+R = TypeVar("R")
+
+
+class Engine(StrEnum):
+    """How work is spread across cores.
+
+    The thread engine shares one process, giving each thread its own dataset
+    handle. The process engine sidesteps the GIL by giving each worker process
+    its own handle and a slice of the work.
+    """
+
+    Thread = "thread"
+    Process = "process"
+
+
+def bounded_map(
+    executor: Executor,
+    fn: Callable[[Any], R],
+    items: Iterable[Any],
+    max_in_flight: int,
+    on_submit: Optional[Callable[[Any], None]] = None,
+    ordered: bool = False,
+) -> Iterator[R]:
+    """Maps fn over items using executor, yielding results as they complete.
+
+    Unlike ``Executor.map``, items are submitted lazily with at most
+    max_in_flight of them pending at once, so neither the pending futures nor
+    any data the items hold (e.g. strips) pile up when the workers fall behind.
+    If given, on_submit is called with each item as it's submitted. If ordered
+    is True, results are yielded in the items' order instead, waiting on the
+    oldest pending item whenever the limit is reached.
+    """
+    if ordered:
+        yield from _ordered_map(executor, fn, items, max_in_flight, on_submit)
+        return
+    pending: Set["Future[R]"] = set()
+    try:
+        for item in items:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(fn, item))
+            if on_submit:
+                on_submit(item)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _ordered_map(
+    executor: Executor,
+    fn: Callable[[Any], R],
+    items: Iterable[Any],
+    max_in_flight: int,
+    on_submit: Optional[Callable[[Any], None]] = None,
+) -> Iterator[R]:
+    pending: Deque["Future[R]"] = deque()
+    try:
+        for item in items:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(fn, item))
+            if on_submit:
+                on_submit(item)
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -331,3 +331,7 @@ MOST_RECENT_YEAR = 2022
 
 # first available year for download
 FIRST_AVAILABLE_YEAR = 2008
+
+# every CDL file (and so every tile) is on the same 30 m CONUS Albers grid
+EPSG = 5070
+RESOLUTION = 30
@@ -1,41 +1,113 @@
+import contextlib
+import logging
 import os
 import pathlib
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 import requests
-from tqdm import tqdm
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from stactools.usda_cdl.constants import FIRST_AVAILABLE_YEAR, MOST_RECENT_YEAR
+from stactools.usda_cdl.manifest import checksum
+from stactools.usda_cdl.progress import ProgressBar, ProgressCallback, Tracker
+
+logger = logging.getLogger(__name__)
 
 URL_BASE = "https://www.nass.usda.gov/Research_and_Science/Cropland/Release/datasets/"
 
-CROPLAND_URL = URL_BASE + "{year}_30m_cdls.zip"
-CONFIDENCE_URL = URL_BASE + "{year}_30m_confidence_layer.zip"
-FREQUENCY_URL = URL_BASE + "Crop_Frequency_{first_year}-{last_year}.zip"
-CULTIVATED_URL = URL_BASE + "{year}_Cultivated_Layer.zip"
+CROPLAND_NAME = "{year}_30m_cdls.zip"
+CONFIDENCE_NAME = "{year}_30m_confidence_layer.zip"
+FREQUENCY_NAME = "Crop_Frequency_{first_year}-{last_year}.zip"
+CULTIVATED_NAME = "{year}_Cultivated_Layer.zip"
+
+CROPLAND_URL = URL_BASE + CROPLAND_NAME
+CONFIDENCE_URL = URL_BASE + CONFIDENCE_NAME
+FREQUENCY_URL = URL_BASE + FREQUENCY_NAME
+CULTIVATED_URL = URL_BASE + CULTIVATED_NAME
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+CHUNK_SIZE = 1024**2  # bytes
+TIMEOUT_SECONDS = 60
+MAX_ATTEMPTS = 5
+PARTIAL_SUFFIX = ".part"
 
 
-def download_zips(years: List[int], destination: pathlib.Path) -> List[pathlib.Path]:
+def download_zips(
+    years: List[int],
+    destination: pathlib.Path,
+    progress: Optional[ProgressCallback] = None,
+    max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    checksums: Optional[Dict[str, str]] = None,
+    url_base: str = URL_BASE,
+) -> List[pathlib.Path]:
     """Download zipped GeoTiffs from USDA
 
+    Files are downloaded concurrently over a shared, pooled session. Each one
+    is written to a ``.part`` file, which is resumed (with an HTTP Range
+    request) if the transfer is interrupted or a previous run was, and only
+    renamed to its final name once its size (and checksum, if known) has been
+    verified. So a file at its final name is always complete, and is skipped.
+
     Args:
         years: list of years to download
         destination: destination directory for downloaded files
+        progress: called with the progress of each file's download, in bytes;
+            by default, progress is shown with tqdm
+        max_workers: number of files downloaded at once
+        checksums: expected hex SHA-256 digests, by file name; files that
+            aren't listed are only checked against their Content-Length
+        url_base: the URL of the directory the files are downloaded from
 
     Returns: list of filepaths for downloaded zip files
     """
     os.makedirs(str(destination), exist_ok=True)
+    urls = zip_urls(years, url_base)
+    paths = [pathlib.Path(str(destination)) / os.path.basename(url) for url in urls]
+    todo = list()
+    for url, path in zip(urls, paths):
+        if path.exists():
+            print(f"{path} already exists, skipping...")
+        else:
+            todo.append((url, path))
+    if not todo:
+        return []
+
+    with contextlib.ExitStack() as stack:
+        if progress is None:
+            progress = stack.enter_context(ProgressBar())
+        session = stack.enter_context(create_session(max_workers))
+        executor = stack.enter_context(
+            ThreadPoolExecutor(max_workers=max(min(max_workers, len(todo)), 1))
+        )
+        futures = [
+            executor.submit(
+                download_file,
+                session,
+                url,
+                path,
+                (checksums or {}).get(path.name),
+                progress,
+            )
+            for url, path in todo
+        ]
+        return [future.result() for future in futures]
+
+
+def zip_urls(years: List[int], url_base: str = URL_BASE) -> List[str]:
+    """Returns the URLs of the zip files for some years (by default, all of them)."""
     if not years:
         years = list(range(FIRST_AVAILABLE_YEAR, MOST_RECENT_YEAR + 1))
     urls = list()
     for year in years:
         if year < FIRST_AVAILABLE_YEAR or year > MOST_RECENT_YEAR:
             raise Exception(f"Unsupported CDL year: {year}")
-        urls.append(CROPLAND_URL.format(year=year))
+        urls.append(url_base + CROPLAND_NAME.format(year=year))
 
         # in 2017 and beyond there is a confidence layer available
         if year >= 2017:
-            confidence_url = CONFIDENCE_URL.format(year=year)
+            confidence_url = url_base + CONFIDENCE_NAME.format(year=year)
             # in 2021 they changed the file basename slightly ¯\_(ツ)_/¯
             if year >= 2021:
                 confidence_url = confidence_url.replace(
@@ -47,28 +119,107 @@ def download_zips(years: List[int], destination: pathlib.Path) -> List[pathlib.P
         # starting in 2020, the "Cultivated" and cumalative (2008-present)
         # "Crop Frequency" layers are available
         if year >= 2020:
-            urls.append(CULTIVATED_URL.format(year=year))
+            urls.append(url_base + CULTIVATED_NAME.format(year=year))
             urls.append(
-                FREQUENCY_URL.format(first_year=FIRST_AVAILABLE_YEAR, last_year=year)
+                url_base
+                + FREQUENCY_NAME.format(first_year=FIRST_AVAILABLE_YEAR, last_year=year)
             )
+    return urls
 
-    zips = []
-    for url in urls:
-        path = pathlib.Path(str(destination)) / os.path.basename(url)
-        if path.exists():
-            print(f"{path} already exists, skipping...")
-            continue
-        response = requests.get(url, stream=True)
-        with tqdm.wrapattr(
-            open(path, "wb"),
-            "write",
-            miniters=1,
-            desc=url.split("/")[-1],
-            total=int(response.headers.get("content-length", 0)),
-        ) as fout:
-            for chunk in response.iter_content(chunk_size=4096):
-                fout.write(chunk)
-
-        zips.append(path)
-
-    return zips
+
+def download_file(
+    session: requests.Session,
+    url: str,
+    path: pathlib.Path,
+    sha256: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> pathlib.Path:
+    """Downloads a URL to a path, via a resumable ``.part`` file.
+
+    Interrupted transfers are resumed, up to MAX_ATTEMPTS times. Raises an
+    OSError if the file is still incomplete, and a ValueError (discarding the
+    download) if its SHA-256 digest isn't the expected one.
+    """
+    partial = path.with_name(path.name + PARTIAL_SUFFIX)
+    tracker = Tracker(path.name, None, "B", progress)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            total = _download_to(session, url, partial, tracker)
+            break
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ) as error:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            logger.warning(f"Resuming {url} after error: {error}")
+    size = partial.stat().st_size
+    if total is not None and size != total:
+        raise OSError(f"Incomplete download of {url}: {size} of {total} bytes")
+    if sha256 and checksum(partial) != sha256.lower():
+        partial.unlink()
+        raise ValueError(f"Checksum mismatch for {url}, expected {sha256}")
+    os.replace(partial, path)
+    tracker.total = size
+    tracker.finish()
+    return path
+
+
+def create_session(max_workers: int) -> requests.Session:
+    """Creates a retrying session with a pooled connection for each worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=max_workers,
+        pool_maxsize=max_workers,
+        max_retries=Retry(
+            total=MAX_ATTEMPTS, backoff_factor=1, status_forcelist=[502, 503, 504]
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _download_to(
+    session: requests.Session,
+    url: str,
+    partial: pathlib.Path,
+    tracker: Tracker,
+) -> Optional[int]:
+    """Downloads the rest of a URL to a partial file, returning the total size."""
+    offset = partial.stat().st_size if partial.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(
+        url, stream=True, headers=headers, timeout=TIMEOUT_SECONDS
+    ) as response:
+        if response.status_code == 416:
+            # The partial file is already complete, or isn't a prefix of it
+            total = _content_range_total(response)
+            if total == offset:
+                return total
+            offset = 0
+            partial.unlink()
+            return _download_to(session, url, partial, tracker)
+        response.raise_for_status()
+        length = response.headers.get("content-length")
+        if response.status_code == 206:
+            total = _content_range_total(response)
+        else:
+            # The server ignored the Range header, so start again
+            offset = 0
+            total = int(length) if length else None
+        tracker.total = total
+        tracker.completed = offset
+        tracker.emit()
+        with open(partial, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                tracker.update(len(chunk), bytes_written=len(chunk))
+    return total
+
+
+def _content_range_total(response: requests.Response) -> Optional[int]:
+    """Returns the total size in a Content-Range header, e.g. bytes 0-9/10."""
+    total = response.headers.get("content-range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import os.path
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from pystac import Item
+
+from .constants import StrEnum
+
+DEFAULT_BATCH_SIZE = 1000
+GEOPARQUET_SUFFIXES = [".parquet", ".geoparquet"]
+
+
+class Format(StrEnum):
+    """The file formats items can be exported to."""
+
+    Ndjson = "ndjson"
+    Geoparquet = "geoparquet"
+
+    @classmethod
+    def from_path(cls, path: Path) -> "Format":
+        """Guesses the format from a file's suffix; ndjson unless it's parquet."""
+        if Path(path).suffix.lower() in GEOPARQUET_SUFFIXES:
+            return cls.Geoparquet
+        else:
+            return cls.Ndjson
+
+
+def find_tiles(sources: Iterable[str]) -> List[str]:
+    """Returns the tile hrefs given by tile files, directories or glob patterns.
+
+    Directories are searched recursively for ``.tif`` files. Hrefs are
+    returned in the order they're given (sorted within each directory or
+    pattern), without duplicates.
+    """
+    tiles: List[str] = list()
+    for source in sources:
+        if any(character in source for character in "*?["):
+            tiles.extend(sorted(glob.glob(source, recursive=True)))
+        elif os.path.isdir(source):
+            tiles.extend(sorted(str(path) for path in Path(source).rglob("*.tif")))
+        else:
+            tiles.append(source)
+    return list(dict.fromkeys(tiles))
+
+
+def read_tile_list(path: Path) -> List[str]:
+    """Reads tile hrefs from a file with one per line, ignoring blank lines."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def read_ndjson(paths: Iterable[Path]) -> Iterator[Item]:
+    """Reads items from newline-delimited JSON files, ignoring blank lines."""
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield Item.from_dict(json.loads(line))
+
+
+def write_items(
+    items: Iterable[Item],
+    path: Path,
+    format: Optional[Format] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Writes items to an ndjson or stac-geoparquet file, returning their count.
+
+    Items are consumed as they come, ``batch_size`` at a time, so an iterator
+    of items (e.g. from :py:func:`stactools.usda_cdl.stac.iter_items_from_tiles`)
+    is never held in memory all at once. If no format is given, it's guessed
+    from the path's suffix. The file is written atomically.
+    """
+    if format is None:
+        format = Format.from_path(path)
+    if format == Format.Geoparquet:
+        return write_geoparquet(items, path, batch_size)
+    else:
+        return write_ndjson(items, path, batch_size)
+
+
+def write_ndjson(
+    items: Iterable[Item], path: Path, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Writes items as newline-delimited JSON, returning their count."""
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size: {batch_size}")
+    path = Path(path)
+    partial = path.with_name(path.name + ".part")
+    count = 0
+    try:
+        with open(partial, "w") as f:
+            batch: List[str] = list()
+            for item in items:
+                batch.append(json.dumps(_item_dict(item)) + "\n")
+                if len(batch) >= batch_size:
+                    f.writelines(batch)
+                    count += len(batch)
+                    batch = list()
+            f.writelines(batch)
+            count += len(batch)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return count
+
+
+def write_geoparquet(
+    items: Iterable[Item], path: Path, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Writes items as stac-geoparquet, returning their count.
+
+    Requires the optional ``stac-geoparquet`` dependency (``pip install
+    stactools-usda-cdl[geoparquet]``). Items are first streamed to a
+    temporary ndjson file, which stac-geoparquet converts ``batch_size``
+    items at a time, so that memory stays bounded however many items there
+    are.
+    """
+    try:
+        from stac_geoparquet.arrow import parse_stac_ndjson_to_parquet
+    except ImportError as error:
+        raise ImportError(
+            "stac-geoparquet is required to write geoparquet, install it with "
+            "`pip install stactools-usda-cdl[geoparquet]`"
+        ) from error
+    path = Path(path)
+    ndjson = path.with_name(path.name + ".ndjson.part")
+    partial = path.with_name(path.name + ".part")
+    try:
+        count = write_ndjson(items, ndjson, batch_size)
+        if count:
+            parse_stac_ndjson_to_parquet(ndjson, partial, chunk_size=batch_size)
+            os.replace(partial, path)
+        else:
+            raise ValueError("No items to write to geoparquet")
+    finally:
+        for temporary in [ndjson, partial]:
+            if temporary.exists():
+                temporary.unlink()
+    return count
+
+
+def _item_dict(item: Item) -> Dict[str, Any]:
+    return item.to_dict(include_self_link=False, transform_hrefs=False)
@@ -0,0 +1,323 @@
+import base64
+import json
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import rasterio.warp
+from numpy.typing import NDArray
+
+from .constants import FIRST_AVAILABLE_YEAR, MOST_RECENT_YEAR, RESOLUTION, AssetType
+from .manifest import MANIFEST_SUFFIX, Manifest, manifest_name
+from .tile import DEFAULT_WINDOW_SIZE
+
+GRID_CRS = "EPSG:5070"
+GRID_BOUNDS = (-2356095, 276915, 2258235, 3172605)  # CONUS CDL grid, in meters
+INDEX_SUFFIX = ".index.json"
+
+Bbox = Tuple[float, float, float, float]
+
+
+@dataclass
+class TileIndex:
+    """Which tiles of a source file's grid exist, at one tile size.
+
+    The grid starts at the top left corner of its first tile (``left`` and
+    ``top``, in meters) and has a row and column for every tile position
+    that was planned; a tile exists if it was written, i.e. it is not an
+    empty window (and not a constant tile that was only indexed). The
+    positions are stored as a bitmask, packed and base64-encoded when
+    persisted, so an index of every CONUS tile is a few kilobytes.
+    """
+
+    stem: str
+    size: int
+    """The tile size, in pixels."""
+
+    left: int
+    top: int
+    exists: NDArray[np.bool_]
+    """Whether each tile exists, by row (from the top) and column."""
+
+    @classmethod
+    def full(
+        cls,
+        stem: str,
+        size: int = DEFAULT_WINDOW_SIZE,
+        bounds: Tuple[int, int, int, int] = GRID_BOUNDS,
+    ) -> "TileIndex":
+        """Creates an index of every tile of a grid, as if none were empty."""
+        left, bottom, right, top = bounds
+        meters = size * RESOLUTION
+        shape = (math.ceil((top - bottom) / meters), math.ceil((right - left) / meters))
+        return cls(stem, size, left, top, np.ones(shape, dtype=bool))
+
+    @classmethod
+    def from_manifest(cls, manifest: Manifest) -> Dict[int, "TileIndex"]:
+        """Creates the indexes of a tiling manifest's tiles, by tile size.
+
+        A manifest (e.g. from :py:func:`stactools.usda_cdl.tile.tile_pyramid`)
+        can hold tiles of several sizes. Sharded manifests must be merged
+        first.
+        """
+        if manifest.shard_count != 1:
+            raise ValueError(
+                f"Merge sharded manifests before indexing: {manifest.path}"
+            )
+        if not manifest.path.name.endswith(MANIFEST_SUFFIX):
+            raise ValueError(f"Not a manifest file name: {manifest.path}")
+        stem = manifest.path.name[: -len(MANIFEST_SUFFIX)]
+        planned = (
+            manifest.windows
+            | set(manifest.completed)
+            | manifest.empty
+            | set(manifest.constant)
+        )
+        names_by_size: Dict[int, List[str]] = dict()
+        for name in planned:
+            size = _parse_tile_name(stem, name)[2] // RESOLUTION
+            names_by_size.setdefault(size, list()).append(name)
+        return dict(
+            (size, cls.from_names(stem, size, names, manifest.completed))
+            for size, names in sorted(names_by_size.items())
+        )
+
+    @classmethod
+    def from_names(
+        cls, stem: str, size: int, planned: Iterable[str], existing: Iterable[str]
+    ) -> "TileIndex":
+        """Creates an index from tile file names.
+
+        The grid covers the planned tiles; the existing tiles (of this size)
+        are marked as such.
+        """
+        meters = size * RESOLUTION
+        corners = [_corner(stem, name) for name in planned]
+        if not corners:
+            raise ValueError(f"No {size} pixel tiles of {stem} to index")
+        left = min(x for x, _ in corners)
+        top = max(y for _, y in corners)
+        rows = (top - min(y for _, y in corners)) // meters + 1
+        cols = (max(x for x, _ in corners) - left) // meters + 1
+        exists = np.zeros((rows, cols), dtype=bool)
+        for name in existing:
+            x, y, tile_meters = _parse_tile_name(stem, name)
+            if tile_meters != meters:
+                continue
+            row, col, remainder = _cell(left, top, meters, x, y + RESOLUTION)
+            if remainder or not (0 <= row < rows and 0 <= col < cols):
+                raise ValueError(
+                    f"Tile is not on the grid of the planned tiles: {name}"
+                )
+            exists[row, col] = True
+        return cls(stem, size, left, top, exists)
+
+    @classmethod
+    def for_stem(
+        cls, directory: Path, stem: str, size: int = DEFAULT_WINDOW_SIZE
+    ) -> "TileIndex":
+        """Loads the index of a source file stem's tiles in a directory.
+
+        If there is no index file, or the tiling manifest has changed since
+        it was written, the indexes are (re)built from the manifest and
+        saved.
+        """
+        path = directory / index_name(stem, size)
+        manifest_path = directory / manifest_name(stem)
+        if path.exists() and (
+            not manifest_path.exists()
+            or path.stat().st_mtime >= manifest_path.stat().st_mtime
+        ):
+            return cls.load(path)
+        if not manifest_path.exists():
+            raise FileNotFoundError(
+                f"No tile index or manifest for {stem} in {directory}"
+            )
+        indexes = cls.from_manifest(Manifest.load(manifest_path))
+        for index in indexes.values():
+            index.save(directory / index_name(stem, index.size))
+        if size not in indexes:
+            raise ValueError(f"{stem} wasn't tiled at size {size} in {directory}")
+        return indexes[size]
+
+    @classmethod
+    def load(cls, path: Path) -> "TileIndex":
+        """Loads an index."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TileIndex":
+        """Creates an index from its dictionary representation."""
+        rows, cols = data["shape"]
+        bits = np.frombuffer(base64.b64decode(data["tiles"]), dtype=np.uint8)
+        exists = np.unpackbits(bits, count=rows * cols).astype(bool)
+        return cls(
+            stem=data["stem"],
+            size=int(data["size"]),
+            left=int(data["left"]),
+            top=int(data["top"]),
+            exists=exists.reshape((rows, cols)),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns this index as a dictionary."""
+        return {
+            "stem": self.stem,
+            "size": self.size,
+            "left": self.left,
+            "top": self.top,
+            "shape": list(self.exists.shape),
+            "tiles": base64.b64encode(
+                np.packbits(self.exists.ravel()).tobytes()
+            ).decode(),
+        }
+
+    def save(self, path: Path) -> None:
+        """Atomically (over)writes this index."""
+        partial = path.with_name(path.name + ".part")
+        with open(partial, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(partial, path)
+
+    def tiles_for_bbox(self, bbox: Bbox) -> List[str]:
+        """Returns the file names of the existing tiles that intersect a bbox.
+
+        The bbox is (left, bottom, right, top) in the grid's CRS (see
+        :py:data:`GRID_CRS`). Tiles that only touch it along an edge are
+        left out; a point on an edge is in the tile to its right or below.
+        Names are in row-major order, from the top left.
+        """
+        left, bottom, right, top = bbox
+        if left > right or bottom > top:
+            raise ValueError(f"Invalid bbox: {bbox}")
+        meters = self.size * RESOLUTION
+        rows, cols = self.exists.shape
+        first_col = math.floor((left - self.left) / meters)
+        last_col = max(math.ceil((right - self.left) / meters) - 1, first_col)
+        first_row = math.floor((self.top - top) / meters)
+        last_row = max(math.ceil((self.top - bottom) / meters) - 1, first_row)
+        names = list()
+        for row in range(max(first_row, 0), min(last_row + 1, rows)):
+            for col in range(max(first_col, 0), min(last_col + 1, cols)):
+                if self.exists[row, col]:
+                    names.append(self.tile_name(row, col))
+        return names
+
+    def tile_name(self, row: int, col: int) -> str:
+        """Returns the file name of the tile at a row and column."""
+        meters = self.size * RESOLUTION
+        x = self.left + col * meters
+        y = self.top - row * meters - RESOLUTION
+        return f"{self.stem}_{x}_{y}_{meters}.tif"
+
+
+def source_stem(year: int, asset_type: AssetType) -> str:
+    """Returns the stem of the source GeoTIFF for a year and asset type.
+
+    For frequency data, the year is the last year of the source's range.
+    """
+    if year < FIRST_AVAILABLE_YEAR or year > MOST_RECENT_YEAR:
+        raise ValueError(f"Year out of range: {year}")
+    if asset_type == AssetType.Cropland:
+        return f"{year}_30m_cdls"
+    elif asset_type == AssetType.Confidence:
+        return f"{year}_30m_confidence_layer"
+    elif asset_type == AssetType.Cultivated:
+        return f"{year}_cultivated_layer"
+    else:
+        return f"crop_frequency_{asset_type.value}_{FIRST_AVAILABLE_YEAR}-{year}"
+
+
+def index_name(stem: str, size: int) -> str:
+    """Returns the file name of the index of a source file stem's tiles."""
+    return f"{stem}.{size}{INDEX_SUFFIX}"
+
+
+def tiles_for_bbox(
+    bbox: Bbox,
+    year: int,
+    asset_type: AssetType,
+    size: int = DEFAULT_WINDOW_SIZE,
+    crs: Optional[str] = None,
+    directory: Optional[Path] = None,
+) -> List[str]:
+    """Returns the tiles that cover a bbox, without listing any tiles.
+
+    The covering tiles are computed from the tile grid: tile names are
+    ``{x}_{y}_{size}`` offsets of ``size`` pixels from the grid's top left
+    corner (see :py:func:`stactools.usda_cdl.tile.tile_geotiff`). The bbox is
+    in EPSG:5070 unless a ``crs`` is given, e.g. "EPSG:4326" for lon/lat, in
+    which case it's reprojected.
+
+    If a directory of tiles is given, only the tiles that exist there are
+    returned, as paths, using the directory's tile index (see
+    :py:meth:`TileIndex.for_stem`); otherwise every tile of the CONUS grid is
+    assumed to exist, and file names are returned.
+    """
+    stem = source_stem(year, asset_type)
+    if crs:
+        bbox = rasterio.warp.transform_bounds(crs, GRID_CRS, *bbox, densify_pts=21)
+    if directory is None:
+        return TileIndex.full(stem, size).tiles_for_bbox(bbox)
+    index = TileIndex.for_stem(Path(directory), stem, size)
+    return [str(Path(directory) / name) for name in index.tiles_for_bbox(bbox)]
+
+
+def tiles_for_point(
+    x: float,
+    y: float,
+    year: int,
+    asset_type: AssetType,
+    size: int = DEFAULT_WINDOW_SIZE,
+    crs: Optional[str] = None,
+    directory: Optional[Path] = None,
+) -> List[str]:
+    """Returns the tile that holds a point, if it exists.
+
+    See :py:func:`tiles_for_bbox`.
+    """
+    return tiles_for_bbox((x, y, x, y), year, asset_type, size, crs, directory)
+
+
+def index_directory(directory: Path) -> List[Path]:
+    """Writes the tile indexes of every (merged) tiling manifest in a directory.
+
+    Returns the paths of the index files.
+    """
+    paths = list()
+    for manifest_path in sorted(directory.glob(f"*{MANIFEST_SUFFIX}")):
+        manifest = Manifest.load(manifest_path)
+        if manifest.shard_count != 1:
+            continue
+        for size, index in TileIndex.from_manifest(manifest).items():
+            path = directory / index_name(index.stem, size)
+            index.save(path)
+            paths.append(path)
+    return paths
+
+
+def _parse_tile_name(stem: str, name: str) -> Tuple[int, int, int]:
+    """Returns a tile file name's x, y and size, in meters."""
+    suffix = Path(name).stem[len(stem) + 1 :]
+    parts = suffix.split("_")
+    if not name.startswith(f"{stem}_") or len(parts) != 3:
+        raise ValueError(f"Invalid tile file name for {stem}: {name}")
+    x, y, meters = (int(part) for part in parts)
+    return x, y, meters
+
+
+def _corner(stem: str, name: str) -> Tuple[int, int]:
+    """Returns a tile's top left corner."""
+    x, y, _ = _parse_tile_name(stem, name)
+    return x, y + RESOLUTION
+
+
+def _cell(left: int, top: int, meters: int, x: int, y: int) -> Tuple[int, int, int]:
+    """Returns the row and column of a top left corner, and how far off it is."""
+    row, row_remainder = divmod(top - y, meters)
+    col, col_remainder = divmod(x - left, meters)
+    return row, col, row_remainder + col_remainder
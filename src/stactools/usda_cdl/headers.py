@@ -0,0 +1,194 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import fsspec
+import rasterio
+from rasterio.crs import CRS
+from stactools.core.io import ReadHrefModifier
+
+SQLITE_TIMEOUT_SECONDS = 60
+FINGERPRINT_KEYS = ["size", "mtime", "LastModified", "last_modified", "ETag", "etag"]
+
+
+@dataclass(frozen=True)
+class RasterHeader:
+    """The header information ``stactools.core.create.item`` reads from a COG."""
+
+    epsg: Optional[int]
+    wkt2: Optional[str]
+    bounds: Tuple[float, float, float, float]
+    transform: List[float]
+    shape: Tuple[int, int]
+
+    @classmethod
+    def read(cls, href: str) -> "RasterHeader":
+        """Reads the header of the raster at href."""
+        with rasterio.open(href) as dataset:
+            crs = dataset.crs
+            epsg = crs.to_epsg()
+            return cls(
+                epsg=epsg,
+                wkt2=None if epsg else crs.to_wkt("WKT2"),
+                bounds=tuple(dataset.bounds),
+                transform=list(dataset.transform)[0:6],
+                shape=dataset.shape,
+            )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RasterHeader":
+        """Creates a header from its dictionary representation."""
+        return cls(
+            epsg=data["epsg"],
+            wkt2=data["wkt2"],
+            bounds=tuple(data["bounds"]),
+            transform=list(data["transform"]),
+            shape=tuple(data["shape"]),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns this header as a dictionary."""
+        return {
+            "epsg": self.epsg,
+            "wkt2": self.wkt2,
+            "bounds": list(self.bounds),
+            "transform": self.transform,
+            "shape": list(self.shape),
+        }
+
+    @property
+    def crs(self) -> CRS:
+        """Returns this header's CRS."""
+        if self.epsg:
+            return CRS.from_epsg(self.epsg)
+        else:
+            return CRS.from_wkt(self.wkt2)
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """How often a header cache was hit, or missed."""
+
+    hits: int
+    misses: int
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class HeaderCache:
+    """An on-disk (SQLite) cache of raster headers.
+
+    Headers are keyed by href and a fingerprint of the file (its size and
+    modification time, or ETag, as reported by fsspec), so a changed file is
+    read again. Getting a fingerprint is one stat or HEAD request, which is
+    much cheaper than opening a COG, especially on object storage.
+
+    The cache can be shared by threads, and pickled to worker processes; each
+    thread opens its own connection. Hit and miss counts are kept per
+    process.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = list()
+        self._hits = 0
+        self._misses = 0
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS headers "
+                "(href TEXT PRIMARY KEY, fingerprint TEXT, header TEXT)"
+            )
+
+    def get(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> RasterHeader:
+        """Returns the header of the raster at href, reading it on a miss."""
+        modified_href = read_href_modifier(href) if read_href_modifier else href
+        fingerprint = _fingerprint(modified_href)
+        row = (
+            self._connection()
+            .execute("SELECT fingerprint, header FROM headers WHERE href = ?", (href,))
+            .fetchone()
+        )
+        if row and row[0] == fingerprint:
+            with self._lock:
+                self._hits += 1
+            return RasterHeader.from_dict(json.loads(row[1]))
+        with self._lock:
+            self._misses += 1
+        header = RasterHeader.read(modified_href)
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO headers VALUES (?, ?, ?)",
+                (href, fingerprint, json.dumps(header.to_dict())),
+            )
+        return header
+
+    @property
+    def stats(self) -> CacheStats:
+        """Returns this cache's hit and miss counts."""
+        with self._lock:
+            return CacheStats(self._hits, self._misses)
+
+    def close(self) -> None:
+        """Closes every connection opened by this cache."""
+        with self._lock:
+            connections = self._connections
+            self._connections = list()
+            self._local = threading.local()
+        for connection in connections:
+            connection.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is None:
+            # Connections are only used by the thread that opened them, but
+            # may be closed from another one
+            connection = sqlite3.connect(
+                str(self.path),
+                timeout=SQLITE_TIMEOUT_SECONDS,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def __enter__(self) -> "HeaderCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"])  # type: ignore
+
+
+def _fingerprint(href: str) -> str:
+    fs, path = fsspec.core.url_to_fs(href)
+    info = fs.info(path)
+    return json.dumps(
+        dict((key, str(info[key])) for key in FINGERPRINT_KEYS if key in info),
+        sort_keys=True,
+    )
@@ -0,0 +1,85 @@
+import json
+import os
+import os.path
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from pystac.extensions.raster import Histogram, Statistics
+from stactools.core.io import ReadHrefModifier, read_text
+
+HISTOGRAM_SUFFIX = ".histogram.json"
+BUCKETS = 256  # one per uint8 value
+
+
+def compute(data: NDArray[np.uint8]) -> List[int]:
+    """Returns the number of pixels with each uint8 value."""
+    return [int(count) for count in np.bincount(data.ravel(), minlength=BUCKETS)]
+
+
+def sidecar_href(href: str) -> str:
+    """Returns the href of the histogram sidecar for a tile href."""
+    return os.path.splitext(href)[0] + HISTOGRAM_SUFFIX
+
+
+def write(path: Path, counts: List[int]) -> None:
+    """Atomically writes the histogram sidecar for the tile at path."""
+    sidecar = Path(sidecar_href(str(path)))
+    partial = sidecar.with_name(sidecar.name + ".part")
+    with open(partial, "w") as f:
+        json.dump({"counts": counts}, f)
+    os.replace(partial, sidecar)
+
+
+def read(
+    href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+) -> Optional[List[int]]:
+    """Reads the histogram sidecar for a tile href, if there is one."""
+    try:
+        text = read_text(sidecar_href(href), read_href_modifier)
+    except FileNotFoundError:
+        return None
+    return [int(count) for count in json.loads(text)["counts"]]
+
+
+def histogram(counts: List[int]) -> Histogram:
+    """Returns a raster extension histogram with one bucket per value.
+
+    Buckets are centered on the values, like GDAL's histograms for byte data.
+    """
+    return Histogram.create(len(counts), -0.5, len(counts) - 0.5, list(counts))
+
+
+def statistics(
+    counts: List[int], nodata: Optional[Union[float, str]] = None
+) -> Statistics:
+    """Returns raster extension statistics of the valid (non-nodata) values.
+
+    A nodata value that isn't a number (e.g. "nan") is ignored.
+    """
+    values = np.arange(len(counts))
+    weights = np.array(counts, dtype=np.float64)
+    total = weights.sum()
+    if isinstance(nodata, (int, float)) and 0 <= nodata < len(counts):
+        weights[int(nodata)] = 0
+    valid = weights.sum()
+    if not valid:
+        return Statistics.create(valid_percent=0.0)
+    present = values[weights > 0]
+    mean = float((values * weights).sum() / valid)
+    stddev = float(np.sqrt(((values - mean) ** 2 * weights).sum() / valid))
+    return Statistics.create(
+        minimum=int(present.min()),
+        maximum=int(present.max()),
+        mean=mean,
+        stddev=stddev,
+        valid_percent=float(100 * valid / total),
+    )
+
+
+def classes_with_counts(
+    classes: List[Dict[str, Any]], counts: List[int]
+) -> List[Dict[str, Any]]:
+    """Returns copies of the classification classes, with their pixel counts."""
+    return [dict(c, count=counts[int(c["value"])]) for c in classes]
@@ -0,0 +1,151 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pystac import Catalog, CatalogType, Collection, Item
+
+from .constants import StrEnum
+from .metadata import Metadata
+
+DEFAULT_BUCKET_SIZE = 480_000  # meters, i.e. 16000 pixels
+DEFAULT_SAVE_WORKERS = 8
+
+
+class Layout(StrEnum):
+    """How items are arranged in a collection.
+
+    Flat puts every item link in the collection itself. Hierarchical
+    partitions items into sub-catalogs by item type, then by year (or year
+    range), then, for tiles, by coarse spatial bucket, so that no single
+    catalog file lists more than a few hundred items.
+    """
+
+    Flat = "flat"
+    Hierarchical = "hierarchical"
+
+
+def add_items(
+    collection: Collection,
+    items: Iterable[Item],
+    layout: Layout = Layout.Hierarchical,
+    bucket_size: int = DEFAULT_BUCKET_SIZE,
+) -> None:
+    """Adds items to a collection, in the given layout.
+
+    Sub-catalogs of a hierarchical layout are created as they're needed. A
+    tile's spatial bucket is the ``bucket_size`` (in meters) square of the
+    CDL grid that its lower left corner falls in.
+    """
+    if layout == Layout.Flat:
+        collection.add_items(items)
+        return
+    catalogs: Dict[Tuple[str, ...], Catalog] = dict()
+    for item in items:
+        parent: Catalog = collection
+        keys: Tuple[str, ...] = tuple()
+        for key, description in partition(item, bucket_size):
+            keys = keys + (key,)
+            catalog = catalogs.get(keys)
+            if catalog is None:
+                catalog = Catalog("_".join(keys), description)
+                parent.add_child(catalog)
+                catalogs[keys] = catalog
+            parent = catalog
+        parent.add_item(item)
+
+
+def partition(
+    item: Item, bucket_size: int = DEFAULT_BUCKET_SIZE
+) -> List[Tuple[str, str]]:
+    """Returns the keys (and descriptions) of the sub-catalogs for an item.
+
+    The keys are parsed from the item's first asset's file name: the item
+    type, the time descriptor and, for tiles, the spatial bucket, named like
+    a tile (``{x}_{y}_{size}``).
+    """
+    if not item.assets:
+        raise ValueError(f"Item has no assets: {item.id}")
+    metadata = Metadata.from_href(next(iter(item.assets.values())).href)
+    keys = [
+        (metadata.item_type, f"USDA CDL {metadata.item_type} items"),
+        (
+            metadata.time_descriptor,
+            f"USDA CDL {metadata.item_type} items for {metadata.time_descriptor}",
+        ),
+    ]
+    bounds = metadata.tile_bounds
+    if bounds:
+        x = math.floor(bounds[0] / bucket_size) * bucket_size
+        y = math.floor(bounds[1] / bucket_size) * bucket_size
+        keys.append(
+            (
+                f"{x}_{y}_{bucket_size}",
+                f"USDA CDL {metadata.item_type} tiles for "
+                f"{metadata.time_descriptor} with their lower left corner in "
+                f"[{x}, {x + bucket_size}) x [{y}, {y + bucket_size}) (EPSG:5070)",
+            )
+        )
+    return keys
+
+
+def save(
+    collection: Collection,
+    destination: Optional[Union[str, Path]] = None,
+    catalog_type: CatalogType = CatalogType.SELF_CONTAINED,
+    max_workers: int = DEFAULT_SAVE_WORKERS,
+) -> List[str]:
+    """Normalizes a collection's hrefs into a destination and saves it.
+
+    Like ``Collection.save``, but every catalog and item is written by a pool
+    of ``max_workers`` threads, which overlaps the writes (and, for object
+    storage, their round trips). JSON is serialized by the default StacIO,
+    which uses orjson if it's installed (``pip install
+    stactools-usda-cdl[orjson]``).
+
+    If no destination is given, the collection is saved to its self href,
+    and everything else is laid out in that file's directory.
+
+    Returns the hrefs of the files written.
+    """
+    if destination is None:
+        self_href = collection.get_self_href()
+        if not self_href:
+            raise ValueError("The collection has no self href and no destination")
+        collection.normalize_hrefs(os.path.dirname(self_href))
+        collection.set_self_href(self_href)
+    else:
+        collection.normalize_hrefs(str(destination))
+    collection.catalog_type = catalog_type
+    objects: List[Union[Catalog, Item]] = list()
+    for catalog, _, items in collection.walk():
+        objects.append(catalog)
+        objects.extend(items)
+    for href in set(
+        os.path.dirname(str(stac_object.get_self_href())) for stac_object in objects
+    ):
+        if "://" not in href:
+            os.makedirs(href, exist_ok=True)
+
+    def save_object(stac_object: Union[Catalog, Item]) -> str:
+        stac_object.save_object(
+            include_self_link=include_self_link(stac_object, collection, catalog_type)
+        )
+        return str(stac_object.get_self_href())
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        return list(executor.map(save_object, objects))
+
+
+def include_self_link(
+    stac_object: Union[Catalog, Item], root: Catalog, catalog_type: CatalogType
+) -> bool:
+    """Returns whether an object's file has a self link, as pystac decides it.
+
+    Every object has one in an absolute published catalog, only the root in a
+    relative published one, and none in a self-contained one.
+    """
+    return catalog_type == CatalogType.ABSOLUTE_PUBLISHED or (
+        catalog_type == CatalogType.RELATIVE_PUBLISHED and stac_object is root
+    )
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+MANIFEST_SUFFIX = ".manifest.json"
+CHECKSUM_CHUNK_SIZE = 1024**2  # bytes
+
+
+@dataclass
+class Manifest:
+    """A record of the tiling of one source file.
+
+    The manifest lives in the destination directory, next to the tiles. It
+    lists the tiles that have been completely written, with their checksums,
+    and the windows that turned out to be empty, both by tile file name, so
+    that an interrupted run can be resumed without rewriting or re-reading
+    them. Constant tiles that were indexed rather than written are recorded
+    with their value.
+
+    When tiling is sharded, each shard keeps its own manifest, which also
+    lists the windows planned for that shard so that the shards' manifests
+    can be checked and merged with :py:func:`merge`.
+    """
+
+    path: Path
+    completed: Dict[str, str] = field(default_factory=dict)
+    empty: Set[str] = field(default_factory=set)
+    constant: Dict[str, int] = field(default_factory=dict)
+    windows: Set[str] = field(default_factory=set)
+    shard_index: int = 0
+    shard_count: int = 1
+
+    @classmethod
+    def for_stem(
+        cls, directory: Path, stem: str, shard_index: int = 0, shard_count: int = 1
+    ) -> "Manifest":
+        """Loads the manifest for a source file stem (and shard) from a directory.
+
+        If there is no manifest yet, returns an empty one.
+        """
+        manifest = cls.load(directory / manifest_name(stem, shard_index, shard_count))
+        manifest.shard_index = shard_index
+        manifest.shard_count = shard_count
+        return manifest
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        """Loads a manifest, or returns an empty one if the file doesn't exist."""
+        if not path.exists():
+            return cls(path=path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls.from_dict(path, data)
+
+    @classmethod
+    def from_dict(cls, path: Path, data: Dict[str, Any]) -> "Manifest":
+        """Creates a manifest from its dictionary representation."""
+        return cls(
+            path=path,
+            completed=dict(data.get("completed", {})),
+            empty=set(data.get("empty", [])),
+            constant={
+                name: int(value) for name, value in data.get("constant", {}).items()
+            },
+            windows=set(data.get("windows", [])),
+            shard_index=int(data.get("shard_index", 0)),
+            shard_count=int(data.get("shard_count", 1)),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns this manifest as a dictionary."""
+        return {
+            "shard_index": self.shard_index,
+            "shard_count": self.shard_count,
+            "windows": sorted(self.windows),
+            "completed": dict(sorted(self.completed.items())),
+            "empty": sorted(self.empty),
+            "constant": dict(sorted(self.constant.items())),
+        }
+
+    def save(self) -> None:
+        """Atomically (over)writes this manifest."""
+        partial = self.path.with_name(self.path.name + ".part")
+        with open(partial, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(partial, self.path)
+
+    def done(self) -> Set[str]:
+        """Returns the tile file names that don't need to be tiled again.
+
+        Completed tiles whose files have disappeared are forgotten.
+        """
+        directory = self.path.parent
+        for name in list(self.completed):
+            if not (directory / name).exists():
+                del self.completed[name]
+        return set(self.completed) | self.empty | set(self.constant)
+
+
+def manifest_name(stem: str, shard_index: int = 0, shard_count: int = 1) -> str:
+    """Returns the file name of the manifest for a source file stem and shard."""
+    if shard_count == 1:
+        return f"{stem}{MANIFEST_SUFFIX}"
+    else:
+        return f"{stem}.shard-{shard_index}-of-{shard_count}{MANIFEST_SUFFIX}"
+
+
+def merge(manifests: List[Manifest], path: Path) -> Manifest:
+    """Merges the manifests of every shard of a sharded tiling run.
+
+    Raises a ValueError if a shard is missing or repeated, if a window was
+    planned for more than one shard, or if any shard hasn't finished (i.e. it
+    has planned windows that are neither completed, empty nor constant).
+    """
+    if not manifests:
+        raise ValueError("No manifests to merge")
+    shard_count = manifests[0].shard_count
+    if any(manifest.shard_count != shard_count for manifest in manifests):
+        raise ValueError("Manifests are from runs with different shard counts")
+    shard_indices = sorted(manifest.shard_index for manifest in manifests)
+    if shard_indices != list(range(shard_count)):
+        raise ValueError(
+            f"Expected one manifest for each of {shard_count} shards, "
+            f"got shards {shard_indices}"
+        )
+    merged = Manifest(path=path)
+    for manifest in manifests:
+        duplicated = merged.windows & manifest.windows
+        if duplicated:
+            raise ValueError(
+                f"Windows planned for more than one shard: {sorted(duplicated)}"
+            )
+        missing = (
+            manifest.windows
+            - set(manifest.completed)
+            - manifest.empty
+            - set(manifest.constant)
+        )
+        if missing:
+            raise ValueError(
+                f"Shard {manifest.shard_index} is missing windows: {sorted(missing)}"
+            )
+        merged.windows.update(manifest.windows)
+        merged.completed.update(manifest.completed)
+        merged.empty.update(manifest.empty)
+        merged.constant.update(manifest.constant)
+    return merged
+
+
+def checksum(path: Path) -> str:
+    """Returns the hex SHA-256 digest of a file."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
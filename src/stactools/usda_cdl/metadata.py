@@ -7,7 +7,13 @@ from typing import Any, Dict, List, Optional, Tuple
 from dateutil.tz import tzutc
 from pystac.extensions.raster import RasterBand
 
-from .constants import ASSET_CLASSES, COG_RASTER_BAND, COG_TITLES, AssetType
+from .constants import (
+    ASSET_CLASSES,
+    COG_RASTER_BAND,
+    COG_TITLES,
+    RESOLUTION,
+    AssetType,
+)
 
 
 @dataclass
@@ -145,6 +151,20 @@ class Metadata:
         else:
             return str(self.start_datetime.year)
 
+    @property
+    def tile_bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """Returns this tile's (left, bottom, right, top) bounds, if it's a tile.
+
+        Tile names are ``{x}_{y}_{size}``, where x is the left edge, y is one
+        pixel below the top edge, and size is the width and height, all in
+        meters (see :py:func:`stactools.usda_cdl.tile.tile_geotiff`).
+        """
+        if not self.tile:
+            return None
+        x, y, size = (float(part) for part in self.tile.split("_"))
+        top = y + RESOLUTION
+        return (x, top - size, x + size, top)
+
     @property
     def stem(self) -> str:
         """Returns this asset's file name without an extension."""
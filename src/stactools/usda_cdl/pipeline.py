@@ -0,0 +1,375 @@
+import contextlib
+import json
+import logging
+import os
+import os.path
+import shutil
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import export, stac, tile
+from .constants import FIRST_AVAILABLE_YEAR, MOST_RECENT_YEAR, StrEnum
+from .download import (
+    DEFAULT_DOWNLOAD_WORKERS,
+    URL_BASE,
+    create_session,
+    download_file,
+    zip_urls,
+)
+from .manifest import Manifest
+from .metadata import Metadata
+from .progress import ProgressCallback
+
+STATE_FILE_NAME = "pipeline.json"
+ZIPS_DIRECTORY = "zips"
+TILES_DIRECTORY = "tiles"
+ITEMS_DIRECTORY = "items"
+
+logger = logging.getLogger(__name__)
+
+
+class Step(StrEnum):
+    """The steps of the processing pipeline, each with its own workers."""
+
+    Download = "download"
+    Tile = "tile"
+    Items = "items"
+
+
+@dataclass
+class PipelineState:
+    """What the processing pipeline has done, so that it can be restarted.
+
+    The state lives in the destination directory. It lists the zipfiles that
+    have been downloaded, the zipfiles that have been tiled (with the stems
+    of the GeoTIFFs they held, whose tiling manifests list their tiles), the
+    item types whose items have been appended to each year's item file (and
+    the file's size after the last append), and the years whose items have
+    all been written.
+    """
+
+    path: Path
+    downloaded: Set[str] = field(default_factory=set)
+    tiled: Dict[str, List[str]] = field(default_factory=dict)
+    item_types: Dict[int, List[str]] = field(default_factory=dict)
+    item_bytes: Dict[int, int] = field(default_factory=dict)
+    items: Set[int] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: Path) -> "PipelineState":
+        """Loads the state, or returns an empty one if the file doesn't exist."""
+        if not path.exists():
+            return cls(path=path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls.from_dict(path, data)
+
+    @classmethod
+    def from_dict(cls, path: Path, data: Dict[str, Any]) -> "PipelineState":
+        """Creates a state from its dictionary representation."""
+        return cls(
+            path=path,
+            downloaded=set(data.get("downloaded", [])),
+            tiled=dict(
+                (name, list(stems)) for name, stems in data.get("tiled", {}).items()
+            ),
+            item_types=dict(
+                (int(year), list(item_types))
+                for year, item_types in data.get("item_types", {}).items()
+            ),
+            item_bytes=dict(
+                (int(year), int(size))
+                for year, size in data.get("item_bytes", {}).items()
+            ),
+            items=set(int(year) for year in data.get("items", [])),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns this state as a dictionary."""
+        return {
+            "downloaded": sorted(self.downloaded),
+            "tiled": dict(sorted(self.tiled.items())),
+            "item_types": dict(
+                (str(year), item_types)
+                for year, item_types in sorted(self.item_types.items())
+            ),
+            "item_bytes": dict(
+                (str(year), size) for year, size in sorted(self.item_bytes.items())
+            ),
+            "items": sorted(self.items),
+        }
+
+    def save(self) -> None:
+        """Atomically (over)writes this state."""
+        partial = self.path.with_name(self.path.name + ".part")
+        with open(partial, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(partial, self.path)
+
+
+def process(
+    years: List[int],
+    destination: Path,
+    size: int = tile.DEFAULT_WINDOW_SIZE,
+    download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    tile_jobs: int = 1,
+    tile_workers: int = tile.DEFAULT_MAX_WORKERS,
+    item_workers: int = 1,
+    fast: bool = True,
+    url_base: str = URL_BASE,
+    progress: Optional[ProgressCallback] = None,
+) -> List[Path]:
+    """Downloads, tiles and creates items for some years, as a pipeline.
+
+    Each step has its own concurrency: ``download_workers`` zipfiles are
+    downloaded at once, ``tile_jobs`` zipfiles are tiled at once (each with
+    ``tile_workers`` workers), and a year's items are created by
+    ``item_workers`` workers. A zipfile is tiled as soon as it's downloaded,
+    while other zipfiles are still downloading, and its items are created
+    while the others are still being tiled: the items of each item type
+    (cropland, cultivated or frequency) are appended to the year's file as
+    soon as every zipfile that can hold that type is tiled. Items are
+    grouped by type rather than by zipfile because an item can combine
+    tiles from several zipfiles (e.g. cropland and confidence).
+
+    The zipfiles, tiles and items (one ndjson file per year) go into the
+    ``zips``, ``tiles`` and ``items`` subdirectories of the destination. What
+    has been done is recorded in a state file (see :py:class:`PipelineState`),
+    so an interrupted run picks up where it left off; downloads and tiling
+    resume part way through, too.
+
+    If ``fast`` is True, items are created from the tiles' names (see
+    :py:func:`stactools.usda_cdl.stac.create_item`).
+
+    Returns the paths of the years' item files.
+    """
+    if not years:
+        years = list(range(FIRST_AVAILABLE_YEAR, MOST_RECENT_YEAR + 1))
+    zips_directory = destination / ZIPS_DIRECTORY
+    tiles_directory = destination / TILES_DIRECTORY
+    items_directory = destination / ITEMS_DIRECTORY
+    for directory in [zips_directory, tiles_directory, items_directory]:
+        os.makedirs(str(directory), exist_ok=True)
+    state = PipelineState.load(destination / STATE_FILE_NAME)
+    names_by_year = dict(
+        (year, [os.path.basename(url) for url in zip_urls([year], url_base)])
+        for year in years
+    )
+    urls = dict((os.path.basename(url), url) for url in zip_urls(list(years), url_base))
+    pending: Dict["Future[Any]", Tuple[Step, Any]] = dict()
+    for year in years:
+        path = items_directory / f"{year}.ndjson"
+        if year not in state.items and path.exists():
+            # Drop anything appended after the state was last saved
+            with open(path, "r+b") as f:
+                f.truncate(state.item_bytes.get(year, 0))
+
+    def zip_item_types(name: str) -> Optional[Set[str]]:
+        """The item types a zipfile holds, or None if that's not known yet."""
+        if name in state.tiled:
+            return set(Metadata.from_href(stem).item_type for stem in state.tiled[name])
+        return _guess_item_types(name)
+
+    with contextlib.ExitStack() as stack:
+        session = stack.enter_context(create_session(download_workers))
+        executors = dict(
+            (
+                step,
+                stack.enter_context(ThreadPoolExecutor(max_workers=max(workers, 1))),
+            )
+            for step, workers in [
+                (Step.Download, download_workers),
+                (Step.Tile, tile_jobs),
+                (Step.Items, 1),
+            ]
+        )
+
+        def submit_tile(name: str) -> None:
+            future = executors[Step.Tile].submit(
+                _tile_zip,
+                zips_directory / name,
+                tiles_directory,
+                size,
+                tile_workers,
+                progress,
+            )
+            pending[future] = (Step.Tile, name)
+
+        def submit_ready_items() -> None:
+            submitted = set(key for step, key in pending.values() if step == Step.Items)
+            for year, names in names_by_year.items():
+                if year in state.items:
+                    continue
+                written = state.item_types.get(year, [])
+                tiled = [name for name in names if name in state.tiled]
+                untiled = [zip_item_types(name) for name in names if name not in tiled]
+                for item_type in sorted(
+                    set(
+                        item_type
+                        for name in tiled
+                        for item_type in zip_item_types(name) or ()
+                    )
+                ):
+                    if (
+                        item_type in written
+                        or (year, item_type) in submitted
+                        or any(
+                            item_types is None or item_type in item_types
+                            for item_types in untiled
+                        )
+                    ):
+                        continue
+                    future = executors[Step.Items].submit(
+                        _append_items,
+                        items_directory / f"{year}.ndjson",
+                        [
+                            stem
+                            for name in tiled
+                            for stem in state.tiled[name]
+                            if Metadata.from_href(stem).item_type == item_type
+                        ],
+                        tiles_directory,
+                        fast,
+                        item_workers,
+                    )
+                    pending[future] = (Step.Items, (year, item_type))
+                    submitted.add((year, item_type))
+                if (
+                    not untiled
+                    and not any(year == key[0] for key in submitted)
+                    and all(
+                        item_type in written
+                        for name in tiled
+                        for item_type in zip_item_types(name) or ()
+                    )
+                ):
+                    (items_directory / f"{year}.ndjson").touch()
+                    state.items.add(year)
+                    logger.info(f"Wrote the items for {year}")
+
+        for year, names in names_by_year.items():
+            if year in state.items:
+                continue
+            for name in names:
+                if name in state.tiled:
+                    continue
+                elif (zips_directory / name).exists():
+                    submit_tile(name)
+                else:
+                    future = executors[Step.Download].submit(
+                        download_file,
+                        session,
+                        urls[name],
+                        zips_directory / name,
+                        None,
+                        progress,
+                    )
+                    pending[future] = (Step.Download, name)
+        submit_ready_items()
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, key = pending.pop(future)
+                    result: Any = future.result()
+                    if step == Step.Download:
+                        state.downloaded.add(key)
+                        submit_tile(key)
+                    elif step == Step.Tile:
+                        state.tiled[key] = result
+                        submit_ready_items()
+                    else:
+                        year, item_type = key
+                        state.item_types.setdefault(year, list()).append(item_type)
+                        state.item_bytes[year] = result.stat().st_size
+                        logger.info(f"Appended the {item_type} items to {result}")
+                        submit_ready_items()
+                    state.save()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    return [items_directory / f"{year}.ndjson" for year in years]
+
+
+def geotiffs(infile: Path) -> List[str]:
+    """Returns the names of the CDL GeoTIFFs in a zipfile.
+
+    Other files, and GeoTIFFs whose names aren't CDL file names, are skipped.
+    """
+    names = list()
+    with zipfile.ZipFile(infile) as zip_file:
+        for name in zip_file.namelist():
+            if not name.lower().endswith(".tif"):
+                continue
+            try:
+                Metadata.from_href(name)
+            except ValueError:
+                logger.warning(f"Skipping {name} in {infile}, not a CDL file name")
+                continue
+            names.append(name)
+    return names
+
+
+def _tile_zip(
+    infile: Path,
+    directory: Path,
+    size: int,
+    max_workers: int,
+    progress: Optional[ProgressCallback],
+) -> List[str]:
+    """Tiles every GeoTIFF in a zipfile, returning their stems."""
+    stems = list()
+    for member in geotiffs(infile):
+        tile.tile_zipfile(
+            infile,
+            directory,
+            size,
+            max_workers=max_workers,
+            progress=progress,
+            member=member,
+        )
+        stems.append(Path(member).stem)
+    return stems
+
+
+def _guess_item_types(name: str) -> Optional[Set[str]]:
+    """Returns the item types a zipfile (by name) holds, if they're known."""
+    if name.lower().startswith("crop_frequency_"):
+        return {"frequency"}
+    try:
+        return {Metadata.from_href(name.lower()).item_type}
+    except ValueError:
+        return None
+
+
+def _append_items(
+    path: Path,
+    stems: List[str],
+    tiles_directory: Path,
+    fast: bool,
+    max_workers: int,
+) -> Path:
+    """Appends the items of the tiles of some GeoTIFFs (by stem) to ndjson.
+
+    The items are written to a file of their own first, so that the appended
+    file only ever grows by whole items.
+    """
+    hrefs: List[str] = list()
+    for stem in stems:
+        manifest = Manifest.for_stem(tiles_directory, stem)
+        hrefs.extend(str(tiles_directory / name) for name in sorted(manifest.completed))
+    group = path.with_name(path.name + ".group")
+    export.write_ndjson(
+        stac.iter_items_from_tiles(hrefs, fast=fast, max_workers=max_workers), group
+    )
+    try:
+        with open(group, "rb") as source, open(path, "ab") as target:
+            shutil.copyfileobj(source, target)
+    finally:
+        group.unlink()
+    return path
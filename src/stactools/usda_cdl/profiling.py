@@ -0,0 +1,144 @@
+import contextlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .constants import StrEnum
+
+MEGABYTE = 1024**2
+
+
+class Stage(StrEnum):
+    """The stages of tiling, as timed for profiling.
+
+    Plan happens once per source; the others happen once per tile, except
+    that a strip read is timed once per strip.
+    """
+
+    Plan = "plan"
+    Read = "read"
+    Check = "check"
+    Histogram = "histogram"
+    Colormap = "colormap"
+    Write = "write"
+    Copy = "copy"
+    Checksum = "checksum"
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    """How long one stage took for one tile (or strip, or source)."""
+
+    stage: Stage
+    name: str
+    """The tile file name, or what else was timed (e.g. a strip or source)."""
+
+    seconds: float
+    nbytes: int = 0
+    """The number of bytes the stage read, held or wrote."""
+
+
+@contextlib.contextmanager
+def timed(
+    timings: Optional[List[StageTiming]], stage: Stage, name: str, nbytes: int = 0
+) -> Iterator[None]:
+    """Times the body of a with statement, appending the timing to timings.
+
+    Does nothing if timings is None.
+    """
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    yield
+    timings.append(StageTiming(stage, name, time.perf_counter() - start, nbytes))
+
+
+class Profile:
+    """Aggregates the stage timings of a tiling run.
+
+    Timings are collected by the tiling workers (threads or processes) and
+    handed to the profile as each tile's result arrives, so the callback is
+    always called on the thread that drives the tiling.
+    """
+
+    def __init__(
+        self, callback: Optional[Callable[[StageTiming], None]] = None
+    ) -> None:
+        self.callback = callback
+        self.tiles = 0
+        self.written = 0
+        self._timings: Dict[Stage, List[StageTiming]] = dict(
+            (stage, list()) for stage in Stage
+        )
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+
+    def add(self, timings: Iterable[StageTiming]) -> None:
+        """Adds timings, calling the callback (if any) for each of them."""
+        timings = list(timings)
+        with self._lock:
+            for timing in timings:
+                self._timings[timing.stage].append(timing)
+        if self.callback:
+            for timing in timings:
+                self.callback(timing)
+
+    def add_tile(self, timings: Iterable[StageTiming], written: bool) -> None:
+        """Adds the timings of one tile, which may or may not have been written."""
+        self.add(timings)
+        with self._lock:
+            self.tiles += 1
+            if written:
+                self.written += 1
+
+    def stop(self) -> None:
+        """Stops the wall clock that throughputs are computed against."""
+        self._end = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the aggregates: per-stage percentiles and overall throughput."""
+        with self._lock:
+            seconds = (self._end or time.perf_counter()) - self._start
+            stages = dict(
+                (stage.value, _aggregate(timings))
+                for stage, timings in self._timings.items()
+                if timings
+            )
+            read_bytes = sum(timing.nbytes for timing in self._timings[Stage.Read])
+            return {
+                "seconds": seconds,
+                "tiles": self.tiles,
+                "written": self.written,
+                "tiles_per_second": self.tiles / seconds if seconds else 0.0,
+                "read_mb_per_second": (
+                    read_bytes / MEGABYTE / seconds if seconds else 0.0
+                ),
+                "stages": stages,
+            }
+
+    def save(self, path: Path) -> None:
+        """Writes the report as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def _aggregate(timings: List[StageTiming]) -> Dict[str, Any]:
+    seconds = np.array([timing.seconds for timing in timings])
+    nbytes = sum(timing.nbytes for timing in timings)
+    total = float(seconds.sum())
+    return {
+        "count": len(timings),
+        "total_seconds": total,
+        "p50_seconds": float(np.percentile(seconds, 50)),
+        "p95_seconds": float(np.percentile(seconds, 95)),
+        "max_seconds": float(seconds.max()),
+        "bytes": nbytes,
+        "mb_per_second": nbytes / MEGABYTE / total if total else 0.0,
+    }
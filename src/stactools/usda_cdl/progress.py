@@ -0,0 +1,214 @@
+import collections
+import threading
+import time
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Callable, Deque, Dict, Optional, Tuple, Type
+
+from tqdm import tqdm
+
+RATE_WINDOW_SECONDS = 10.0
+EMIT_INTERVAL_SECONDS = 0.1
+
+
+@dataclass(frozen=True)
+class Progress:
+    """A snapshot of the progress of one tiling run or download.
+
+    Tiling counts tiles (windows); downloads count bytes.
+    """
+
+    description: str
+    """What is being worked on, e.g. the source file stem or zip file name."""
+
+    unit: str
+    """The unit of total and completed: "tile" or "B"."""
+
+    total: Optional[int]
+    """How many units there are to do, if known."""
+
+    completed: int
+    """How many units are done, including skipped ones."""
+
+    skipped: int = 0
+    """How many of the completed tiles were empty, so weren't written."""
+
+    in_flight: int = 0
+    """How many tiles have been handed to workers but aren't done yet."""
+
+    bytes_written: int = 0
+    """How many bytes of tiles (or of the download) have been written."""
+
+    elapsed: float = 0.0
+    """Seconds since the work started."""
+
+    rate: float = 0.0
+    """Current throughput, in units per second over the last few seconds."""
+
+    bytes_per_second: float = 0.0
+    """Current write throughput, over the last few seconds."""
+
+    @property
+    def done(self) -> bool:
+        """Whether all units are done."""
+        return self.total is not None and self.completed >= self.total
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until done, at the current rate, if known."""
+        if self.total is None or not self.rate:
+            return None
+        return max(self.total - self.completed, 0) / self.rate
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+class Tracker:
+    """Counts progress and emits :py:class:`Progress` snapshots to a callback.
+
+    Snapshots are emitted at most every EMIT_INTERVAL_SECONDS, except that the
+    first and the final ones always are, so that per-chunk updates (e.g. while
+    downloading) don't flood the callback.
+    """
+
+    def __init__(
+        self,
+        description: str,
+        total: Optional[int],
+        unit: str,
+        callback: Optional[ProgressCallback],
+    ) -> None:
+        self.description = description
+        self.total = total
+        self.unit = unit
+        self.callback = callback
+        self.completed = 0
+        self.skipped = 0
+        self.submitted = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._last_emit: Optional[float] = None
+        self._last_emitted: Optional[int] = None
+        self._samples: Deque[Tuple[float, int, int]] = collections.deque()
+        self._samples.append((self._start, 0, 0))
+
+    def submit(self, count: int = 1) -> None:
+        """Records that count more units were handed to workers."""
+        with self._lock:
+            self.submitted += count
+
+    def update(
+        self, completed: int = 1, skipped: int = 0, bytes_written: int = 0
+    ) -> None:
+        """Records completed units, and emits a snapshot if it's time to."""
+        with self._lock:
+            self.completed += completed
+            self.skipped += skipped
+            self.bytes_written += bytes_written
+            now = time.perf_counter()
+            self._samples.append((now, self.completed, self.bytes_written))
+            while now - self._samples[0][0] > RATE_WINDOW_SECONDS:
+                self._samples.popleft()
+            due = (
+                self._last_emit is None
+                or now - self._last_emit >= EMIT_INTERVAL_SECONDS
+                or (self.total is not None and self.completed >= self.total)
+            )
+            if due:
+                self._last_emit = now
+        if due:
+            self.emit()
+
+    def snapshot(self) -> Progress:
+        """Returns the current progress."""
+        with self._lock:
+            now = time.perf_counter()
+            then, completed, bytes_written = self._samples[0]
+            if len(self._samples) < 2 or now <= then:
+                then, completed, bytes_written = self._start, 0, 0
+            seconds = now - then
+            return Progress(
+                description=self.description,
+                unit=self.unit,
+                total=self.total,
+                completed=self.completed,
+                skipped=self.skipped,
+                in_flight=max(self.submitted - self.completed, 0),
+                bytes_written=self.bytes_written,
+                elapsed=now - self._start,
+                rate=(self.completed - completed) / seconds if seconds else 0.0,
+                bytes_per_second=(
+                    (self.bytes_written - bytes_written) / seconds if seconds else 0.0
+                ),
+            )
+
+    def emit(self) -> None:
+        """Sends the current progress to the callback, if there is one."""
+        if self.callback:
+            progress = self.snapshot()
+            self._last_emitted = progress.completed
+            self.callback(progress)
+
+    def finish(self) -> None:
+        """Emits the final progress, unless it has already been emitted."""
+        if self._last_emitted != self.completed:
+            self.emit()
+
+
+class ProgressBar:
+    """A progress callback that renders each description as a tqdm bar.
+
+    Bars are closed when their work is done, or when this is closed. It may
+    be called from several threads, e.g. by concurrent downloads.
+    """
+
+    def __init__(self) -> None:
+        self._bars: Dict[str, tqdm] = dict()
+        self._lock = threading.Lock()
+
+    def __call__(self, progress: Progress) -> None:
+        with self._lock:
+            self._update(progress)
+
+    def _update(self, progress: Progress) -> None:
+        bar = self._bars.get(progress.description)
+        if bar is None:
+            bar = tqdm(
+                desc=progress.description,
+                total=progress.total,
+                unit=progress.unit,
+                unit_scale=progress.unit == "B",
+                miniters=1,
+            )
+            self._bars[progress.description] = bar
+        if progress.unit != "B":
+            bar.set_postfix(
+                skipped=progress.skipped,
+                in_flight=progress.in_flight,
+                written=tqdm.format_sizeof(progress.bytes_written, "B", 1024),
+                refresh=False,
+            )
+        bar.update(progress.completed - bar.n)
+        if progress.done:
+            bar.close()
+            del self._bars[progress.description]
+
+    def close(self) -> None:
+        """Closes any bars that are still open."""
+        with self._lock:
+            for bar in self._bars.values():
+                bar.close()
+            self._bars = dict()
+
+    def __enter__(self) -> "ProgressBar":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
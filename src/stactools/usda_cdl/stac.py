@@ -1,12 +1,43 @@
-from collections import defaultdict
-from typing import DefaultDict, List, Optional
+import copy
+import datetime
+import functools
+import json
+import os.path
+import random
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    DefaultDict,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+import shapely.geometry
 import stactools.core.create
-from pystac import Collection, Item, MediaType
+import stactools.core.projection
+from pystac import (
+    Asset,
+    Catalog,
+    CatalogType,
+    Collection,
+    Item,
+    Link,
+    MediaType,
+    RelType,
+)
 from pystac.extensions.item_assets import AssetDefinition, ItemAssetsExtension
-from pystac.extensions.raster import RasterExtension
+from pystac.extensions.projection import ProjectionExtension
+from pystac.extensions.raster import RasterBand, RasterExtension
+from rasterio.crs import CRS
 from stactools.core.io import ReadHrefModifier
 
+from . import histogram, layout
+from .concurrency import IN_FLIGHT_PER_WORKER, Engine, bounded_map
 from .constants import (
     ASSET_CLASSES,
     CLASSIFICATION_SCHEMA,
@@ -14,36 +45,59 @@ from .constants import (
     COLLECTION_DESCRIPTION,
     COLLECTION_ID,
     COLLECTION_TITLE,
+    EPSG,
     EXTENT,
     KEYWORDS,
     LANDING_PAGE_LINK,
     LICENSE,
     LICENSE_LINK,
     PROVIDERS,
+    RESOLUTION,
     AssetType,
 )
+from .headers import HeaderCache, RasterHeader
 from .metadata import Metadata
 
 
 def create_item(
-    href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    href: str,
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    fast: bool = False,
+    cache: Optional[HeaderCache] = None,
 ) -> Item:
-    """Creates a CDL item from one COG href."""
+    """Creates a CDL item from one COG href.
+
+    If the COG has a histogram sidecar (see
+    :py:mod:`stactools.usda_cdl.histogram`), its pixel counts are added to
+    the asset's classes, and its histogram and statistics to the asset's
+    raster band.
+
+    If ``fast`` is True and the COG is a tile, its geometry, bbox and
+    projection information are computed from its file name instead of read
+    from the COG, so the COG isn't opened at all.
+
+    If a ``cache`` is given, the COG's header is looked up in it, and only
+    read (and cached) if the COG is new or has changed since it was cached.
+    """
     metadata = Metadata.from_href(href)
-    return _create_item_from_metadata(metadata, read_href_modifier)
+    return _create_item_from_metadata(metadata, read_href_modifier, fast, cache)
 
 
 def create_item_from_hrefs(
-    hrefs: List[str], read_href_modifier: Optional[ReadHrefModifier] = None
+    hrefs: List[str],
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    fast: bool = False,
+    cache: Optional[HeaderCache] = None,
 ) -> Item:
     """Creates a CDL item from multiple COG hrefs.
 
     If the assets at those hrefs don't have the same geometry or time window,
-    this will raise a ValueError.
+    this will raise a ValueError. ``fast`` and ``cache`` are as for
+    :py:func:`create_item`.
     """
 
     metadatas = [Metadata.from_href(href) for href in hrefs]
-    return _create_item_from_metadatas(metadatas, read_href_modifier)
+    return _create_item_from_metadatas(metadatas, read_href_modifier, fast, cache)
 
 
 def create_collection() -> Collection:
@@ -83,12 +137,158 @@ def create_collection() -> Collection:
     return collection
 
 
+def update_collection(
+    collection_href: str, items: Iterable[Item], replace: bool = False
+) -> List[str]:
+    """Adds new items, e.g. a new year's, to a saved collection, in place.
+
+    Only the new items, the sub-catalogs they're added to and the collection
+    are written: the collection's existing items are neither read nor
+    rewritten. Items whose ids are already in the collection (or any of its
+    sub-catalogs) are skipped, unless ``replace`` is True, in which case
+    they're rewritten. The collection's temporal and spatial extents are
+    extended to cover the new items, and its ``usda_cdl:type`` summary to
+    include their types.
+
+    If the collection has sub-catalogs, i.e. it was saved with the
+    hierarchical layout (see :py:mod:`stactools.usda_cdl.layout`), new items
+    are put in the sub-catalogs that :py:func:`stactools.usda_cdl.layout.partition`
+    gives them, which are created if they don't exist yet; the spatial
+    buckets' size is read from the existing buckets. Otherwise, they're
+    linked from the collection itself. New items and sub-catalogs are laid
+    out like ``Collection.normalize_hrefs`` does. If the collection is
+    self-contained, the new items' asset hrefs are made relative.
+
+    Returns the hrefs of the files written, the collection's last.
+    """
+    collection = Collection.from_file(collection_href)
+    catalog_type = collection.catalog_type
+    catalogs: Dict[str, Catalog] = dict()
+    links: Dict[str, Tuple[Catalog, Link]] = dict()
+    bucket_size = layout.DEFAULT_BUCKET_SIZE
+    queue: Deque[Tuple[Catalog, int]] = deque([(collection, 0)])
+    while queue:
+        catalog, depth = queue.popleft()
+        if depth:
+            catalogs[catalog.id] = catalog
+        if depth == 3:
+            bucket_size = int(catalog.id.split("_")[-1])
+        for link in catalog.get_links(RelType.ITEM):
+            links[os.path.splitext(os.path.basename(link.href))[0]] = (catalog, link)
+        queue.extend((child, depth + 1) for child in catalog.get_children())
+    hierarchical = bool(catalogs)
+
+    interval = collection.extent.temporal.intervals[0]
+    bbox = collection.extent.spatial.bboxes[0]
+    item_types = list(collection.summaries.get_list("usda_cdl:type") or [])
+    written = list()
+    touched: Dict[str, Catalog] = dict()
+    for item in items:
+        if item.id in links:
+            if not replace:
+                continue
+            catalog, link = links[item.id]
+            catalog.links.remove(link)
+            touched[catalog.id] = catalog
+        parent: Catalog = collection
+        if hierarchical:
+            keys: List[str] = list()
+            for key, description in layout.partition(item, bucket_size):
+                keys.append(key)
+                catalog_id = "_".join(keys)
+                child = catalogs.get(catalog_id)
+                if child is None:
+                    child = Catalog(catalog_id, description)
+                    parent.add_child(child)
+                    catalogs[catalog_id] = child
+                    touched[parent.id] = parent
+                parent = child
+        links[item.id] = (parent, parent.add_item(item))
+        touched[parent.id] = parent
+        if catalog_type == CatalogType.SELF_CONTAINED:
+            item.make_asset_hrefs_relative()
+        item.save_object(
+            include_self_link=layout.include_self_link(item, collection, catalog_type)
+        )
+        written.append(item.get_self_href())
+
+        start = item.common_metadata.start_datetime or item.datetime
+        end = item.common_metadata.end_datetime or item.datetime
+        if interval[0] and start and start < interval[0]:
+            interval[0] = start
+        if interval[1] and end and end > interval[1]:
+            interval[1] = end
+        if item.bbox:
+            bbox[:2] = [min(a, b) for a, b in zip(bbox[:2], item.bbox[:2])]
+            bbox[2:] = [max(a, b) for a, b in zip(bbox[2:], item.bbox[2:])]
+        item_type = item.properties.get("usda_cdl:type")
+        if item_type and item_type not in item_types:
+            item_types.append(item_type)
+
+    if not written:
+        return []
+    touched.pop(collection.id, None)
+    for catalog in touched.values():
+        catalog.save_object(
+            include_self_link=layout.include_self_link(
+                catalog, collection, catalog_type
+            )
+        )
+        written.append(catalog.get_self_href())
+    collection.summaries.add("usda_cdl:type", item_types)
+    collection.save_object(
+        include_self_link=layout.include_self_link(collection, collection, catalog_type)
+    )
+    written.append(collection.get_self_href())
+    return [href for href in written if href]
+
+
 def create_items_from_tiles(
-    tiles: List[str], read_href_modifier: Optional[ReadHrefModifier] = None
+    tiles: List[str],
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    fast: bool = False,
+    verify: int = 0,
+    max_workers: int = 1,
+    engine: Engine = Engine.Thread,
+    cache: Optional[HeaderCache] = None,
 ) -> List[Item]:
     """Creates multiple items from tiles.
 
     Tiles are grouped by item id, then merged into a single item.
+
+    If ``fast`` is True, the tiles aren't opened (see :py:func:`create_item`).
+    To check that the tiles really are where their names say, ``verify`` of
+    them, picked at random, are opened and compared with what their names
+    say; a ValueError is raised if any of them differ.
+
+    Items are created by ``max_workers`` workers (see
+    :py:func:`iter_items_from_tiles`). Tiles that aren't created from their
+    names have their headers looked up in the ``cache``, if one is given (see
+    :py:func:`create_item`).
+    """
+    return list(
+        iter_items_from_tiles(
+            tiles, read_href_modifier, fast, verify, max_workers, engine, cache
+        )
+    )
+
+
+def iter_items_from_tiles(
+    tiles: List[str],
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    fast: bool = False,
+    verify: int = 0,
+    max_workers: int = 1,
+    engine: Engine = Engine.Thread,
+    cache: Optional[HeaderCache] = None,
+) -> Iterator[Item]:
+    """Creates items from tiles, yielding each one as soon as it's ready.
+
+    Like :py:func:`create_items_from_tiles`, but items are yielded one by
+    one, in the order their ids first appear in ``tiles``. With more than
+    one worker, items are created by a pool of threads or processes (in
+    which case ``read_href_modifier`` must be picklable), with a bounded
+    number of them in flight so that finished items don't pile up.
     """
     metadatas: DefaultDict[str, List[Metadata]] = defaultdict(list)
     for tile in tiles:
@@ -96,18 +296,72 @@ def create_items_from_tiles(
         if not metadata.tile:
             raise ValueError(f"Not a tile: {metadata.href}")
         metadatas[metadata.item_id].append(metadata)
-    items = list()
-    for m in metadatas.values():
-        item = _create_item_from_metadatas(m, read_href_modifier)
-        items.append(item)
-    return items
+    if fast and verify:
+        for tile in random.sample(tiles, min(verify, len(tiles))):
+            verify_tile(tile, read_href_modifier)
+    create = functools.partial(
+        _create_item_from_metadatas,
+        read_href_modifier=read_href_modifier,
+        fast=fast,
+        cache=cache,
+    )
+    if max_workers <= 1:
+        yield from map(create, metadatas.values())
+        return
+    executor: Executor
+    if engine == Engine.Process:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    with executor:
+        yield from bounded_map(
+            executor,
+            create,
+            metadatas.values(),
+            max_workers * IN_FLIGHT_PER_WORKER,
+            ordered=True,
+        )
+
+
+def verify_tile(
+    href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+) -> None:
+    """Checks that a tile's geometry and projection match its file name.
+
+    Raises a ValueError if they don't, or if the href isn't a tile.
+    """
+    metadata = Metadata.from_href(href)
+    if not metadata.tile:
+        raise ValueError(f"Not a tile: {href}")
+    expected = _create_tile_item_from_name(metadata).to_dict()
+    actual = stactools.core.create.item(
+        href, read_href_modifier=read_href_modifier
+    ).to_dict()
+    for key in ["geometry", "bbox", "proj:code", "proj:transform", "proj:shape"]:
+        # Round trip through JSON, so tuples and lists compare equal
+        expected_value, actual_value = json.loads(
+            json.dumps(
+                [
+                    expected.get(key, expected["properties"].get(key)),
+                    actual.get(key, actual["properties"].get(key)),
+                ]
+            )
+        )
+        if expected_value != actual_value:
+            raise ValueError(
+                f"Tile {href} doesn't match its name: {key} is {actual_value}, "
+                f"expected {expected_value}"
+            )
 
 
 def _create_item_from_metadatas(
-    metadatas: List[Metadata], read_href_modifier: Optional[ReadHrefModifier]
+    metadatas: List[Metadata],
+    read_href_modifier: Optional[ReadHrefModifier],
+    fast: bool = False,
+    cache: Optional[HeaderCache] = None,
 ) -> Item:
     items = [
-        _create_item_from_metadata(metadata, read_href_modifier)
+        _create_item_from_metadata(metadata, read_href_modifier, fast, cache)
         for metadata in metadatas
     ]
     if not items:
@@ -144,11 +398,21 @@ def _create_item_from_metadatas(
 
 
 def _create_item_from_metadata(
-    metadata: Metadata, read_href_modifier: Optional[ReadHrefModifier]
+    metadata: Metadata,
+    read_href_modifier: Optional[ReadHrefModifier],
+    fast: bool = False,
+    cache: Optional[HeaderCache] = None,
 ) -> Item:
-    item = stactools.core.create.item(
-        metadata.href, read_href_modifier=read_href_modifier
-    )
+    if fast and metadata.tile:
+        item = _create_tile_item_from_name(metadata)
+    elif cache:
+        item = _create_item_from_header(
+            metadata.href, cache.get(metadata.href, read_href_modifier)
+        )
+    else:
+        item = stactools.core.create.item(
+            metadata.href, read_href_modifier=read_href_modifier
+        )
     item.id = metadata.item_id
 
     item.common_metadata.start_datetime = metadata.start_datetime
@@ -159,14 +423,73 @@ def _create_item_from_metadata(
     asset = item.assets.pop("data")
     asset.title = metadata.cog_title
     asset.media_type = MediaType.COG
+    counts = histogram.read(metadata.href, read_href_modifier)
     classes = metadata.classes
     if classes:
+        if counts:
+            classes = histogram.classes_with_counts(classes, counts)
         asset.extra_fields["classification:classes"] = classes
         item.stac_extensions.append(CLASSIFICATION_SCHEMA)
     item.assets[metadata.asset_type.value] = asset
 
     asset = item.assets[metadata.asset_type.value]
     raster = RasterExtension.ext(asset, add_if_missing=True)
-    raster.bands = metadata.raster_bands
+    bands = metadata.raster_bands
+    if counts:
+        # The bands are shared constants, so don't modify them in place
+        bands = [RasterBand(copy.deepcopy(band.to_dict())) for band in bands]
+        for band in bands:
+            band.histogram = histogram.histogram(counts)
+            band.statistics = histogram.statistics(counts, band.nodata)
+    raster.bands = bands
+
+    return item
+
+
+def _create_tile_item_from_name(metadata: Metadata) -> Item:
+    """Creates the item stactools would, without opening the tile.
 
+    Every tile is on the CDL's fixed 30 m grid, so its bounds (from its name)
+    are enough to compute everything ``stactools.core.create.item`` reads.
+    """
+    bounds = metadata.tile_bounds
+    if bounds is None:
+        raise ValueError(f"Not a tile: {metadata.href}")
+    left, bottom, right, top = bounds
+    header = RasterHeader(
+        epsg=EPSG,
+        wkt2=None,
+        bounds=bounds,
+        transform=[float(RESOLUTION), 0.0, left, 0.0, -float(RESOLUTION), top],
+        shape=(
+            round((top - bottom) / RESOLUTION),
+            round((right - left) / RESOLUTION),
+        ),
+    )
+    return _create_item_from_header(metadata.href, header)
+
+
+def _create_item_from_header(href: str, header: RasterHeader) -> Item:
+    """Creates the item ``stactools.core.create.item`` would, from a header."""
+    geometry = stactools.core.projection.reproject_shape(
+        header.crs,
+        CRS.from_epsg(4326),
+        shapely.geometry.box(*header.bounds),
+        precision=6,
+    )
+    item = Item(
+        id=os.path.splitext(os.path.basename(href))[0],
+        geometry=shapely.geometry.mapping(geometry),
+        bbox=list(geometry.bounds),
+        datetime=datetime.datetime.now(),
+        properties={},
+    )
+    projection = ProjectionExtension.ext(item, add_if_missing=True)
+    if header.epsg:
+        projection.epsg = header.epsg
+    else:
+        projection.wkt2 = header.wkt2
+    projection.transform = list(header.transform)
+    projection.shape = list(header.shape)
+    item.add_asset("data", Asset(href=href, roles=["data"]))
     return item
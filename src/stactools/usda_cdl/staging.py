@@ -0,0 +1,134 @@
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # e.g. Windows
+    fcntl = None  # type: ignore
+
+DEFAULT_STAGING_THRESHOLD = 1024**3  # bytes, uncompressed
+STAGING_CHUNK_SIZE = 16 * 1024**2  # bytes
+logger = logging.getLogger(__name__)
+
+
+def should_stage(
+    infile: Path, stage: Optional[bool] = None, member: Optional[str] = None
+) -> bool:
+    """Should this zipped GeoTIFF be extracted before tiling?
+
+    If ``stage`` is None, the GeoTIFF is staged if it is at least
+    DEFAULT_STAGING_THRESHOLD bytes uncompressed. ``member`` is the GeoTIFF's
+    name in the zipfile, by default the zipfile's stem with a .tif suffix.
+    """
+    if stage is not None:
+        return stage
+    return _member(infile, member).file_size >= DEFAULT_STAGING_THRESHOLD
+
+
+@contextlib.contextmanager
+def staged_geotiff(
+    infile: Path,
+    scratch_directory: Optional[Path] = None,
+    keep: bool = False,
+    member: Optional[str] = None,
+) -> Iterator[Path]:
+    """Extracts the GeoTIFF from a CDL zipfile into a scratch directory.
+
+    Windowed reads through ``/vsizip`` have to seek inside a deflated zip
+    member, which is very slow for the multi-GB CDL files, so we stream the
+    member out once and tile from the extracted file instead.
+
+    Unless ``keep`` is True, the GeoTIFF is extracted into a temporary
+    directory of its own inside the scratch directory, which is removed on
+    exit, so that concurrent runs (e.g. shards on one host) never share a
+    staged file. A kept file is extracted into the scratch directory itself;
+    if it matches the member's size, and is newer than the zipfile, it is
+    reused by later runs, and concurrent runs take turns to stage it (where
+    file locks are available). ``member`` is as for :py:func:`should_stage`.
+    """
+    info = _member(infile, member)
+    directory = Path(scratch_directory or tempfile.gettempdir())
+    os.makedirs(str(directory), exist_ok=True)
+    name = Path(info.filename).name
+    with contextlib.ExitStack() as stack:
+        if keep:
+            path = directory / name
+            stack.enter_context(_locked(path.with_name(name + ".lock")))
+        else:
+            temporary = stack.enter_context(tempfile.TemporaryDirectory(dir=directory))
+            path = Path(temporary) / name
+        if _is_staged(infile, info, path):
+            logger.info(f"Reusing staged {path}")
+        else:
+            _stage(infile, info, path)
+        if keep:
+            stack.close()
+        yield path
+
+
+def _stage(infile: Path, member: zipfile.ZipInfo, path: Path) -> None:
+    """Extracts a zip member to a path, through a partial file of its own."""
+    free = shutil.disk_usage(str(path.parent)).free
+    if free < member.file_size:
+        raise OSError(
+            f"Not enough space in {path.parent} to stage {infile}: "
+            f"{member.file_size} bytes needed, {free} available"
+        )
+    logger.info(f"Staging {infile} to {path}")
+    descriptor, partial = tempfile.mkstemp(
+        dir=str(path.parent), prefix=f"{path.name}.", suffix=".part"
+    )
+    try:
+        with open(descriptor, "wb") as target, zipfile.ZipFile(infile) as zip_file:
+            with zip_file.open(member) as source:
+                shutil.copyfileobj(source, target, STAGING_CHUNK_SIZE)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+
+
+@contextlib.contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Holds an exclusive lock on a lock file, where file locks are available.
+
+    The lock file is removed before the lock is released, so lock files
+    don't pile up in the scratch directory. A run that was waiting on a lock
+    file that has since been removed tries again with a new one.
+    """
+    if fcntl is None:
+        yield
+        return
+    while True:
+        lock_file = open(path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+    try:
+        yield
+    finally:
+        os.unlink(path)
+        lock_file.close()
+
+
+def _member(infile: Path, member: Optional[str] = None) -> zipfile.ZipInfo:
+    with zipfile.ZipFile(infile) as zip_file:
+        return zip_file.getinfo(member or f"{infile.stem}.tif")
+
+
+def _is_staged(infile: Path, member: zipfile.ZipInfo, path: Path) -> bool:
+    return (
+        path.exists()
+        and path.stat().st_size == member.file_size
+        and path.stat().st_mtime >= infile.stat().st_mtime
+    )
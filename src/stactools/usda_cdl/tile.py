@@ -1,22 +1,95 @@
+import contextlib
+import functools
 import logging
+import math
+import os
+import queue
 import threading
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
+import numpy as np
 import rasterio
 import rasterio.shutil
 import rasterio.windows
-from rasterio import DatasetReader, MemoryFile
+from affine import Affine
+from numpy.typing import NDArray
+from rasterio import DatasetReader
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
 
+from . import histogram, staging
+from .concurrency import IN_FLIGHT_PER_WORKER
+from .concurrency import Engine as Engine
+from .concurrency import bounded_map
+from .constants import RESOLUTION, AssetType, StrEnum
+from .manifest import Manifest, checksum, manifest_name
 from .metadata import Metadata
+from .profiling import Profile, Stage, StageTiming, timed
+from .progress import ProgressCallback, Tracker
 
-RESOLUTION = 30
 DEFAULT_WINDOW_SIZE = 3000  # pixels
 DEFAULT_MAX_WORKERS = 8
+DEFAULT_READ_AHEAD = 1  # strips
+PROCESS_CHUNKS_PER_WORKER = 4
+READ_AHEAD_POLL_SECONDS = 0.1
 logger = logging.getLogger(__name__)
 
+R = TypeVar("R")
+T = TypeVar("T")
+
+# The source dataset opened by each worker process of the process engine.
+_process_dataset: Optional[DatasetReader] = None
+
+
+class EmptyMask(StrEnum):
+    """Which layers decide that a window is empty when co-tiling layers."""
+
+    Reference = "reference"
+    Union = "union"
+
+
+class ConstantTiles(StrEnum):
+    """What to do with tiles that hold a single (non-zero) value.
+
+    Encode writes them like any other tile. Fast writes them with
+    nearest-neighbour overviews, which are identical to mode or average
+    overviews for a constant tile but much cheaper to compute. Index doesn't
+    write them at all, but records their value in the tiling manifest.
+    """
+
+    Encode = "encode"
+    Fast = "fast"
+    Index = "index"
+
+
+class Schedule(StrEnum):
+    """How windows are read from the source.
+
+    The window schedule reads every window separately. The strip schedule
+    reads each horizontal strip of windows with one read, which avoids
+    decompressing stripped or zipped sources once per window, at the cost of
+    holding a strip (``size`` rows of the source) in memory. With the thread
+    engine the next strips are read ahead while the current one is encoded.
+    """
+
+    Window = "window"
+    Strip = "strip"
+
 
 @dataclass
 class Window:
@@ -52,25 +125,217 @@ class Window:
         )
 
 
+@dataclass
+class TileResult:
+    """The outcome of tiling one window."""
+
+    name: str
+    """The tile's file name."""
+
+    path: Optional[Path] = None
+    """The tile's path, or None if the window was empty."""
+
+    checksum: Optional[str] = None
+    """The hex SHA-256 digest of the tile file."""
+
+    constant: Optional[int] = None
+    """The tile's value, if it only holds one value."""
+
+    timings: List[StageTiming] = field(default_factory=list)
+    """How long each stage of tiling this window took."""
+
+
+@dataclass
+class TileWriter:
+    """Writes the tiles of one source file into a directory.
+
+    If histograms is True, each tile's per-value pixel counts are written to
+    a sidecar next to it (see :py:mod:`stactools.usda_cdl.histogram`), from
+    the data already in memory.
+
+    The source's transform and CRS are copied into the writer, so that
+    writing never touches a dataset handle that another thread may be
+    reading from. Writers are picklable, so that they can be sent to worker
+    processes.
+    """
+
+    metadata: Metadata
+    directory: Path
+    transform: Affine
+    """The source dataset's transform."""
+
+    crs: CRS
+    """The source dataset's CRS."""
+
+    constant_tiles: ConstantTiles = ConstantTiles.Encode
+    histograms: bool = True
+
+    def name(self, window: Window) -> str:
+        """Returns the file name of a window's tile."""
+        return _tile_file_name(self.metadata, window)
+
+    def __call__(
+        self,
+        window: Window,
+        data: NDArray[np.uint8],
+        timings: Optional[List[StageTiming]] = None,
+    ) -> TileResult:
+        """Writes a window's data, read from the source, as a COG.
+
+        Empty windows aren't written. The timings of earlier stages (e.g. the
+        read) can be passed in to be returned with the result.
+        """
+        name = self.name(window)
+        timings = list(timings or ())
+        with timed(timings, Stage.Check, name, data.nbytes):
+            empty = not data.any()
+            constant = None if empty else _constant_value(data)
+        if empty:
+            return TileResult(name, timings=timings)
+        if constant is not None and self.constant_tiles == ConstantTiles.Index:
+            return TileResult(name, constant=constant, timings=timings)
+        path = self.directory / name
+        # Write to a temporary name so that a partially-written tile is never
+        # mistaken for a complete one.
+        partial = path.with_name(path.name + ".part")
+        try:
+            _write_cog(
+                partial,
+                data,
+                rasterio.windows.transform(window.rasterio_window(), self.transform),
+                self.crs,
+                self.metadata,
+                window.width,
+                window.height,
+                fast=constant is not None and self.constant_tiles == ConstantTiles.Fast,
+                timings=timings,
+                name=name,
+            )
+            with timed(timings, Stage.Checksum, name, partial.stat().st_size):
+                tile_checksum = checksum(partial)
+            if self.histograms:
+                # Written before the tile, so that a tile always has its sidecar
+                with timed(timings, Stage.Histogram, name, data.nbytes):
+                    histogram.write(path, histogram.compute(data))
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        return TileResult(name, path, tile_checksum, constant, timings)
+
+
+class ReaderPool:
+    """A pool of rasterio dataset handles, one per thread, all on the same href.
+
+    GDAL dataset handles aren't safe to share between threads, so rather than
+    serializing every read through one handle, each worker thread lazily opens
+    its own handle the first time it reads and then reuses it for every
+    subsequent window. All handles are closed when the pool is closed.
+    """
+
+    def __init__(self, href: str) -> None:
+        self.href = href
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._datasets: List[DatasetReader] = list()
+
+    def get(self) -> DatasetReader:
+        """Returns the calling thread's dataset handle, opening it if needed."""
+        dataset: Optional[DatasetReader] = getattr(self._local, "dataset", None)
+        if dataset is None:
+            dataset = rasterio.open(self.href)
+            self._local.dataset = dataset
+            with self._lock:
+                self._datasets.append(dataset)
+        return dataset
+
+    def close(self) -> None:
+        """Closes every dataset handle opened by this pool."""
+        with self._lock:
+            datasets = self._datasets
+            self._datasets = list()
+        for dataset in datasets:
+            dataset.close()
+
+    def __enter__(self) -> "ReaderPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
 def tile_zipfile(
     infile: Path,
     directory: Path,
     size: int = DEFAULT_WINDOW_SIZE,
     max_workers: int = DEFAULT_MAX_WORKERS,
     existing_tiles: Optional[List[str]] = None,
+    engine: Engine = Engine.Thread,
+    schedule: Schedule = Schedule.Window,
+    read_ahead: int = DEFAULT_READ_AHEAD,
+    max_in_flight: Optional[int] = None,
+    resume: bool = True,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    stage: Optional[bool] = None,
+    scratch_directory: Optional[Path] = None,
+    keep_staged: bool = False,
+    constant_tiles: ConstantTiles = ConstantTiles.Encode,
+    histograms: bool = True,
+    profile: Optional[Profile] = None,
+    progress: Optional[ProgressCallback] = None,
+    member: Optional[str] = None,
 ) -> List[Path]:
-    """Tiles an input GeoTIFF (wrapped in a zipfile)."""
+    """Tiles an input GeoTIFF (wrapped in a zipfile).
+
+    The GeoTIFF is the zipfile member named ``member``, by default the
+    zipfile's stem with a .tif suffix.
+
+    If ``stage`` is True, the GeoTIFF is first extracted into
+    ``scratch_directory`` (the system temporary directory by default) and
+    tiled from there; if it is None, only large GeoTIFFs are staged. See
+    :py:func:`stactools.usda_cdl.staging.staged_geotiff`. Otherwise this
+    behaves like :py:func:`tile_geotiff`.
+    """
     if infile.suffix != ".zip":
         raise ValueError(f"Infile should end in .zip: {infile}")
-    zip_path = f"zip://{infile}!/{infile.stem}.tif"
-    with rasterio.open(zip_path) as dataset:
+    member = member or f"{infile.stem}.tif"
+    with contextlib.ExitStack() as stack:
+        if staging.should_stage(infile, stage, member):
+            href = str(
+                stack.enter_context(
+                    staging.staged_geotiff(
+                        infile, scratch_directory, keep_staged, member
+                    )
+                )
+            )
+        else:
+            href = f"zip://{infile}!/{member}"
+        dataset = stack.enter_context(rasterio.open(href))
         return _tile_dataset(
             dataset,
-            Metadata.from_href(infile.stem),
+            href,
+            Metadata.from_href(Path(member).stem),
             directory,
             size,
             max_workers,
             existing_tiles or list(),
+            engine=engine,
+            schedule=schedule,
+            read_ahead=read_ahead,
+            max_in_flight=max_in_flight,
+            resume=resume,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            constant_tiles=constant_tiles,
+            histograms=histograms,
+            profile=profile,
+            progress=progress,
         )
 
 
@@ -80,78 +345,833 @@ def tile_geotiff(
     size: int = DEFAULT_WINDOW_SIZE,
     max_workers: int = DEFAULT_MAX_WORKERS,
     existing_tiles: Optional[List[str]] = None,
+    engine: Engine = Engine.Thread,
+    schedule: Schedule = Schedule.Window,
+    read_ahead: int = DEFAULT_READ_AHEAD,
+    max_in_flight: Optional[int] = None,
+    resume: bool = True,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    constant_tiles: ConstantTiles = ConstantTiles.Encode,
+    histograms: bool = True,
+    profile: Optional[Profile] = None,
+    progress: Optional[ProgressCallback] = None,
 ) -> List[Path]:
-    """Tiles an input GeoTIFF."""
+    """Tiles an input GeoTIFF.
+
+    Progress is recorded in a manifest in the destination directory (see
+    :py:class:`stactools.usda_cdl.manifest.Manifest`). If ``resume`` is True,
+    tiles and empty windows already recorded there are skipped.
+
+    To spread the work over several machines or containers, run once per
+    shard with the same ``shard_count`` and each ``shard_index`` from 0 to
+    ``shard_count - 1``; then merge the shards' manifests with
+    :py:func:`stactools.usda_cdl.manifest.merge`.
+
+    Tiles that hold a single non-zero value are handled according to
+    ``constant_tiles`` (see :py:class:`ConstantTiles`); the number of them
+    that took the fast or index path is logged. If ``histograms`` is True,
+    each tile gets a histogram sidecar, which
+    :py:func:`stactools.usda_cdl.stac.create_item` puts into the item.
+
+    If a :py:class:`stactools.usda_cdl.profiling.Profile` is given, the
+    timings of window planning and of every tile's stages are added to it.
+
+    If ``progress`` is given, it is called with
+    :py:class:`stactools.usda_cdl.progress.Progress` snapshots as tiles
+    complete.
+    """
     with rasterio.open(infile) as dataset:
         return _tile_dataset(
             dataset,
+            str(infile),
             Metadata.from_href(str(infile)),
             directory,
             size,
             max_workers,
             existing_tiles or list(),
+            engine=engine,
+            schedule=schedule,
+            read_ahead=read_ahead,
+            max_in_flight=max_in_flight,
+            resume=resume,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            constant_tiles=constant_tiles,
+            histograms=histograms,
+            profile=profile,
+            progress=progress,
         )
 
 
+def tile_many(
+    infiles: List[Path],
+    directory: Path,
+    size: int = DEFAULT_WINDOW_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_in_flight: Optional[int] = None,
+    empty_mask: EmptyMask = EmptyMask.Reference,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    constant_tiles: ConstantTiles = ConstantTiles.Encode,
+    histograms: bool = True,
+    profile: Optional[Profile] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, List[Path]]:
+    """Tiles several aligned input GeoTIFFs (zipped or not) in a single pass.
+
+    The inputs must share a grid (shape, transform and CRS) and a last year,
+    e.g. the cropland, confidence, cultivated and crop frequency layers for
+    one year. The window plan is computed once and every layer's tiles are
+    written by one shared worker pool.
+
+    With the reference empty mask, a window is skipped for every layer when
+    the reference layer (cropland, if it's one of the inputs, otherwise the
+    first input) is empty there, without reading the other layers. With the
+    union empty mask, each layer's tile is written whenever that layer has
+    data, as if the layers were tiled separately.
+
+    Windows are split between shards, and constant tiles are handled, like
+    :py:func:`tile_geotiff` does. Each layer's tiles are recorded in a fresh
+    manifest per shard, like :py:func:`tile_geotiff` records them, so that
+    the shards' manifests can be merged and checked; windows that weren't
+    read because the reference layer was empty there are recorded as empty
+    for every layer. Tiles already in a manifest aren't skipped, and
+    constant tiles can't be indexed. Stage timings are added to
+    ``profile``, and progress is reported to ``progress``, like
+    :py:func:`tile_geotiff` does; progress counts windows, and a window is
+    skipped if none of its tiles were written.
+
+    Returns the tile paths grouped by item id, so each group becomes one item.
+    """
+    if not infiles:
+        raise ValueError("No input files to tile")
+    if constant_tiles == ConstantTiles.Index:
+        raise ValueError("Constant tiles can't be indexed when tiling many files")
+    sources = [_source(infile) for infile in infiles]
+    sources.sort(key=lambda source: source[1].asset_type != AssetType.Cropland)
+    years = set(metadata.end_datetime.year for _, metadata in sources)
+    if len(years) != 1:
+        raise ValueError(f"Input files aren't all for the same year: {infiles}")
+
+    with contextlib.ExitStack() as stack:
+        datasets = [stack.enter_context(rasterio.open(href)) for href, _ in sources]
+        reference = datasets[0]
+        for dataset in datasets[1:]:
+            if (
+                dataset.shape != reference.shape
+                or dataset.transform != reference.transform
+                or dataset.crs != reference.crs
+            ):
+                raise ValueError(
+                    f"Input files aren't aligned: {reference.name}, {dataset.name}"
+                )
+        plan_timings: List[StageTiming] = list()
+        with timed(plan_timings, Stage.Plan, sources[0][1].stem):
+            windows = _create_windows(reference, size)
+            if empty_mask == EmptyMask.Reference:
+                kept = _prune_empty_windows(reference, windows)
+            else:
+                kept_names: Set[str] = set()
+                for dataset in datasets:
+                    kept_names.update(
+                        window.name()
+                        for window in _prune_empty_windows(dataset, windows)
+                    )
+                kept = [window for window in windows if window.name() in kept_names]
+            windows, pruned = _plan_shard(windows, kept, shard_index, shard_count)
+        if profile:
+            profile.add(plan_timings)
+        manifests = list()
+        for _, metadata in sources:
+            manifest = Manifest(
+                directory / manifest_name(metadata.stem, shard_index, shard_count),
+                shard_index=shard_index,
+                shard_count=shard_count,
+            )
+            manifest.windows = set(
+                _tile_file_name(metadata, window) for window in windows + pruned
+            )
+            manifest.empty.update(
+                _tile_file_name(metadata, window) for window in pruned
+            )
+            manifests.append(manifest)
+        reader_pools = [stack.enter_context(ReaderPool(href)) for href, _ in sources]
+        writers = [
+            TileWriter(
+                metadata,
+                directory,
+                dataset.transform,
+                dataset.crs,
+                constant_tiles,
+                histograms,
+            )
+            for (_, metadata), dataset in zip(sources, datasets)
+        ]
+        executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+
+        def tile(window: Window) -> Tuple[Window, List[TileResult]]:
+            results = list()
+            for i, (reader_pool, writer) in enumerate(zip(reader_pools, writers)):
+                result = _tile_window(reader_pool.get(), writer, window)
+                results.append(result)
+                if i == 0 and empty_mask == EmptyMask.Reference and not result.path:
+                    break
+            return window, results
+
+        groups: Dict[str, List[Path]] = dict()
+        tracker = Tracker(sources[0][1].stem, len(windows), "tile", progress)
+        interval = int(len(windows) / 100) or 1
+        constant = 0
+        tracker.emit()
+        try:
+            for window, results in bounded_map(
+                executor,
+                tile,
+                windows,
+                max_in_flight or max_workers * IN_FLIGHT_PER_WORKER,
+                lambda _: tracker.submit(),
+            ):
+                bytes_written = 0
+                for result, manifest in zip(results, manifests):
+                    _record(manifest, result)
+                    if profile:
+                        profile.add_tile(result.timings, result.path is not None)
+                    if result.constant is not None and constant_tiles != (
+                        ConstantTiles.Encode
+                    ):
+                        constant += 1
+                    if result.path:
+                        item_id = Metadata.from_href(str(result.path)).item_id
+                        groups.setdefault(item_id, list()).append(result.path)
+                        bytes_written += result.path.stat().st_size
+                # Layers that weren't read because the reference was empty
+                for (_, metadata), manifest in list(zip(sources, manifests))[
+                    len(results) :
+                ]:
+                    manifest.empty.add(_tile_file_name(metadata, window))
+                tracker.update(
+                    skipped=int(not bytes_written), bytes_written=bytes_written
+                )
+                if tracker.completed % interval == 0:
+                    _log_progress(tracker, constant)
+                    for manifest in manifests:
+                        manifest.save()
+        finally:
+            for manifest in manifests:
+                manifest.save()
+            if profile:
+                profile.stop()
+    if constant_tiles != ConstantTiles.Encode:
+        logger.info(f"{constant} constant tiles took the {constant_tiles.value} path")
+
+    for paths in groups.values():
+        paths.sort()
+    return dict(sorted(groups.items()))
+
+
+def tile_pyramid(
+    infile: Path,
+    directory: Path,
+    sizes: List[int],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    read_ahead: int = DEFAULT_READ_AHEAD,
+    max_in_flight: Optional[int] = None,
+    resume: bool = True,
+    stage: Optional[bool] = None,
+    scratch_directory: Optional[Path] = None,
+    keep_staged: bool = False,
+    constant_tiles: ConstantTiles = ConstantTiles.Encode,
+    histograms: bool = True,
+    profile: Optional[Profile] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[int, List[Path]]:
+    """Tiles an input GeoTIFF (zipped or not) at several tile sizes at once.
+
+    The sizes' grids must nest, i.e. each size must divide every larger size.
+    The source is read once, one strip of the largest size at a time (with
+    read-ahead, like the strip schedule), and every size's tiles are cut from
+    the same strip. Progress is recorded in one manifest for all sizes, as
+    with :py:func:`tile_geotiff`, and so are constant tiles, profiling and
+    progress. A zipped GeoTIFF is staged as with :py:func:`tile_zipfile`.
+    There's no other engine or schedule, and no sharding.
+
+    Returns the tile paths grouped by size.
+    """
+    sizes = sorted(set(sizes))
+    if not sizes:
+        raise ValueError("No tile sizes")
+    for smaller, larger in zip(sizes, sizes[1:]):
+        if larger % smaller:
+            raise ValueError(f"Tile sizes don't nest: {smaller} and {larger}")
+    largest = sizes[-1]
+    href, metadata = _source(infile)
+    if resume:
+        manifest = Manifest.for_stem(directory, metadata.stem)
+    else:
+        manifest = Manifest(directory / manifest_name(metadata.stem))
+
+    with contextlib.ExitStack() as stack:
+        if infile.suffix == ".zip" and staging.should_stage(infile, stage):
+            href = str(
+                stack.enter_context(
+                    staging.staged_geotiff(infile, scratch_directory, keep_staged)
+                )
+            )
+        dataset = stack.enter_context(rasterio.open(href))
+        executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+        writer = TileWriter(
+            metadata,
+            directory,
+            dataset.transform,
+            dataset.crs,
+            constant_tiles,
+            histograms,
+        )
+        windows = list()
+        manifest.windows = set()
+        plan_timings: List[StageTiming] = list()
+        with timed(plan_timings, Stage.Plan, metadata.stem):
+            for size in sizes:
+                size_windows = _create_windows(dataset, size)
+                kept, pruned = _plan_shard(
+                    size_windows, _prune_empty_windows(dataset, size_windows), 0, 1
+                )
+                manifest.windows.update(
+                    _tile_file_name(metadata, window) for window in size_windows
+                )
+                manifest.empty.update(_tile_file_name(metadata, w) for w in pruned)
+                windows.extend(kept)
+        if profile:
+            profile.add(plan_timings)
+        done = manifest.done()
+        windows = [
+            window
+            for window in windows
+            if _tile_file_name(metadata, window) not in done
+        ]
+        sizes_by_name = dict(
+            (_tile_file_name(metadata, window), window.size // RESOLUTION)
+            for window in windows
+        )
+        strips: Dict[int, List[Window]] = dict()
+        for window in windows:
+            strips.setdefault(window.row_off // largest, list()).append(window)
+        items = (
+            item
+            for strip in _read_ahead(
+                (_read_strip(dataset, strip) for _, strip in sorted(strips.items())),
+                read_ahead,
+            )
+            for item in strip
+        )
+        groups: Dict[int, List[Path]] = dict((size, list()) for size in sizes)
+        tracker = Tracker(metadata.stem, len(windows), "tile", progress)
+        constant = 0
+        interval = int(len(windows) / 100) or 1
+        tracker.emit()
+        try:
+            for result in bounded_map(
+                executor,
+                lambda item: writer(*item),
+                items,
+                max_in_flight or max_workers * IN_FLIGHT_PER_WORKER,
+                lambda _: tracker.submit(),
+            ):
+                _record(manifest, result)
+                if profile:
+                    profile.add_tile(result.timings, result.path is not None)
+                if result.constant is not None and constant_tiles != (
+                    ConstantTiles.Encode
+                ):
+                    constant += 1
+                if result.path is None:
+                    tracker.update(skipped=1)
+                else:
+                    groups[sizes_by_name[result.name]].append(result.path)
+                    tracker.update(bytes_written=result.path.stat().st_size)
+                if tracker.completed % interval == 0:
+                    _log_progress(tracker, constant)
+                    manifest.save()
+        finally:
+            manifest.save()
+            if profile:
+                profile.stop()
+    if constant_tiles != ConstantTiles.Encode:
+        logger.info(f"{constant} constant tiles took the {constant_tiles.value} path")
+
+    order = dict(
+        (_tile_file_name(metadata, window), i) for i, window in enumerate(windows)
+    )
+    for paths in groups.values():
+        paths.sort(key=lambda path: order[path.name])
+    return groups
+
+
+def _source(infile: Path) -> Tuple[str, Metadata]:
+    """Returns the href to open, and the metadata, for a zipped or plain GeoTIFF."""
+    if infile.suffix == ".zip":
+        return f"zip://{infile}!/{infile.stem}.tif", Metadata.from_href(infile.stem)
+    else:
+        return str(infile), Metadata.from_href(str(infile))
+
+
 def _tile_dataset(
     dataset: DatasetReader,
+    href: str,
     metadata: Metadata,
     directory: Path,
     size: int,
     max_workers: int,
     existing_tiles: List[str],
+    *,
+    engine: Engine = Engine.Thread,
+    schedule: Schedule = Schedule.Window,
+    read_ahead: int = DEFAULT_READ_AHEAD,
+    max_in_flight: Optional[int] = None,
+    resume: bool = True,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    constant_tiles: ConstantTiles = ConstantTiles.Encode,
+    histograms: bool = True,
+    profile: Optional[Profile] = None,
+    progress: Optional[ProgressCallback] = None,
 ) -> List[Path]:
-    windows = _create_windows(dataset, size)
-    read_lock = threading.Lock()
-
-    def tile(window: Window) -> Optional[Path]:
-        file_name = f"{metadata.stem}_{window.name()}.tif"
-        if file_name in existing_tiles:
-            return None
-        rasterio_window = window.rasterio_window()
-        with read_lock:
-            data = dataset.read(1, window=rasterio_window)
-        if not data.any():
-            return None
-        transform = dataset.window_transform(rasterio_window)
-        profile = {
-            "driver": "GTiff",
-            "width": window.width,
-            "height": window.height,
-            "count": 1,
-            "dtype": "uint8",
-            "transform": transform,
-            "crs": dataset.crs,
-        }
-        path = directory / file_name
-        with MemoryFile() as memory_file:
-            with memory_file.open(**profile) as open_memory_file:
-                open_memory_file.write(data, 1)
-                colormap = metadata.colormap
-                if colormap:
-                    open_memory_file.write_colormap(1, colormap)
-                rasterio.shutil.copy(open_memory_file, path, **metadata.cog_profile)
-        return path
+    writer = TileWriter(
+        metadata,
+        directory,
+        dataset.transform,
+        dataset.crs,
+        constant_tiles,
+        histograms,
+    )
+    if resume:
+        manifest = Manifest.for_stem(directory, metadata.stem, shard_index, shard_count)
+    else:
+        manifest = Manifest(
+            directory / manifest_name(metadata.stem, shard_index, shard_count),
+            shard_index=shard_index,
+            shard_count=shard_count,
+        )
+    plan_timings: List[StageTiming] = list()
+    with timed(plan_timings, Stage.Plan, metadata.stem):
+        windows = _create_windows(dataset, size)
+        windows, pruned = _plan_shard(
+            windows,
+            _prune_empty_windows(dataset, windows),
+            shard_index,
+            shard_count,
+            schedule,
+        )
+    if profile:
+        profile.add(plan_timings)
+    manifest.windows = set(
+        _tile_file_name(metadata, window) for window in windows + pruned
+    )
+    manifest.empty.update(_tile_file_name(metadata, window) for window in pruned)
+    done = manifest.done().union(existing_tiles)
+    windows = [
+        window for window in windows if _tile_file_name(metadata, window) not in done
+    ]
+    max_in_flight = max_in_flight or max_workers * IN_FLIGHT_PER_WORKER
+    tracker = Tracker(metadata.stem, len(windows), "tile", progress)
+    if engine == Engine.Process:
+        results = _tile_windows_with_processes(
+            href,
+            writer,
+            windows,
+            max_workers,
+            schedule,
+            max_in_flight,
+            tracker.submit,
+        )
+    elif schedule == Schedule.Strip:
+        results = _tile_strips_with_threads(
+            href,
+            writer,
+            windows,
+            max_workers,
+            read_ahead,
+            max_in_flight,
+            tracker.submit,
+        )
+    else:
+        results = _tile_windows_with_threads(
+            href, writer, windows, max_workers, max_in_flight, tracker.submit
+        )
 
     paths = list()
-    skipped = 0
-    written = 0
-    num_windows = len(windows)
-    interval = int(num_windows / 100) or 1
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for i, path in enumerate(executor.map(tile, windows)):
-            if path is None:
-                skipped += 1
+    constant = 0
+    interval = int(len(windows) / 100) or 1
+    tracker.emit()
+    try:
+        for result in results:
+            _record(manifest, result)
+            if profile:
+                profile.add_tile(result.timings, result.path is not None)
+            if result.constant is not None and constant_tiles != ConstantTiles.Encode:
+                constant += 1
+            if result.path is None:
+                tracker.update(skipped=1)
             else:
-                written += 1
-                paths.append(path)
-            if i % interval == 0:
-                logger.info(
-                    f"[{i + 1}/{num_windows}] written={written}, skipped={skipped}"
-                )
+                paths.append(result.path)
+                tracker.update(bytes_written=result.path.stat().st_size)
+            if tracker.completed % interval == 0:
+                _log_progress(tracker, constant)
+                manifest.save()
+    finally:
+        manifest.save()
+        if profile:
+            profile.stop()
+    if constant_tiles != ConstantTiles.Encode:
+        logger.info(f"{constant} constant tiles took the {constant_tiles.value} path")
+    # Results arrive in completion order, but callers get them in window order
+    order = dict(
+        (_tile_file_name(metadata, window), i) for i, window in enumerate(windows)
+    )
+    paths.sort(key=lambda path: order[path.name])
     return paths
 
 
+def _log_progress(tracker: Tracker, constant: int) -> None:
+    progress = tracker.snapshot()
+    eta = "?" if progress.eta is None else f"{progress.eta:.0f}s"
+    logger.info(
+        f"[{progress.completed}/{progress.total}] "
+        f"written={progress.completed - progress.skipped}, "
+        f"skipped={progress.skipped}, constant={constant}, "
+        f"in_flight={progress.in_flight}, "
+        f"{progress.bytes_per_second / 1024**2:.1f} MB/s, eta={eta}"
+    )
+
+
+def _record(manifest: Manifest, result: TileResult) -> None:
+    if result.path is not None:
+        manifest.completed[result.name] = result.checksum or ""
+    elif result.constant is not None:
+        manifest.constant[result.name] = result.constant
+    else:
+        manifest.empty.add(result.name)
+
+
+def _plan_shard(
+    windows: List[Window],
+    kept: List[Window],
+    shard_index: int,
+    shard_count: int,
+    schedule: Schedule = Schedule.Window,
+) -> Tuple[List[Window], List[Window]]:
+    """Returns this shard's windows to tile, and its windows pruned as empty.
+
+    Windows are dealt out to shards round-robin, separately for the windows
+    to tile and for the pruned ones. Since empty windows cluster (oceans,
+    Canada, Mexico), this balances the real work across shards much better
+    than contiguous ranges would. With the strip schedule, whole strips are
+    dealt out instead, so that each shard only reads (and decompresses) its
+    own strips of the source. The plan only depends on the source, so every
+    shard computes the same split independently.
+    """
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"Invalid shard {shard_index} of {shard_count}")
+    kept_names = set(window.name() for window in kept)
+    pruned = [window for window in windows if window.name() not in kept_names]
+    if schedule == Schedule.Strip:
+        return (
+            _deal_strips(kept, shard_index, shard_count),
+            _deal_strips(pruned, shard_index, shard_count),
+        )
+    return (
+        kept[shard_index::shard_count],
+        pruned[shard_index::shard_count],
+    )
+
+
+def _deal_strips(
+    windows: List[Window], shard_index: int, shard_count: int
+) -> List[Window]:
+    """Returns the windows of every ``shard_count``-th strip of the source."""
+    return [
+        window
+        for window in windows
+        if (window.row_off // window.height) % shard_count == shard_index
+    ]
+
+
+def _tile_windows_with_threads(
+    href: str,
+    writer: TileWriter,
+    windows: List[Window],
+    max_workers: int,
+    max_in_flight: int,
+    on_submit: Callable[[int], None],
+) -> Iterator[TileResult]:
+    with ReaderPool(href) as reader_pool, ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        yield from bounded_map(
+            executor,
+            lambda window: _tile_window(reader_pool.get(), writer, window),
+            windows,
+            max_in_flight,
+            lambda _: on_submit(1),
+        )
+
+
+def _tile_strips_with_threads(
+    href: str,
+    writer: TileWriter,
+    windows: List[Window],
+    max_workers: int,
+    read_ahead: int,
+    max_in_flight: int,
+    on_submit: Callable[[int], None],
+) -> Iterator[TileResult]:
+    with rasterio.open(href) as dataset, ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        strips = (_read_strip(dataset, strip) for strip in _group_into_strips(windows))
+        yield from bounded_map(
+            executor,
+            lambda item: writer(*item),
+            (item for strip in _read_ahead(strips, read_ahead) for item in strip),
+            max_in_flight,
+            lambda _: on_submit(1),
+        )
+
+
+def _tile_windows_with_processes(
+    href: str,
+    writer: TileWriter,
+    windows: List[Window],
+    max_workers: int,
+    schedule: Schedule,
+    max_in_flight: int,
+    on_submit: Callable[[int], None],
+) -> Iterator[TileResult]:
+    if schedule == Schedule.Strip:
+        chunks = _group_into_strips(windows)
+    else:
+        # Each process gets several contiguous slices so that a slice full of
+        # empty (e.g. ocean) windows doesn't leave one process idle at the end.
+        chunk_size = math.ceil(len(windows) / (max_workers * PROCESS_CHUNKS_PER_WORKER))
+        chunks = [
+            windows[i : i + chunk_size] for i in range(0, len(windows), chunk_size or 1)
+        ]
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_open_process_dataset,
+        initargs=(href,),
+    ) as executor:
+        for results in bounded_map(
+            executor,
+            functools.partial(_tile_windows_in_process, writer, schedule=schedule),
+            chunks,
+            max_in_flight,
+            lambda chunk: on_submit(len(chunk)),
+        ):
+            yield from results
+
+
+def _open_process_dataset(href: str) -> None:
+    global _process_dataset
+    _process_dataset = rasterio.open(href)
+
+
+def _tile_windows_in_process(
+    writer: TileWriter, windows: List[Window], schedule: Schedule
+) -> List[TileResult]:
+    dataset = _process_dataset
+    if dataset is None:
+        raise RuntimeError("Tiling process was not initialized with a dataset")
+    if schedule == Schedule.Strip:
+        return [writer(*item) for item in _read_strip(dataset, windows)]
+    else:
+        return [_tile_window(dataset, writer, window) for window in windows]
+
+
+def _group_into_strips(windows: List[Window]) -> List[List[Window]]:
+    """Groups windows into horizontal strips, i.e. by their row offset."""
+    strips: Dict[int, List[Window]] = dict()
+    for window in windows:
+        strips.setdefault(window.row_off, list()).append(window)
+    return list(strips.values())
+
+
+def _read_strip(
+    dataset: DatasetReader, windows: List[Window]
+) -> List[Tuple[Window, NDArray[np.uint8], List[StageTiming]]]:
+    """Reads all windows of a strip with a single read.
+
+    The read spans only the rows and columns covered by the (unpruned)
+    windows, and each window's data is a view into the strip, so nothing is
+    copied. The windows may be of different sizes, e.g. nested tile sizes.
+
+    The timing of the read is returned with the first window.
+    """
+    row_off = min(window.row_off for window in windows)
+    row_end = max(window.row_off + window.height for window in windows)
+    col_off = min(window.col_off for window in windows)
+    col_end = max(window.col_off + window.width for window in windows)
+    timings: List[StageTiming] = list()
+    with timed(
+        timings,
+        Stage.Read,
+        f"strip at row {row_off}",
+        (col_end - col_off) * (row_end - row_off),
+    ):
+        strip = dataset.read(
+            1,
+            window=rasterio.windows.Window(
+                col_off=col_off,
+                row_off=row_off,
+                width=col_end - col_off,
+                height=row_end - row_off,
+            ),
+        )
+    return [
+        (
+            window,
+            strip[
+                window.row_off - row_off : window.row_off - row_off + window.height,
+                window.col_off - col_off : window.col_off - col_off + window.width,
+            ],
+            timings if i == 0 else list(),
+        )
+        for i, window in enumerate(windows)
+    ]
+
+
+def _read_ahead(items: Iterator[T], size: int) -> Iterator[T]:
+    """Iterates over items in a background thread, buffering up to size ahead.
+
+    Exceptions raised by the background iteration are re-raised by the caller.
+    """
+    buffer: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=max(size, 1))
+    stop = threading.Event()
+
+    def put(entry: Tuple[bool, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=READ_AHEAD_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((False, item)):
+                    return
+            put((True, None))
+        except BaseException as error:
+            put((True, error))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            done, item = buffer.get()
+            if done:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def _tile_window(
+    dataset: DatasetReader, writer: TileWriter, window: Window
+) -> TileResult:
+    timings: List[StageTiming] = list()
+    with timed(timings, Stage.Read, writer.name(window), window.width * window.height):
+        data = dataset.read(1, window=window.rasterio_window())
+    return writer(window, data, timings)
+
+
+def _constant_value(data: NDArray[np.uint8]) -> Optional[int]:
+    """Returns the only value in data, or None if there is more than one."""
+    value = data.flat[0]
+    # Cheap early exit for the (common) non-constant case
+    if data.flat[-1] != value or not (data == value).all():
+        return None
+    return int(value)
+
+
+def _write_cog(
+    path: Path,
+    data: NDArray[np.uint8],
+    transform: Affine,
+    crs: CRS,
+    metadata: Metadata,
+    width: int,
+    height: int,
+    fast: bool = False,
+    timings: Optional[List[StageTiming]] = None,
+    name: str = "",
+) -> None:
+    """Writes one COG from an in-memory array.
+
+    The array goes into a GDAL in-memory (MEM) dataset rather than an
+    intermediate GTiff. For "mode" resampling we also build the overviews in
+    memory, so that the COG driver encodes them once instead of first writing
+    them to a temporary file; this gives byte-identical output. GDAL's COG
+    driver and in-memory overviews don't agree on "average" overviews past the
+    first level, so those are still left to the COG driver.
+
+    If fast is True, which is only correct for constant data, nearest
+    neighbour overviews are used instead: for constant data they're identical
+    to mode or average overviews, and much cheaper.
+
+    If timings is given, the colormap, the in-memory write and the COG copy
+    are timed into it under name.
+    """
+    profile = {
+        "driver": "MEM",
+        "width": width,
+        "height": height,
+        "count": 1,
+        "dtype": "uint8",
+        "transform": transform,
+        "crs": crs,
+    }
+    cog_profile = metadata.cog_profile
+    if fast:
+        cog_profile["overview_resampling"] = "nearest"
+    with rasterio.open("", "w", **profile) as memory_dataset:
+        colormap = metadata.colormap
+        if colormap:
+            with timed(timings, Stage.Colormap, name, 4 * len(colormap)):
+                memory_dataset.write_colormap(1, colormap)
+        with timed(timings, Stage.Write, name, data.nbytes):
+            memory_dataset.write(data, 1)
+            if cog_profile["overview_resampling"] == "mode":
+                factors = _overview_factors(width, height, cog_profile["blocksize"])
+                if factors:
+                    memory_dataset.build_overviews(factors, Resampling.mode)
+                    cog_profile = dict(cog_profile, overviews="FORCE_USE_EXISTING")
+        with timed(timings, Stage.Copy, name):
+            rasterio.shutil.copy(memory_dataset, path, **cog_profile)
+
+
+def _overview_factors(width: int, height: int, blocksize: int) -> List[int]:
+    """Returns the overview factors the COG driver would generate."""
+    factors = list()
+    factor = 1
+    while (
+        math.ceil(width / factor) > blocksize or math.ceil(height / factor) > blocksize
+    ):
+        factor *= 2
+        factors.append(factor)
+    return factors
+
+
+def _tile_file_name(metadata: Metadata, window: Window) -> str:
+    return f"{metadata.stem}_{window.name()}.tif"
+
+
 def _create_windows(dataset: DatasetReader, size: int) -> List[Window]:
     if dataset.res != (RESOLUTION, RESOLUTION):
         raise ValueError(f"Dataset has unexpected resolution: {dataset.res}")
@@ -178,3 +1198,72 @@ def _create_windows(dataset: DatasetReader, size: int) -> List[Window]:
             col = 0
             row += size
     return windows
+
+
+def _prune_empty_windows(dataset: DatasetReader, windows: List[Window]) -> List[Window]:
+    """Drops windows that are known to be empty without reading any pixels.
+
+    A window is known to be empty if it lies entirely outside of the dataset,
+    or if every TIFF block (or strip) it touches is sparse, i.e. was never
+    written to the file. Overviews and other decimated reads can't prove that
+    a window is empty (they can miss isolated pixels), so they aren't used.
+
+    Only sparse files have unwritten blocks: the published CDL GeoTIFFs write
+    every block, even those that are all zeros, so for them only the windows
+    outside the dataset are dropped, and empty windows are still read (and
+    then skipped) when tiling.
+    """
+    is_sparse = _sparse_block_lookup(dataset)
+    height, width = dataset.shape
+    block_height, block_width = dataset.block_shapes[0]
+    kept = list()
+    for window in windows:
+        row_end = min(window.row_off + window.height, height)
+        col_end = min(window.col_off + window.width, width)
+        if row_end <= window.row_off or col_end <= window.col_off:
+            continue
+        if is_sparse and all(
+            is_sparse(block_col, block_row)
+            for block_row in range(
+                window.row_off // block_height, (row_end - 1) // block_height + 1
+            )
+            for block_col in range(
+                window.col_off // block_width, (col_end - 1) // block_width + 1
+            )
+        ):
+            continue
+        kept.append(window)
+    logger.info(f"Pruned {len(windows) - len(kept)} of {len(windows)} windows as empty")
+    return kept
+
+
+def _sparse_block_lookup(
+    dataset: DatasetReader,
+) -> Optional[Callable[[int, int], bool]]:
+    """Returns a cached (block_col, block_row) -> is-sparse lookup, if available.
+
+    GDAL's GTiff driver reports each block's file offset in the TIFF metadata
+    domain, with no offset for blocks that were never written. If no block
+    reports an offset we assume GDAL isn't telling us, rather than that the
+    file is completely empty. Unwritten blocks read as nodata (or zero), so
+    they're only empty if nodata is unset or zero.
+    """
+    if dataset.driver != "GTiff" or dataset.nodata not in (None, 0):
+        return None
+
+    @functools.lru_cache(maxsize=None)
+    def is_sparse(block_col: int, block_row: int) -> bool:
+        offset = dataset.get_tag_item(
+            f"BLOCK_OFFSET_{block_col}_{block_row}", "TIFF", bidx=1
+        )
+        return not offset or int(offset) == 0
+
+    height, width = dataset.shape
+    block_height, block_width = dataset.block_shapes[0]
+    if all(
+        is_sparse(block_col, block_row)
+        for block_row in range(math.ceil(height / block_height))
+        for block_col in range(math.ceil(width / block_width))
+    ):
+        return None
+    return is_sparse
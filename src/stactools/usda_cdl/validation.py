@@ -0,0 +1,341 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import jsonschema
+import pystac
+import pystac.validation
+import referencing.exceptions
+from pystac import STACObjectType, STACTypeError, STACValidationError
+from pystac.extensions.projection import ProjectionExtension
+from pystac.extensions.raster import RasterExtension
+from pystac.validation.local_validator import get_local_schema_cache
+from pystac.validation.schema_uri_map import DefaultSchemaUriMap
+from pystac.validation.stac_validator import JsonSchemaSTACValidator
+
+from .concurrency import IN_FLIGHT_PER_WORKER, bounded_map
+from .constants import CLASSIFICATION_SCHEMA
+
+ITEM_ASSETS_SCHEMA = "https://stac-extensions.github.io/item-assets/v1.0.0/schema.json"
+DEFAULT_BATCH_SIZE = 100
+
+
+class SchemaValidationError(STACValidationError):
+    """A validation error that knows which schema, and where, it's from."""
+
+    def __init__(self, message: str, schema_uri: str, source: Any) -> None:
+        super().__init__(message, source)
+        self.schema_uri = schema_uri
+        best = jsonschema.exceptions.best_match(source)
+        self.path = best.json_path if best else "$"
+        self.keyword = str(best.validator) if best else ""
+
+
+class MissingSchemaError(STACValidationError):
+    """A schema, or a schema it references, that couldn't be read."""
+
+    def __init__(self, schema_uri: str, error: Exception) -> None:
+        super().__init__(f"Could not read schema {schema_uri}: {error}")
+        self.schema_uri = schema_uri
+
+
+class CachedValidator(JsonSchemaSTACValidator):
+    """A JSON schema validator that never fetches the schemas it was given.
+
+    Schemas come from pystac's bundled core schemas and from a schema cache
+    file written by :py:func:`cache_schemas`, so items and collections can be
+    validated offline. Each schema's validator is compiled once, rather than
+    once per object.
+    """
+
+    def __init__(self, schemas: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        super().__init__()
+        self.schema_cache = dict(get_local_schema_cache(), **(schemas or {}))
+        self._registry: Optional[Any] = None
+        self._validators: Dict[str, Any] = dict()
+
+    @classmethod
+    def from_file(cls, path: Path) -> "CachedValidator":
+        """Creates a validator from a schema cache file."""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def registry(self) -> Any:
+        if self._registry is None:
+            self._registry = super().registry
+        return self._registry
+
+    def _validate_from_uri(
+        self,
+        stac_dict: Dict[str, Any],
+        stac_object_type: STACObjectType,
+        schema_uri: str,
+        href: Optional[str] = None,
+    ) -> None:
+        validator = self._validators.get(schema_uri)
+        if validator is None:
+            try:
+                schema = self._get_schema(schema_uri)
+            except Exception as error:
+                # pystac raises GetSchemaError (>= 1.9) or the read's own error
+                raise MissingSchemaError(schema_uri, error) from error
+            cls = jsonschema.validators.validator_for(schema)
+            cls.check_schema(schema)
+            validator = cls(schema, registry=self.registry)
+            self._validators[schema_uri] = validator
+        try:
+            errors = list(validator.iter_errors(stac_dict))
+        except referencing.exceptions.Unresolvable as error:
+            raise MissingSchemaError(schema_uri, error) from error
+        if errors:
+            message = f"Validation failed for {stac_object_type} "
+            if href is not None:
+                message += f"at {href} "
+            if stac_dict.get("id") is not None:
+                message += f"with ID {stac_dict['id']} "
+            message += f"against schema at {schema_uri}"
+            best = jsonschema.exceptions.best_match(errors)
+            if best:
+                message += "\n" + str(best.message)
+            raise SchemaValidationError(message, schema_uri, errors)
+
+
+@dataclass(frozen=True)
+class ValidationFailure:
+    """One object that failed validation."""
+
+    id: Optional[str]
+    schema_uri: str
+    path: str
+    """The JSON path of the (best) error, e.g. ``$.properties.datetime``."""
+
+    keyword: str
+    """The JSON schema keyword that failed, e.g. ``required``."""
+
+    message: str
+
+
+@dataclass
+class ValidationReport:
+    """The outcome of validating many objects."""
+
+    count: int = 0
+    failures: List[ValidationFailure] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Whether every object was valid."""
+        return not self.failures
+
+    def summary(self) -> List[Tuple[str, str, str, int]]:
+        """Counts the failures by schema, path and keyword, most common first."""
+        counter = Counter(
+            (failure.schema_uri, failure.path, failure.keyword)
+            for failure in self.failures
+        )
+        return [key + (count,) for key, count in counter.most_common()]
+
+
+def schema_uris() -> List[str]:
+    """Returns the URIs of the schemas this package's items and collection use."""
+    version = pystac.get_stac_version()
+    schema_uri_map = DefaultSchemaUriMap()
+    uris = [
+        schema_uri_map.get_object_schema_uri(STACObjectType.ITEM, version),
+        schema_uri_map.get_object_schema_uri(STACObjectType.COLLECTION, version),
+        ProjectionExtension.get_schema_uri(),
+        RasterExtension.get_schema_uri(),
+        CLASSIFICATION_SCHEMA,
+        ITEM_ASSETS_SCHEMA,
+    ]
+    return [uri for uri in uris if uri]
+
+
+def cache_schemas(path: Path, uris: Optional[List[str]] = None) -> List[str]:
+    """Fetches schemas, and the schemas they reference, into a cache file.
+
+    By default, the schemas are those of :py:func:`schema_uris`. Schemas that
+    pystac bundles aren't fetched. The cache file can be copied to machines
+    without network access and used with :py:meth:`CachedValidator.from_file`
+    or :py:func:`use_schema_cache`. Returns the URIs of the cached schemas.
+    """
+    bundled = get_local_schema_cache()
+    queue = list(uris or schema_uris())
+    schemas: Dict[str, Dict[str, Any]] = dict()
+    while queue:
+        uri = queue.pop(0)
+        if uri in schemas:
+            continue
+        if uri in bundled:
+            schema = bundled[uri]
+        else:
+            schema = json.loads(pystac.StacIO.default().read_text(uri))
+            # Like pystac, give schemas with relative ids their absolute URI
+            id_field = "$id" if "$id" in schema else "id"
+            if not str(schema.get(id_field, "")).startswith("http"):
+                schema[id_field] = uri
+            schemas[uri] = schema
+        queue.extend(
+            reference
+            for reference in _references(uri, schema)
+            if reference not in schemas and reference not in bundled
+        )
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "w") as f:
+        json.dump(schemas, f)
+    os.replace(partial, path)
+    return sorted(schemas)
+
+
+def use_schema_cache(path: Path) -> CachedValidator:
+    """Makes pystac validate (e.g. ``item.validate()``) against a schema cache."""
+    validator = CachedValidator.from_file(path)
+    pystac.validation.set_validator(validator)
+    return validator
+
+
+def validate_dicts(
+    stac_dicts: Iterable[Dict[str, Any]],
+    schema_cache: Optional[Path] = None,
+    max_workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ValidationReport:
+    """Validates many STAC objects, reporting every failure.
+
+    Unlike ``validate``, this doesn't stop at the first invalid object.
+    Objects are validated ``batch_size`` at a time by ``max_workers``
+    processes, each compiling the validators once, against the schema cache
+    if one is given (and against fetched schemas otherwise).
+    """
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size: {batch_size}")
+    report = ValidationReport()
+    batches = _batches(stac_dicts, batch_size)
+    if max_workers <= 1:
+        _initialize_worker(schema_cache)
+        results: Iterable[Tuple[int, List[ValidationFailure]]] = map(
+            _validate_batch, batches
+        )
+        for count, failures in results:
+            report.count += count
+            report.failures.extend(failures)
+        return report
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialize_worker,
+        initargs=(schema_cache,),
+    ) as executor:
+        for count, failures in bounded_map(
+            executor,
+            _validate_batch,
+            batches,
+            max_workers * IN_FLIGHT_PER_WORKER,
+        ):
+            report.count += count
+            report.failures.extend(failures)
+    return report
+
+
+def validate_ndjson(
+    path: Path,
+    schema_cache: Optional[Path] = None,
+    max_workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ValidationReport:
+    """Validates every object in a newline-delimited JSON file.
+
+    See :py:func:`validate_dicts`.
+    """
+    with open(path) as f:
+        return validate_dicts(
+            (json.loads(line) for line in f if line.strip()),
+            schema_cache,
+            max_workers,
+            batch_size,
+        )
+
+
+_worker_validator: Optional[CachedValidator] = None
+
+
+def _initialize_worker(schema_cache: Optional[Path]) -> None:
+    global _worker_validator
+    if schema_cache:
+        _worker_validator = CachedValidator.from_file(schema_cache)
+    else:
+        _worker_validator = CachedValidator()
+
+
+def _validate_batch(
+    stac_dicts: List[Dict[str, Any]],
+) -> Tuple[int, List[ValidationFailure]]:
+    failures = list()
+    for stac_dict in stac_dicts:
+        try:
+            pystac.validation.validate_dict(stac_dict, validator=_worker_validator)
+        except SchemaValidationError as error:
+            failures.append(
+                ValidationFailure(
+                    id=stac_dict.get("id"),
+                    schema_uri=error.schema_uri,
+                    path=error.path,
+                    keyword=error.keyword,
+                    message=str(error),
+                )
+            )
+        except MissingSchemaError as error:
+            failures.append(
+                ValidationFailure(
+                    id=stac_dict.get("id"),
+                    schema_uri=error.schema_uri,
+                    path="$",
+                    keyword="$ref",
+                    message=str(error),
+                )
+            )
+        except (STACTypeError, STACValidationError) as error:
+            # Not a STAC object pystac can identify, e.g. it has no type
+            failures.append(
+                ValidationFailure(
+                    id=stac_dict.get("id"),
+                    schema_uri="",
+                    path="$",
+                    keyword="type",
+                    message=str(error),
+                )
+            )
+    return len(stac_dicts), failures
+
+
+def _batches(
+    stac_dicts: Iterable[Dict[str, Any]], batch_size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = list()
+    for stac_dict in stac_dicts:
+        batch.append(stac_dict)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = list()
+    if batch:
+        yield batch
+
+
+def _references(uri: str, schema: Any) -> Iterator[str]:
+    """Yields the absolute http(s) URIs of the schemas a schema references."""
+    if isinstance(schema, dict):
+        for key, value in schema.items():
+            if key == "$ref" and isinstance(value, str):
+                reference = urljoin(uri, value).split("#")[0]
+                if reference.startswith("http"):
+                    yield reference
+            else:
+                yield from _references(uri, value)
+    elif isinstance(schema, list):
+        for value in schema:
+            yield from _references(uri, value)
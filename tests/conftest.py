@@ -1,3 +1,4 @@
+import zipfile
 from pathlib import Path
 from typing import List
 
@@ -52,3 +53,11 @@ def wheat() -> Path:
 def tiles() -> List[Path]:
     directory = test_data.get_path("data-files/tiles")
     return list(Path(directory).glob("*.tif"))
+
+
+@pytest.fixture
+def cdl_zip(cdl: Path, tmp_path: Path) -> Path:
+    path = tmp_path / "2021_30m_cdls.zip"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.write(cdl, cdl.name)
+    return path
@@ -1,4 +1,5 @@
-# import glob
+import glob
+import json
 import os.path
 from tempfile import TemporaryDirectory
 from typing import Callable, List
@@ -7,6 +8,7 @@ import pystac
 from click import Command, Group
 from stactools.testing.cli_test import CliTestCase
 
+from stactools.usda_cdl import stac
 from stactools.usda_cdl.commands import create_usda_cdl_command
 from tests import test_data
 
@@ -23,3 +25,124 @@ class CommandsTest(CliTestCase):
             item_path = os.path.join(tmp_dir, "out.json")
             item = pystac.read_file(item_path)
             item.validate()
+
+    def test_create_items_command(self) -> None:
+        tiles = test_data.get_path("data-files/tiles")
+        with TemporaryDirectory() as tmp_dir:
+            outfile = os.path.join(tmp_dir, "items.ndjson")
+            cmd = f"usda-cdl create-items {tiles} {outfile} --fast --workers 2"
+            result = self.run_command(cmd)
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            with open(outfile) as f:
+                items = [pystac.Item.from_dict(json.loads(line)) for line in f]
+            assert items
+            assert len(set(item.id for item in items)) == len(items)
+
+    def test_create_collection_command_with_items(self) -> None:
+        tiles = test_data.get_path("data-files/tiles")
+        with TemporaryDirectory() as tmp_dir:
+            items = os.path.join(tmp_dir, "items.ndjson")
+            self.run_command(f"usda-cdl create-items {tiles} {items}")
+            collection_path = os.path.join(tmp_dir, "collection.json")
+            cmd = (
+                f"usda-cdl create-collection {collection_path} --items {items} "
+                "--layout hierarchical"
+            )
+            result = self.run_command(cmd)
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            with open(items) as f:
+                count = sum(1 for _ in f)
+            collection = pystac.Collection.from_file(collection_path)
+            assert not list(collection.get_items())
+            assert len(list(collection.get_items(recursive=True))) == count
+
+            # Updating with the same items changes nothing
+            cmd = f"usda-cdl update-collection {collection_path} {items}"
+            result = self.run_command(cmd)
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            collection = pystac.Collection.from_file(collection_path)
+            assert not list(collection.get_items())
+            assert len(list(collection.get_items(recursive=True))) == count
+
+    def test_create_collection_command_with_items_file_name(self) -> None:
+        tiles = test_data.get_path("data-files/tiles")
+        with TemporaryDirectory() as tmp_dir:
+            items = os.path.join(tmp_dir, "items.ndjson")
+            self.run_command(f"usda-cdl create-items {tiles} {items}")
+            collection_path = os.path.join(tmp_dir, "out", "my-collection.json")
+            cmd = f"usda-cdl create-collection {collection_path} --items {items}"
+            result = self.run_command(cmd)
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            assert not os.path.exists(os.path.join(tmp_dir, "out", "collection.json"))
+            collection = pystac.Collection.from_file(collection_path)
+            # The flat layout is the default
+            assert not list(collection.get_children())
+            assert list(collection.get_items())
+
+    def test_update_collection_command(self) -> None:
+        tiles = test_data.get_path("data-files/tiles")
+        with TemporaryDirectory() as tmp_dir:
+            collection = stac.create_collection()
+            collection.normalize_hrefs(tmp_dir)
+            collection.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+            items = os.path.join(tmp_dir, "items.ndjson")
+            self.run_command(f"usda-cdl create-items {tiles} {items}")
+            collection_path = os.path.join(tmp_dir, "collection.json")
+            cmd = f"usda-cdl update-collection {collection_path} {items}"
+            result = self.run_command(cmd)
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            with open(items) as f:
+                count = sum(1 for _ in f)
+            collection = pystac.Collection.from_file(collection_path)
+            assert len(list(collection.get_items())) == count
+
+    def test_tile_command_process_engine(self) -> None:
+        infile = test_data.get_path("data-files/2021_30m_cdls.tif")
+        with TemporaryDirectory() as tmp_dir:
+            cmd = (
+                f"usda-cdl tile {infile} {tmp_dir} --size 500 "
+                "--engine process --workers 2"
+            )
+            self.run_command(cmd)
+            assert len(glob.glob(os.path.join(tmp_dir, "*.tif"))) == 4
+
+    def test_tiles_for_bbox_command(self) -> None:
+        infile = test_data.get_path("data-files/2021_30m_cdls.tif")
+        with TemporaryDirectory() as tmp_dir:
+            self.run_command(f"usda-cdl tile {infile} {tmp_dir} --size 500")
+            result = self.run_command(f"usda-cdl index-tiles {tmp_dir}")
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            cmd = (
+                "usda-cdl tiles-for-bbox --bbox -96.98 39.22 -96.97 39.23 "
+                f"--crs EPSG:4326 --year 2021 --size 500 --directory {tmp_dir}"
+            )
+            result = self.run_command(cmd)
+            assert result.exit_code == 0, "\n{}".format(result.output)
+            assert result.output.splitlines() == [
+                os.path.join(tmp_dir, "2021_30m_cdls_-91095_1807575_15000.tif")
+            ]
+
+    def test_tile_command_several_sizes(self) -> None:
+        infile = test_data.get_path("data-files/2021_30m_cdls.tif")
+        with TemporaryDirectory() as tmp_dir:
+            cmd = f"usda-cdl tile {infile} {tmp_dir} --size 500 --size 250"
+            self.run_command(cmd)
+            assert len(glob.glob(os.path.join(tmp_dir, "*_15000.tif"))) == 4
+            assert len(glob.glob(os.path.join(tmp_dir, "*_7500.tif"))) == 16
+
+            for option in ["--engine process", "--schedule window"]:
+                result = self.run_command(f"{cmd} {option}")
+                assert result.exit_code != 0
+            result = self.run_command(f"{cmd} --schedule strip --engine thread")
+            assert result.exit_code == 0, "\n{}".format(result.output)
+
+    def test_tile_command_profile(self) -> None:
+        infile = test_data.get_path("data-files/2021_30m_cdls.tif")
+        with TemporaryDirectory() as tmp_dir:
+            profile = os.path.join(tmp_dir, "profile.json")
+            cmd = f"usda-cdl tile {infile} {tmp_dir} --size 500 --profile {profile}"
+            self.run_command(cmd)
+            with open(profile) as f:
+                report = json.load(f)
+            assert report["tiles"] == 4
+            assert report["stages"]["copy"]["count"] == 4
@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+from stactools.usda_cdl.concurrency import bounded_map
+
+
+def test_bounded_map_limits_in_flight() -> None:
+    pulled = 0
+
+    def items() -> Iterator[int]:
+        nonlocal pulled
+        for i in range(20):
+            pulled += 1
+            yield i
+
+    results: List[int] = list()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for result in bounded_map(executor, lambda i: i * 2, items(), 3):
+            # Three pending, plus the one pulled while waiting for a free slot
+            assert pulled - len(results) <= 4
+            results.append(result)
+    assert sorted(results) == [i * 2 for i in range(20)]
+
+
+def test_bounded_map_ordered() -> None:
+    def slow_first(i: int) -> int:
+        if i == 0:
+            time.sleep(0.1)
+        return i
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(bounded_map(executor, slow_first, range(10), 3, ordered=True))
+    assert results == list(range(10))
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pytest
+
+from stactools.usda_cdl import download
+from stactools.usda_cdl.progress import Progress
+
+
+class FakeUsdaServer(ThreadingHTTPServer):
+    """A local stand-in for the USDA server, which supports Range requests.
+
+    The first ``truncate`` responses for a file are cut off half way through.
+    """
+
+    def __init__(self, files: Dict[str, bytes]) -> None:
+        super().__init__(("127.0.0.1", 0), FakeUsdaHandler)
+        self.files = files
+        self.truncate: Dict[str, int] = dict()
+        self.ranges: List[Optional[str]] = list()
+
+    @property
+    def url_base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class FakeUsdaHandler(BaseHTTPRequestHandler):
+    server: FakeUsdaServer
+
+    def do_GET(self) -> None:
+        name = self.path.lstrip("/")
+        content = self.server.files.get(name)
+        if content is None:
+            self.send_error(404)
+            return
+        range_header = self.headers.get("Range")
+        self.server.ranges.append(range_header)
+        start = int(range_header[6:-1]) if range_header else 0
+        if start >= len(content):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(content)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = content[start:]
+        if range_header:
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.server.truncate.get(name, 0) > 0:
+            self.server.truncate[name] -= 1
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+FILES = {
+    "2021_30m_cdls.zip": b"cropland" * 100000,
+    "2021_30m_Confidence_Layer.zip": b"confidence" * 100000,
+    "2021_Cultivated_Layer.zip": b"cultivated" * 1000,
+    "Crop_Frequency_2008-2021.zip": b"frequency" * 1000,
+}
+
+
+@pytest.fixture
+def server() -> Iterator[FakeUsdaServer]:
+    server = FakeUsdaServer(dict(FILES))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_zip_urls() -> None:
+    assert download.zip_urls([2016]) == [download.CROPLAND_URL.format(year=2016)]
+    assert len(download.zip_urls([2021])) == 4
+
+
+def test_download_zips(server: FakeUsdaServer, tmp_path: Path) -> None:
+    events: List[Progress] = list()
+    paths = download.download_zips(
+        [2021], tmp_path, events.append, max_workers=4, url_base=server.url_base
+    )
+    assert [path.name for path in paths] == list(FILES)
+    for path in paths:
+        assert path.read_bytes() == FILES[path.name]
+    assert not list(tmp_path.glob("*.part"))
+    final = [event for event in events if event.done]
+    assert sorted(event.description for event in final) == sorted(FILES)
+    assert all(event.unit == "B" for event in events)
+
+    # Everything is already downloaded
+    assert download.download_zips([2021], tmp_path, url_base=server.url_base) == []
+
+
+def test_download_zips_resumes(
+    server: FakeUsdaServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Small enough chunks that some of each truncated response is written
+    monkeypatch.setattr(download, "CHUNK_SIZE", 1024)
+    server.truncate["2021_30m_cdls.zip"] = 2
+    paths = download.download_zips(
+        [2021], tmp_path, lambda _: None, url_base=server.url_base
+    )
+    assert paths[0].read_bytes() == FILES["2021_30m_cdls.zip"]
+    assert sum(1 for r in server.ranges if r) == 2
+
+
+def test_download_zips_resumes_previous_run(
+    server: FakeUsdaServer, tmp_path: Path
+) -> None:
+    content = FILES["2021_30m_cdls.zip"]
+    (tmp_path / "2021_30m_cdls.zip.part").write_bytes(content[:1000])
+    (tmp_path / "2021_30m_Confidence_Layer.zip.part").write_bytes(
+        FILES["2021_30m_Confidence_Layer.zip"]
+    )
+    paths = download.download_zips(
+        [2021], tmp_path, lambda _: None, url_base=server.url_base
+    )
+    for path in paths:
+        assert path.read_bytes() == FILES[path.name]
+    assert "bytes=1000-" in server.ranges
+
+
+def test_download_zips_checksum(server: FakeUsdaServer, tmp_path: Path) -> None:
+    checksums = dict(
+        (name, hashlib.sha256(content).hexdigest()) for name, content in FILES.items()
+    )
+    download.download_zips(
+        [2021], tmp_path, lambda _: None, checksums=checksums, url_base=server.url_base
+    )
+    checksums["2021_30m_cdls.zip"] = "0" * 64
+    (tmp_path / "2021_30m_cdls.zip").unlink()
+    with pytest.raises(ValueError):
+        download.download_zips(
+            [2021],
+            tmp_path,
+            lambda _: None,
+            checksums=checksums,
+            url_base=server.url_base,
+        )
+    assert not (tmp_path / "2021_30m_cdls.zip").exists()
+    assert not (tmp_path / "2021_30m_cdls.zip.part").exists()
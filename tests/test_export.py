@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from stactools.usda_cdl import export, stac
+
+
+def test_format_from_path() -> None:
+    assert export.Format.from_path(Path("items.parquet")) == export.Format.Geoparquet
+    assert export.Format.from_path(Path("items.ndjson")) == export.Format.Ndjson
+
+
+def test_find_tiles(tiles: List[Path]) -> None:
+    directory = tiles[0].parent
+    expected = sorted(str(tile) for tile in tiles)
+    assert export.find_tiles([str(directory)]) == expected
+    assert export.find_tiles([str(directory / "*.tif")]) == expected
+    assert export.find_tiles([str(tiles[0]), str(directory)])[0] == str(tiles[0])
+    assert len(export.find_tiles([str(tiles[0]), str(directory)])) == len(tiles)
+
+
+def test_read_tile_list(tiles: List[Path], tmp_path: Path) -> None:
+    path = tmp_path / "tiles.txt"
+    path.write_text("\n".join(str(tile) for tile in tiles) + "\n\n")
+    assert export.read_tile_list(path) == [str(tile) for tile in tiles]
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 1000])
+def test_write_ndjson(tiles: List[Path], tmp_path: Path, batch_size: int) -> None:
+    hrefs = [str(tile) for tile in tiles]
+    expected = [
+        item.to_dict(include_self_link=False, transform_hrefs=False)
+        for item in stac.create_items_from_tiles(hrefs)
+    ]
+    path = tmp_path / "items.ndjson"
+    count = export.write_items(
+        stac.iter_items_from_tiles(hrefs), path, batch_size=batch_size
+    )
+    assert count == len(expected)
+    with open(path) as f:
+        actual = [json.loads(line) for line in f]
+    assert json.dumps(actual) == json.dumps(expected)
+    assert not (tmp_path / "items.ndjson.part").exists()
+
+
+def test_write_ndjson_invalid_batch_size(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        export.write_ndjson([], tmp_path / "items.ndjson", batch_size=0)
+
+
+def test_write_geoparquet(tiles: List[Path], tmp_path: Path) -> None:
+    pytest.importorskip("stac_geoparquet")
+    import pyarrow.parquet
+
+    hrefs = [str(tile) for tile in tiles]
+    path = tmp_path / "items.parquet"
+    count = export.write_items(stac.iter_items_from_tiles(hrefs), path, batch_size=3)
+    assert count == pyarrow.parquet.read_table(path).num_rows
+    assert [p.name for p in tmp_path.iterdir()] == ["items.parquet"]
@@ -0,0 +1,104 @@
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from stactools.usda_cdl import grid, tile
+from stactools.usda_cdl.constants import AssetType
+from stactools.usda_cdl.manifest import Manifest
+from stactools.usda_cdl.metadata import Metadata
+
+TOP_LEFT = "2021_30m_cdls_-106095_1822575_15000.tif"
+TOP_RIGHT = "2021_30m_cdls_-91095_1822575_15000.tif"
+BOTTOM_LEFT = "2021_30m_cdls_-106095_1807575_15000.tif"
+BOTTOM_RIGHT = "2021_30m_cdls_-91095_1807575_15000.tif"
+
+
+def test_source_stem() -> None:
+    assert grid.source_stem(2021, AssetType.Cropland) == "2021_30m_cdls"
+    assert grid.source_stem(2021, AssetType.Confidence) == "2021_30m_confidence_layer"
+    assert grid.source_stem(2021, AssetType.Cultivated) == "2021_cultivated_layer"
+    assert grid.source_stem(2021, AssetType.Corn) == "crop_frequency_corn_2008-2021"
+    with pytest.raises(ValueError):
+        grid.source_stem(2000, AssetType.Cropland)
+
+
+def test_tiles_for_bbox_without_index(tiles: List[Path]) -> None:
+    bbox = (-106095, 1792605, -76095, 1822605)
+    names = grid.tiles_for_bbox(bbox, 2021, AssetType.Cropland, 500)
+    assert names == [TOP_LEFT, TOP_RIGHT, BOTTOM_LEFT, BOTTOM_RIGHT]
+    # The names are the ones that tiling gave them
+    assert set(names) < set(path.name for path in tiles)
+    for name in names:
+        bounds = Metadata.from_href(name).tile_bounds
+        assert bounds is not None
+        left, bottom, right, top = bounds
+        assert left < bbox[2] and right > bbox[0]
+        assert bottom < bbox[3] and top > bbox[1]
+
+    # Edges that only touch aren't included, but a point on an edge is
+    assert grid.tiles_for_bbox(
+        (-106095, 1807605, -91095, 1822605), 2021, AssetType.Cropland, 500
+    ) == [TOP_LEFT]
+    assert grid.tiles_for_point(-91095, 1807605, 2021, AssetType.Cropland, 500) == [
+        BOTTOM_RIGHT
+    ]
+    assert grid.tiles_for_point(-1e7, 0, 2021, AssetType.Cropland, 500) == []
+    with pytest.raises(ValueError):
+        grid.tiles_for_bbox((1, 0, 0, 1), 2021, AssetType.Cropland, 500)
+
+
+def test_tiles_for_bbox_lonlat() -> None:
+    names = grid.tiles_for_point(
+        -96.98, 39.22, 2021, AssetType.Cropland, 500, "EPSG:4326"
+    )
+    assert names == [BOTTOM_RIGHT]
+
+
+def test_index(cdl: Path, tmp_path: Path) -> None:
+    paths = tile.tile_geotiff(cdl, tmp_path, 500)
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls")
+    del manifest.completed[TOP_RIGHT]
+    manifest.empty.add(TOP_RIGHT)
+    manifest.save()
+
+    bbox = (-106095, 1792605, -76095, 1822605)
+    expected = [str(tmp_path / name) for name in [TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT]]
+    hrefs = grid.tiles_for_bbox(bbox, 2021, AssetType.Cropland, 500, directory=tmp_path)
+    assert hrefs == expected
+    assert set(hrefs) < set(str(path) for path in paths)
+    index_path = tmp_path / grid.index_name("2021_30m_cdls", 500)
+    assert index_path.exists()
+
+    index = grid.TileIndex.load(index_path)
+    # Tiling plans an empty column past the right edge of the test data
+    assert index.exists.shape == (2, 3)
+    assert index.to_dict() == grid.TileIndex.from_dict(index.to_dict()).to_dict()
+    assert index.tiles_for_bbox(bbox) == [TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT]
+
+    # The index is rebuilt when the manifest changes
+    manifest.completed[TOP_RIGHT] = ""
+    manifest.save()
+    os.utime(index_path, (0, 0))
+    hrefs = grid.tiles_for_bbox(bbox, 2021, AssetType.Cropland, 500, directory=tmp_path)
+    assert len(hrefs) == 4
+
+    with pytest.raises(ValueError):
+        grid.TileIndex.for_stem(tmp_path, "2021_30m_cdls", 1000)
+    with pytest.raises(FileNotFoundError):
+        grid.TileIndex.for_stem(tmp_path, "2021_30m_confidence_layer", 500)
+
+
+def test_index_directory(cdl: Path, corn: Path, tmp_path: Path) -> None:
+    tile.tile_pyramid(cdl, tmp_path, [250, 500])
+    tile.tile_geotiff(corn, tmp_path, 500)
+    paths = grid.index_directory(tmp_path)
+    assert [path.name for path in paths] == [
+        "2021_30m_cdls.250.index.json",
+        "2021_30m_cdls.500.index.json",
+        "crop_frequency_corn_2008-2021.500.index.json",
+    ]
+    index = grid.TileIndex.load(paths[0])
+    assert index.exists.shape == (4, 5)
+    assert len(index.tiles_for_bbox((-1e7, 0, 1e7, 1e7))) == index.exists.sum()
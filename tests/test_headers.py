@@ -0,0 +1,71 @@
+import json
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import List
+
+from stactools.usda_cdl import stac
+from stactools.usda_cdl.headers import HeaderCache, RasterHeader
+
+
+def test_header_cache_hits_and_misses(cdl_tile: Path, tmp_path: Path) -> None:
+    with HeaderCache(tmp_path / "headers.sqlite") as cache:
+        header = cache.get(str(cdl_tile))
+        assert cache.get(str(cdl_tile)) == header
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+        assert cache.stats.hit_rate == 0.5
+    assert header == RasterHeader.read(str(cdl_tile))
+
+
+def test_header_cache_persists(cdl_tile: Path, tmp_path: Path) -> None:
+    path = tmp_path / "headers.sqlite"
+    with HeaderCache(path) as cache:
+        cache.get(str(cdl_tile))
+    with HeaderCache(path) as cache:
+        cache.get(str(cdl_tile))
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 0
+
+
+def test_header_cache_changed_file(cdl_tile: Path, tmp_path: Path) -> None:
+    tile = tmp_path / cdl_tile.name
+    shutil.copyfile(cdl_tile, tile)
+    with HeaderCache(tmp_path / "headers.sqlite") as cache:
+        cache.get(str(tile))
+        stat = tile.stat()
+        os.utime(tile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        cache.get(str(tile))
+        assert cache.stats.misses == 2
+
+
+def test_header_cache_pickle(cdl_tile: Path, tmp_path: Path) -> None:
+    with HeaderCache(tmp_path / "headers.sqlite") as cache:
+        cache.get(str(cdl_tile))
+        with pickle.loads(pickle.dumps(cache)) as copy:
+            copy.get(str(cdl_tile))
+            assert copy.stats.hits == 1
+
+
+def test_create_item_with_header_cache(cdl: Path, tmp_path: Path) -> None:
+    expected = stac.create_item(str(cdl)).to_dict()
+    with HeaderCache(tmp_path / "headers.sqlite") as cache:
+        for _ in range(2):
+            item = stac.create_item(str(cdl), cache=cache).to_dict()
+            assert json.dumps(item) == json.dumps(expected)
+        assert cache.stats.hits == 1
+
+
+def test_create_items_from_tiles_with_header_cache(
+    tiles: List[Path], tmp_path: Path
+) -> None:
+    hrefs = [str(tile) for tile in tiles]
+    expected = [item.to_dict() for item in stac.create_items_from_tiles(hrefs)]
+    with HeaderCache(tmp_path / "headers.sqlite") as cache:
+        stac.create_items_from_tiles(hrefs, cache=cache)
+        items = stac.create_items_from_tiles(hrefs, max_workers=4, cache=cache)
+        actual = [item.to_dict() for item in items]
+        assert json.dumps(actual) == json.dumps(expected)
+        assert cache.stats.hits == len(hrefs)
+        assert cache.stats.misses == len(hrefs)
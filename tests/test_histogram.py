@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import rasterio
+
+from stactools.usda_cdl import histogram, tile
+
+
+def test_compute() -> None:
+    data = np.array([[0, 1, 1], [5, 5, 5]], dtype=np.uint8)
+    counts = histogram.compute(data)
+    assert len(counts) == 256
+    assert counts[:6] == [1, 2, 0, 0, 0, 3]
+    assert sum(counts) == 6
+
+
+def test_write_and_read(tmp_path: Path) -> None:
+    path = tmp_path / "2021_30m_cdls_0_0_15000.tif"
+    counts = [0] * 256
+    counts[1] = 10
+    histogram.write(path, counts)
+    assert (tmp_path / "2021_30m_cdls_0_0_15000.histogram.json").exists()
+    assert not list(tmp_path.glob("*.part"))
+    assert histogram.read(str(path)) == counts
+    assert histogram.read(str(tmp_path / "other.tif")) is None
+
+
+def test_statistics() -> None:
+    counts = [0] * 256
+    counts[0] = 2
+    counts[1] = 1
+    counts[3] = 1
+    statistics = histogram.statistics(counts, 0)
+    assert statistics.minimum == 1
+    assert statistics.maximum == 3
+    assert statistics.mean == 2
+    assert statistics.stddev == 1
+    assert statistics.valid_percent == 50
+    assert histogram.statistics(counts).minimum == 0
+    assert histogram.statistics([4] + [0] * 255, 0).valid_percent == 0
+
+
+def test_histogram() -> None:
+    counts = list(range(256))
+    result = histogram.histogram(counts)
+    assert result.count == 256
+    assert result.min == -0.5
+    assert result.max == 255.5
+    assert result.buckets == counts
+
+
+def test_classes_with_counts() -> None:
+    classes = [{"value": 1, "description": "Corn"}, {"value": 3, "description": "X"}]
+    counts = [0, 7, 0, 2] + [0] * 252
+    assert histogram.classes_with_counts(classes, counts) == [
+        {"value": 1, "description": "Corn", "count": 7},
+        {"value": 3, "description": "X", "count": 2},
+    ]
+    assert "count" not in classes[0]
+
+
+@pytest.mark.parametrize("histograms", [True, False])
+def test_tile_histograms(cdl: Path, tmp_path: Path, histograms: bool) -> None:
+    paths = tile.tile_geotiff(cdl, tmp_path, 500, histograms=histograms)
+    for path in paths:
+        counts = histogram.read(str(path))
+        if histograms:
+            with rasterio.open(path) as dataset:
+                assert counts == histogram.compute(dataset.read(1))
+        else:
+            assert counts is None
@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from pystac import CatalogType, Collection
+
+from stactools.usda_cdl import layout, stac
+
+
+def read_tree(directory: Path) -> Dict[str, Dict[str, Any]]:
+    """Reads every JSON file under a directory, with links in a fixed order."""
+    tree: Dict[str, Dict[str, Any]] = dict()
+    for path in directory.rglob("*.json"):
+        data = json.loads(path.read_text())
+        data["links"] = sorted(data["links"], key=lambda link: json.dumps(link))
+        tree[str(path.relative_to(directory))] = data
+    return tree
+
+
+def collection_with_items(tiles: List[Path], layout_: layout.Layout) -> Collection:
+    collection = stac.create_collection()
+    items = stac.create_items_from_tiles([str(tile) for tile in tiles])
+    layout.add_items(collection, items, layout_, bucket_size=30000)
+    return collection
+
+
+def test_partition(cdl_tile: Path, cdl: Path) -> None:
+    item = stac.create_item(str(cdl_tile))
+    keys = [key for key, _ in layout.partition(item, bucket_size=30000)]
+    assert keys == ["cropland", "2021", "-120000_1770000_30000"]
+    keys = [key for key, _ in layout.partition(item)]
+    assert keys == ["cropland", "2021", "-480000_1440000_480000"]
+    keys = [key for key, _ in layout.partition(stac.create_item(str(cdl)))]
+    assert keys == ["cropland", "2021"]
+
+
+@pytest.mark.parametrize("catalog_type", list(CatalogType))
+def test_save_matches_pystac(
+    tiles: List[Path], tmp_path: Path, catalog_type: CatalogType
+) -> None:
+    expected = collection_with_items(tiles, layout.Layout.Hierarchical)
+    expected.normalize_hrefs(str(tmp_path / "expected"))
+    expected.save(catalog_type=catalog_type)
+    actual = collection_with_items(tiles, layout.Layout.Hierarchical)
+    hrefs = layout.save(actual, tmp_path / "actual", catalog_type, max_workers=4)
+    assert len(hrefs) == len(read_tree(tmp_path / "actual"))
+    expected_tree = read_tree(tmp_path / "expected")
+    actual_tree = read_tree(tmp_path / "actual")
+    assert json.dumps(actual_tree, sort_keys=True).replace(
+        "/actual/", "/expected/"
+    ) == json.dumps(expected_tree, sort_keys=True)
+
+
+def test_hierarchical_layout(tiles: List[Path], tmp_path: Path) -> None:
+    collection = collection_with_items(tiles, layout.Layout.Hierarchical)
+    layout.save(collection, tmp_path)
+    collection = Collection.from_file(str(tmp_path / "collection.json"))
+    assert not list(collection.get_items())
+    assert sorted(child.id for child in collection.get_children()) == [
+        "cropland",
+        "cultivated",
+        "frequency",
+    ]
+    cropland = collection.get_child("cropland")
+    assert cropland
+    year = cropland.get_child("cropland_2021")
+    assert year
+    buckets = list(year.get_children())
+    assert len(buckets) == 2
+    assert all(len(list(bucket.get_items())) == 2 for bucket in buckets)
+    assert (tmp_path / "cropland" / "cropland_2021" / "catalog.json").exists()
+    assert len(list(collection.get_items(recursive=True))) == len(
+        stac.create_items_from_tiles([str(tile) for tile in tiles])
+    )
+
+
+def test_flat_layout(tiles: List[Path]) -> None:
+    collection = collection_with_items(tiles, layout.Layout.Flat)
+    assert not list(collection.get_children())
+    assert list(collection.get_items())
+
+
+def test_save_to_self_href(tiles: List[Path], tmp_path: Path) -> None:
+    collection = collection_with_items(tiles, layout.Layout.Hierarchical)
+    collection.set_self_href(str(tmp_path / "my-collection.json"))
+    hrefs = layout.save(collection)
+    assert hrefs[0] == str(tmp_path / "my-collection.json")
+    assert not (tmp_path / "collection.json").exists()
+    collection = Collection.from_file(str(tmp_path / "my-collection.json"))
+    catalogs = [href for href in hrefs if href.endswith("catalog.json")]
+    assert (
+        len(list(collection.get_items(recursive=True)))
+        == len(hrefs) - len(catalogs) - 1
+    )
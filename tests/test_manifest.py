@@ -0,0 +1,91 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from stactools.usda_cdl.manifest import Manifest, merge
+
+
+def test_load_missing_manifest(tmp_path: Path) -> None:
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls")
+    assert manifest.path == tmp_path / "2021_30m_cdls.manifest.json"
+    assert manifest.completed == {}
+    assert manifest.empty == set()
+
+
+def test_save_and_load_manifest(tmp_path: Path) -> None:
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls")
+    manifest.completed["a.tif"] = "abc"
+    manifest.empty.add("b.tif")
+    manifest.save()
+    assert not list(tmp_path.glob("*.part"))
+
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls")
+    assert manifest.completed == {"a.tif": "abc"}
+    assert manifest.empty == {"b.tif"}
+
+
+def test_done_forgets_missing_tiles(tmp_path: Path) -> None:
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls")
+    manifest.completed["a.tif"] = "abc"
+    manifest.completed["b.tif"] = "def"
+    manifest.empty.add("c.tif")
+    (tmp_path / "a.tif").touch()
+    assert manifest.done() == {"a.tif", "c.tif"}
+    assert manifest.completed == {"a.tif": "abc"}
+
+
+def test_shard_manifest_name(tmp_path: Path) -> None:
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls", 1, 4)
+    assert manifest.path == tmp_path / "2021_30m_cdls.shard-1-of-4.manifest.json"
+    assert manifest.shard_index == 1
+    assert manifest.shard_count == 4
+
+
+def _shard(tmp_path: Path, shard_index: int, windows: List[str]) -> Manifest:
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls", shard_index, 2)
+    manifest.windows = set(windows)
+    manifest.completed = dict((window, "abc") for window in windows[1:])
+    manifest.empty = set(windows[:1])
+    return manifest
+
+
+def test_merge(tmp_path: Path) -> None:
+    merged = merge(
+        [_shard(tmp_path, 0, ["a", "b"]), _shard(tmp_path, 1, ["c", "d"])],
+        tmp_path / "merged.json",
+    )
+    assert merged.windows == {"a", "b", "c", "d"}
+    assert merged.completed == {"b": "abc", "d": "abc"}
+    assert merged.empty == {"a", "c"}
+    assert merged.shard_count == 1
+
+
+def test_merge_missing_shard(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        merge([_shard(tmp_path, 0, ["a", "b"])], tmp_path / "merged.json")
+
+
+def test_merge_duplicated_window(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        merge(
+            [_shard(tmp_path, 0, ["a", "b"]), _shard(tmp_path, 1, ["b", "c"])],
+            tmp_path / "merged.json",
+        )
+
+
+def test_merge_missing_window(tmp_path: Path) -> None:
+    incomplete = _shard(tmp_path, 1, ["c", "d"])
+    del incomplete.completed["d"]
+    with pytest.raises(ValueError):
+        merge([_shard(tmp_path, 0, ["a", "b"]), incomplete], tmp_path / "merged.json")
+
+
+def test_merge_constant_windows(tmp_path: Path) -> None:
+    indexed = _shard(tmp_path, 1, ["c", "d"])
+    del indexed.completed["d"]
+    indexed.constant["d"] = 5
+    merged = merge([_shard(tmp_path, 0, ["a", "b"]), indexed], tmp_path / "m.json")
+    assert merged.constant == {"d": 5}
+    merged.save()
+    assert Manifest.load(tmp_path / "m.json").constant == {"d": 5}
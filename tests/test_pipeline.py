@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from requests import HTTPError
+
+from stactools.usda_cdl import pipeline
+from tests import test_data
+from tests.test_download import FakeUsdaServer
+
+ZIPS = {
+    "2021_30m_cdls.zip": ["2021_30m_cdls.tif"],
+    "2021_30m_Confidence_Layer.zip": ["2021_30m_confidence_layer.tif"],
+    "2021_Cultivated_Layer.zip": ["2021_cultivated_layer.tif"],
+    "Crop_Frequency_2008-2021.zip": [
+        f"crop_frequency_{crop}_2008-2021.tif"
+        for crop in ["corn", "cotton", "soybeans", "wheat"]
+    ],
+}
+
+
+@pytest.fixture
+def zips(tmp_path_factory: pytest.TempPathFactory) -> Dict[str, bytes]:
+    directory = tmp_path_factory.mktemp("zips")
+    contents = dict()
+    for name, members in ZIPS.items():
+        path = directory / name
+        with zipfile.ZipFile(path, "w") as zip_file:
+            for member in members:
+                zip_file.write(test_data.get_path(f"data-files/{member}"), member)
+            zip_file.writestr("README.txt", "not a GeoTIFF")
+        contents[name] = path.read_bytes()
+    return contents
+
+
+@pytest.fixture
+def server(zips: Dict[str, bytes]) -> Iterator[FakeUsdaServer]:
+    server = FakeUsdaServer(dict(zips))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read_items(path: Path) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_geotiffs(zips: Dict[str, bytes], tmp_path: Path) -> None:
+    path = tmp_path / "Crop_Frequency_2008-2021.zip"
+    path.write_bytes(zips[path.name])
+    assert pipeline.geotiffs(path) == ZIPS[path.name]
+
+
+def test_process(server: FakeUsdaServer, tmp_path: Path) -> None:
+    paths = pipeline.process([2021], tmp_path, size=500, url_base=server.url_base)
+    assert paths == [tmp_path / "items" / "2021.ndjson"]
+    items = read_items(paths[0])
+    assert sorted(set(item["id"].rsplit("_", 3)[0] for item in items)) == [
+        "cropland_2021",
+        "cultivated_2021",
+        "frequency_2008-2021",
+    ]
+    cropland = [item for item in items if item["id"].startswith("cropland")]
+    assert all(set(item["assets"]) == {"cropland", "confidence"} for item in cropland)
+    state = pipeline.PipelineState.load(tmp_path / pipeline.STATE_FILE_NAME)
+    assert state.downloaded == set(ZIPS)
+    assert state.tiled["Crop_Frequency_2008-2021.zip"] == [
+        Path(member).stem for member in ZIPS["Crop_Frequency_2008-2021.zip"]
+    ]
+    assert state.items == {2021}
+
+    # Nothing is left to do
+    requests = len(server.ranges)
+    pipeline.process([2021], tmp_path, size=500, url_base=server.url_base)
+    assert len(server.ranges) == requests
+
+
+def test_process_appends_items_while_tiling(
+    server: FakeUsdaServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    tile_zip = pipeline._tile_zip
+    state_path = tmp_path / pipeline.STATE_FILE_NAME
+    appended: List[List[str]] = list()
+
+    def tile_frequency_last(infile: Path, *args: Any) -> List[str]:
+        if infile.name.startswith("Crop_Frequency"):
+            # Hold the frequency zip back until the other item types are out
+            deadline = time.monotonic() + 60
+            while time.monotonic() < deadline:
+                state = pipeline.PipelineState.load(state_path)
+                if len(state.item_types.get(2021, [])) == 2:
+                    break
+                time.sleep(0.05)
+            items = read_items(tmp_path / "items" / "2021.ndjson")
+            appended.append(sorted(set(item["id"].split("_")[0] for item in items)))
+        return tile_zip(infile, *args)
+
+    monkeypatch.setattr(pipeline, "_tile_zip", tile_frequency_last)
+    paths = pipeline.process(
+        [2021], tmp_path, size=500, tile_jobs=2, url_base=server.url_base
+    )
+    assert appended == [["cropland", "cultivated"]]
+    items = read_items(paths[0])
+    assert len(items) == len(set(item["id"] for item in items))
+    assert sorted(set(item["id"].split("_")[0] for item in items)) == [
+        "cropland",
+        "cultivated",
+        "frequency",
+    ]
+    state = pipeline.PipelineState.load(state_path)
+    assert state.items == {2021}
+    assert sorted(state.item_types[2021]) == ["cropland", "cultivated", "frequency"]
+    assert state.item_bytes[2021] == paths[0].stat().st_size
+
+
+def test_process_restarts(server: FakeUsdaServer, tmp_path: Path) -> None:
+    missing = server.files.pop("Crop_Frequency_2008-2021.zip")
+    with pytest.raises(HTTPError):
+        pipeline.process([2021], tmp_path, size=500, url_base=server.url_base)
+    state = pipeline.PipelineState.load(tmp_path / pipeline.STATE_FILE_NAME)
+    assert not state.items
+    assert "Crop_Frequency_2008-2021.zip" not in state.downloaded
+
+    server.files["Crop_Frequency_2008-2021.zip"] = missing
+    server.ranges.clear()
+    paths = pipeline.process(
+        [2021], tmp_path, size=500, tile_jobs=2, url_base=server.url_base
+    )
+    assert server.ranges == [None]  # only the missing zip is downloaded
+    assert read_items(paths[0])
+
+
+def test_process_truncates_unrecorded_items(
+    server: FakeUsdaServer, tmp_path: Path
+) -> None:
+    paths = pipeline.process([2021], tmp_path, size=500, url_base=server.url_base)
+    expected = paths[0].read_bytes()
+    state = pipeline.PipelineState.load(tmp_path / pipeline.STATE_FILE_NAME)
+    # As if the run was interrupted while appending the last item type
+    last = state.item_types[2021].pop()
+    lines = expected.splitlines(keepends=True)
+    state.item_bytes[2021] = sum(
+        len(line) for line in lines if not json.loads(line)["id"].startswith(last)
+    )
+    state.items.clear()
+    state.save()
+    paths[0].write_bytes(expected + b'{"partial')
+    pipeline.process([2021], tmp_path, size=500, url_base=server.url_base)
+    assert sorted(paths[0].read_bytes().splitlines()) == sorted(expected.splitlines())
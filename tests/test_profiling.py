@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from stactools.usda_cdl import tile
+from stactools.usda_cdl.profiling import Profile, Stage, StageTiming, timed
+
+
+def test_timed() -> None:
+    timings: List[StageTiming] = list()
+    with timed(timings, Stage.Read, "a.tif", 10):
+        pass
+    assert len(timings) == 1
+    assert timings[0].stage == Stage.Read
+    assert timings[0].name == "a.tif"
+    assert timings[0].nbytes == 10
+    assert timings[0].seconds >= 0
+    with timed(None, Stage.Read, "a.tif"):
+        pass
+
+
+def test_report() -> None:
+    profile = Profile()
+    profile.add([StageTiming(Stage.Plan, "source", 1.0)])
+    for i in range(1, 101):
+        profile.add_tile(
+            [
+                StageTiming(Stage.Read, str(i), i / 100, 1024**2),
+                StageTiming(Stage.Copy, str(i), 0.5),
+            ],
+            written=i % 2 == 0,
+        )
+    profile.stop()
+    report = profile.report()
+    assert report["tiles"] == 100
+    assert report["written"] == 50
+    assert report["tiles_per_second"] > 0
+    assert sorted(report["stages"]) == ["copy", "plan", "read"]
+    read = report["stages"]["read"]
+    assert read["count"] == 100
+    assert read["p50_seconds"] == pytest.approx(0.505)
+    assert read["p95_seconds"] == pytest.approx(0.9505)
+    assert read["max_seconds"] == pytest.approx(1.0)
+    assert read["mb_per_second"] == pytest.approx(100 / 50.5)
+
+
+def test_callback() -> None:
+    received: List[StageTiming] = list()
+    profile = Profile(callback=received.append)
+    timing = StageTiming(Stage.Check, "a.tif", 0.1)
+    profile.add_tile([timing], written=False)
+    assert received == [timing]
+
+
+@pytest.mark.parametrize(
+    "engine,schedule",
+    [
+        (tile.Engine.Thread, tile.Schedule.Window),
+        (tile.Engine.Thread, tile.Schedule.Strip),
+        (tile.Engine.Process, tile.Schedule.Window),
+    ],
+)
+def test_profile_tiling(
+    cdl: Path, tmp_path: Path, engine: tile.Engine, schedule: tile.Schedule
+) -> None:
+    profile = Profile()
+    paths = tile.tile_geotiff(
+        cdl,
+        tmp_path,
+        500,
+        max_workers=2,
+        engine=engine,
+        schedule=schedule,
+        profile=profile,
+    )
+    report = profile.report()
+    assert report["tiles"] == report["written"] == len(paths) == 4
+    stages = report["stages"]
+    assert stages["plan"]["count"] == 1
+    for stage in ["check", "colormap", "write", "copy", "checksum"]:
+        assert stages[stage]["count"] == 4
+    assert stages["read"]["bytes"] >= 4 * 500 * 500
@@ -0,0 +1,56 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from stactools.usda_cdl import progress, tile
+from stactools.usda_cdl.progress import Progress, ProgressBar, Tracker
+
+
+def test_tracker_throttles_but_emits_first_and_last(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(progress, "EMIT_INTERVAL_SECONDS", 3600)
+    events: List[Progress] = list()
+    tracker = Tracker("a", 10, "tile", events.append)
+    tracker.submit(4)
+    for i in range(10):
+        tracker.update(skipped=i % 2, bytes_written=100)
+    assert [event.completed for event in events] == [1, 10]
+    last = events[-1]
+    assert last.done
+    assert last.skipped == 5
+    assert last.bytes_written == 1000
+    assert last.in_flight == 0
+    assert last.rate > 0
+    assert last.eta == 0
+    tracker.finish()
+    assert len(events) == 2
+
+
+def test_progress_eta() -> None:
+    event = Progress("a", "tile", total=10, completed=4, rate=2.0)
+    assert event.eta == 3.0
+    assert not event.done
+    assert Progress("a", "B", total=None, completed=4, rate=2.0).eta is None
+
+
+def test_progress_bar() -> None:
+    with ProgressBar() as bar:
+        bar(Progress("a", "tile", total=2, completed=1, in_flight=1))
+        bar(Progress("b", "B", total=None, completed=100))
+        bar(Progress("a", "tile", total=2, completed=2))
+        assert list(bar._bars) == ["b"]
+    assert not bar._bars
+
+
+def test_tile_progress(cdl: Path, tmp_path: Path) -> None:
+    events: List[Progress] = list()
+    paths = tile.tile_geotiff(cdl, tmp_path, 500, progress=events.append)
+    assert events[0].completed == 0
+    last = events[-1]
+    assert last.description == "2021_30m_cdls"
+    assert last.total == last.completed == 4
+    assert last.skipped == 0
+    assert last.in_flight == 0
+    assert last.bytes_written == sum(path.stat().st_size for path in paths)
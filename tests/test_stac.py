@@ -1,15 +1,25 @@
 import datetime
+import json
+import os.path
+import shutil
 from pathlib import Path
 from typing import List
 
 import pytest
+import rasterio
+from affine import Affine
 from dateutil.tz import tzutc
-from pystac import MediaType
+from pystac import CatalogType, Collection, Item, MediaType
 from pystac.extensions.item_assets import ItemAssetsExtension
 from pystac.extensions.raster import RasterExtension
 
-from stactools.usda_cdl import stac
-from stactools.usda_cdl.constants import CLASSIFICATION_SCHEMA
+from stactools.usda_cdl import histogram, layout, stac, tile
+from stactools.usda_cdl.constants import (
+    CLASSIFICATION_SCHEMA,
+    COG_RASTER_BAND,
+    AssetType,
+)
+from stactools.usda_cdl.metadata import Metadata
 
 
 def test_create_cdl_item(cdl: Path) -> None:
@@ -129,6 +139,34 @@ def test_create_cdl_tile_item(cdl_tile: Path) -> None:
     item.validate()
 
 
+def test_create_tile_item_with_histogram(cdl: Path, tmp_path: Path) -> None:
+    path = tile.tile_geotiff(cdl, tmp_path, 500)[0]
+    counts = histogram.read(str(path))
+    assert counts
+    item = stac.create_item(str(path))
+    asset = item.assets["cropland"]
+    classes = asset.extra_fields["classification:classes"]
+    assert all(c["count"] == counts[c["value"]] for c in classes)
+    bands = RasterExtension.ext(asset).bands
+    assert bands is not None
+    band = bands[0]
+    assert band.histogram is not None
+    assert band.histogram.buckets == counts
+    assert band.statistics is not None
+    assert band.statistics.valid_percent is not None
+    assert band.statistics.valid_percent > 0
+    assert band.nodata == 0
+    assert "histogram" not in COG_RASTER_BAND[AssetType.Cropland].to_dict()
+
+    path.with_name(path.stem + ".histogram.json").unlink()
+    item = stac.create_item(str(path))
+    asset = item.assets["cropland"]
+    assert "count" not in asset.extra_fields["classification:classes"][0]
+    bands = RasterExtension.ext(asset).bands
+    assert bands is not None
+    assert "histogram" not in bands[0].to_dict()
+
+
 def test_create_items_from_tiles(tiles: List[Path]) -> None:
     items = stac.create_items_from_tiles([str(p) for p in tiles])
     assert len(items) == 12
@@ -136,6 +174,163 @@ def test_create_items_from_tiles(tiles: List[Path]) -> None:
         item.validate()
 
 
+def test_create_items_from_tiles_fast(tiles: List[Path]) -> None:
+    hrefs = [str(p) for p in tiles]
+    expected = [item.to_dict() for item in stac.create_items_from_tiles(hrefs)]
+    actual = [
+        item.to_dict()
+        for item in stac.create_items_from_tiles(hrefs, fast=True, verify=len(hrefs))
+    ]
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+@pytest.mark.parametrize("engine", [tile.Engine.Thread, tile.Engine.Process])
+def test_iter_items_from_tiles(tiles: List[Path], engine: tile.Engine) -> None:
+    hrefs = [str(p) for p in tiles]
+    expected = [item.to_dict() for item in stac.create_items_from_tiles(hrefs)]
+    iterator = stac.iter_items_from_tiles(hrefs, max_workers=2, engine=engine)
+    assert isinstance(next(iterator), Item)
+    actual = [
+        item.to_dict()
+        for item in stac.create_items_from_tiles(hrefs, max_workers=2, engine=engine)
+    ]
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_iter_items_from_tiles_checks_consistency(
+    cdl_tile: Path, tmp_path: Path
+) -> None:
+    # Same item id, but a different geometry
+    misplaced = tmp_path / "2021_30m_confidence_layer_-91095_1807575_15000.tif"
+    with rasterio.open(cdl_tile) as dataset:
+        profile = dataset.profile
+        data = dataset.read()
+    profile["transform"] = profile["transform"] * Affine.translation(1, 0)
+    with rasterio.open(misplaced, "w", **profile) as dataset:
+        dataset.write(data)
+    with pytest.raises(ValueError):
+        list(stac.iter_items_from_tiles([str(cdl_tile), str(misplaced)], max_workers=2))
+
+
+def test_verify_tile(cdl_tile: Path, tmp_path: Path) -> None:
+    stac.verify_tile(str(cdl_tile))
+    misnamed = tmp_path / "2021_30m_cdls_-91095_1822575_15000.tif"
+    shutil.copy(cdl_tile, misnamed)
+    with pytest.raises(ValueError):
+        stac.verify_tile(str(misnamed))
+    with pytest.raises(ValueError):
+        stac.create_items_from_tiles([str(misnamed)], fast=True, verify=1)
+    assert stac.create_items_from_tiles([str(misnamed)], fast=True)
+
+
+def test_tile_bounds(cdl_tile: Path) -> None:
+    metadata = Metadata.from_href(str(cdl_tile))
+    assert metadata.tile_bounds == (-91095, 1792605, -76095, 1807605)
+    assert Metadata.from_href("2021_30m_cdls.tif").tile_bounds is None
+
+
 def test_cant_create_mismatched_item(cdl: Path, corn: Path) -> None:
     with pytest.raises(ValueError):
         stac.create_item_from_hrefs([str(cdl), str(corn)])
+
+
+def next_year(item: Item) -> Item:
+    data = json.loads(json.dumps(item.to_dict()).replace("2021", "2022"))
+    return Item.from_dict(data)
+
+
+def test_update_collection(tiles: List[Path], tmp_path: Path) -> None:
+    items = stac.create_items_from_tiles(
+        [str(p) for p in tiles if "cultivated" not in p.name]
+    )
+    collection = stac.create_collection()
+    collection.extent.temporal.intervals = [
+        [
+            datetime.datetime(2008, 1, 1, tzinfo=tzutc()),
+            datetime.datetime(2021, 12, 31, 23, 59, 59, tzinfo=tzutc()),
+        ]
+    ]
+    collection.summaries.add("usda_cdl:type", ["cropland"])
+    collection.add_items(items)
+    collection.normalize_hrefs(str(tmp_path))
+    collection.make_all_asset_hrefs_relative()
+    collection.save(catalog_type=CatalogType.SELF_CONTAINED)
+    before = dict((p, p.stat().st_mtime_ns) for p in tmp_path.rglob("*.json"))
+
+    cultivated = stac.create_items_from_tiles(
+        [str(p) for p in tiles if "cultivated" in p.name]
+    )
+    new_items = [next_year(item) for item in items[:2]] + cultivated[:1]
+    collection_href = str(tmp_path / "collection.json")
+    written = stac.update_collection(collection_href, items + new_items)
+    assert written == [
+        str(tmp_path / item.id / f"{item.id}.json") for item in new_items
+    ] + [collection_href]
+    for path, mtime in before.items():
+        if str(path) != collection_href:
+            assert path.stat().st_mtime_ns == mtime
+
+    updated = Collection.from_file(collection_href)
+    assert updated.extent.temporal.intervals[0][1] == datetime.datetime(
+        2022, 12, 31, 23, 59, 59, tzinfo=tzutc()
+    )
+    types = updated.summaries.get_list("usda_cdl:type")
+    assert types == ["cropland"] + [
+        t
+        for t in dict.fromkeys(item.properties["usda_cdl:type"] for item in new_items)
+        if t != "cropland"
+    ]
+    assert len(list(updated.get_items())) == len(items) + len(new_items)
+    for item in updated.get_items():
+        assert item.get_collection() is not None
+        assert not os.path.isabs(next(iter(item.assets.values())).href)
+
+    # Only changed items are rewritten when replacing
+    assert stac.update_collection(collection_href, new_items[:1], replace=True) == [
+        written[0],
+        collection_href,
+    ]
+    assert len(list(Collection.from_file(collection_href).get_items())) == len(
+        items
+    ) + len(new_items)
+    assert stac.update_collection(collection_href, new_items) == []
+
+
+def test_update_hierarchical_collection(tiles: List[Path], tmp_path: Path) -> None:
+    items = stac.create_items_from_tiles(
+        [str(p) for p in tiles if "cultivated" not in p.name]
+    )
+    collection = stac.create_collection()
+    layout.add_items(collection, items, bucket_size=30000)
+    layout.save(collection, tmp_path)
+    collection_href = str(tmp_path / "collection.json")
+    before = dict((p, p.stat().st_mtime_ns) for p in tmp_path.rglob("*.json"))
+
+    # Existing items are found in the sub-catalogs
+    assert stac.update_collection(collection_href, items) == []
+
+    cropland = [item for item in items if item.id.startswith("cropland")]
+    new_items = [next_year(item) for item in cropland[:2]]
+    written = stac.update_collection(collection_href, new_items)
+    assert written[-1] == collection_href
+    for path, mtime in before.items():
+        if str(path) not in written:
+            assert path.stat().st_mtime_ns == mtime
+    # The new year's catalog is new, and so is its bucket; only the cropland
+    # catalog, which gets the new year as a child, is rewritten
+    year = tmp_path / "cropland" / "cropland_2022"
+    assert str(tmp_path / "cropland" / "catalog.json") in written
+    assert str(year / "catalog.json") in written
+    for item in new_items:
+        bucket = "_".join(key for key, _ in layout.partition(item, 30000))
+        assert str(year / bucket / item.id / f"{item.id}.json") in written
+
+    updated = Collection.from_file(collection_href)
+    assert not list(updated.get_items())
+    assert len(list(updated.get_items(recursive=True))) == len(items) + len(new_items)
+
+    # Replaced items stay where they are
+    written = stac.update_collection(collection_href, new_items[:1], replace=True)
+    assert len(written) == 3
+    updated = Collection.from_file(collection_href)
+    assert len(list(updated.get_items(recursive=True))) == len(items) + len(new_items)
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from stactools.usda_cdl import staging, tile
+
+
+def test_should_stage(cdl_zip: Path) -> None:
+    assert not staging.should_stage(cdl_zip)
+    assert staging.should_stage(cdl_zip, True)
+    assert not staging.should_stage(cdl_zip, False)
+
+
+def test_staged_geotiff(cdl: Path, cdl_zip: Path, tmp_path: Path) -> None:
+    scratch = tmp_path / "scratch"
+    with staging.staged_geotiff(cdl_zip, scratch) as path:
+        assert path.parent.parent == scratch
+        assert path.name == "2021_30m_cdls.tif"
+        assert path.read_bytes() == cdl.read_bytes()
+        # Concurrent runs stage their own copies
+        with staging.staged_geotiff(cdl_zip, scratch) as other:
+            assert other != path
+            assert other.read_bytes() == cdl.read_bytes()
+        assert path.exists()
+    assert not path.exists()
+    assert list(scratch.iterdir()) == []
+
+
+def test_staged_geotiff_keep(cdl_zip: Path, tmp_path: Path) -> None:
+    scratch = tmp_path / "scratch"
+    with staging.staged_geotiff(cdl_zip, scratch, keep=True) as path:
+        pass
+    assert path == scratch / "2021_30m_cdls.tif"
+    assert path.exists()
+    # Neither partial files nor lock files are left behind
+    assert list(scratch.iterdir()) == [path]
+    mtime = path.stat().st_mtime_ns
+    with staging.staged_geotiff(cdl_zip, scratch, keep=True) as reused:
+        assert reused == path
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_staged_geotiff_keep_concurrently(cdl_zip: Path, tmp_path: Path) -> None:
+    scratch = tmp_path / "scratch"
+
+    def stage(_: int) -> bytes:
+        with staging.staged_geotiff(cdl_zip, scratch, keep=True) as path:
+            return path.read_bytes()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        contents = list(executor.map(stage, range(8)))
+    assert all(content == contents[0] for content in contents)
+    assert [path.name for path in scratch.iterdir()] == ["2021_30m_cdls.tif"]
+
+
+def test_tile_zipfile_staged(cdl_zip: Path, tmp_path: Path) -> None:
+    scratch = tmp_path / "scratch"
+    directory = tmp_path / "staged"
+    directory.mkdir()
+    paths = tile.tile_zipfile(
+        cdl_zip, directory, 500, stage=True, scratch_directory=scratch
+    )
+    assert list(scratch.iterdir()) == []
+    directory = tmp_path / "unstaged"
+    directory.mkdir()
+    expected = tile.tile_zipfile(cdl_zip, directory, 500, stage=False)
+    assert [path.name for path in paths] == [path.name for path in expected]
+    for path, expected_path in zip(paths, expected):
+        assert path.read_bytes() == expected_path.read_bytes()
+
+
+def test_tile_pyramid_staged(cdl_zip: Path, tmp_path: Path) -> None:
+    scratch = tmp_path / "scratch"
+    directory = tmp_path / "staged"
+    directory.mkdir()
+    groups = tile.tile_pyramid(
+        cdl_zip, directory, [500, 250], stage=True, scratch_directory=scratch
+    )
+    assert list(scratch.iterdir()) == []
+    directory = tmp_path / "unstaged"
+    directory.mkdir()
+    expected = tile.tile_pyramid(cdl_zip, directory, [500, 250], stage=False)
+    for size, paths in groups.items():
+        assert [path.name for path in paths] == [path.name for path in expected[size]]
+        for path, expected_path in zip(paths, expected[size]):
+            assert path.read_bytes() == expected_path.read_bytes()
@@ -1,6 +1,18 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+import pytest
+import rasterio
+import rasterio.shutil
+import rasterio.windows
+from rasterio import MemoryFile
 
 from stactools.usda_cdl import tile
+from stactools.usda_cdl.manifest import Manifest, checksum, merge
+from stactools.usda_cdl.metadata import Metadata
 
 
 def test_tile_cdl(cdl: Path, tmp_path: Path) -> None:
@@ -43,3 +55,354 @@ def test_tile_soybeans(soybeans: Path, tmp_path: Path) -> None:
 def test_tile_wheat(wheat: Path, tmp_path: Path) -> None:
     paths = tile.tile_geotiff(wheat, tmp_path, 500)
     assert len(paths) == 4
+
+
+def test_reader_pool(cdl: Path) -> None:
+    with tile.ReaderPool(str(cdl)) as pool:
+        dataset = pool.get()
+        assert pool.get() is dataset
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            other = executor.submit(pool.get).result()
+        assert other is not dataset
+    assert dataset.closed
+    assert other.closed
+
+
+def test_tile_cdl_process_engine(cdl: Path, tmp_path: Path) -> None:
+    paths = tile.tile_geotiff(
+        cdl,
+        tmp_path,
+        500,
+        max_workers=2,
+        existing_tiles=["2021_30m_cdls_-91095_1807575_15000.tif"],
+        engine=tile.Engine.Process,
+    )
+    assert [path.name for path in paths] == [
+        "2021_30m_cdls_-106095_1822575_15000.tif",
+        "2021_30m_cdls_-91095_1822575_15000.tif",
+        "2021_30m_cdls_-106095_1807575_15000.tif",
+    ]
+
+
+def test_prune_empty_windows(cdl: Path, tmp_path: Path) -> None:
+    sparse = tmp_path / "sparse" / "2021_30m_cdls.tif"
+    sparse.parent.mkdir()
+    with rasterio.open(cdl) as dataset:
+        profile = dataset.profile
+        profile.update(sparse_ok=True, tiled=True, blockxsize=256, blockysize=256)
+        window = rasterio.windows.Window(0, 0, 256, 256)
+        with rasterio.open(sparse, "w", **profile) as sparse_dataset:
+            sparse_dataset.write(dataset.read(1, window=window), 1, window=window)
+    with rasterio.open(sparse) as dataset:
+        windows = tile._create_windows(dataset, 500)
+        assert len(windows) == 6
+        assert tile._prune_empty_windows(dataset, windows) == windows[:1]
+    # Unwritten blocks read as a nonzero nodata value, so they aren't empty
+    with rasterio.open(sparse, "r+") as dataset:
+        dataset.nodata = 255
+    with rasterio.open(sparse) as dataset:
+        assert tile._sparse_block_lookup(dataset) is None
+        inside = [window for window in windows if window.col_off < dataset.width]
+        assert tile._prune_empty_windows(dataset, windows) == inside
+        assert len(inside) == 4
+    with rasterio.open(sparse, "r+") as dataset:
+        dataset.nodata = 0
+    dense = tmp_path / "dense" / "2021_30m_cdls.tif"
+    dense.parent.mkdir()
+    rasterio.shutil.copy(sparse, dense)
+
+    paths = tile.tile_geotiff(sparse, sparse.parent, 500)
+    expected = tile.tile_geotiff(dense, dense.parent, 500)
+    assert [path.name for path in paths] == [path.name for path in expected]
+    assert paths[0].read_bytes() == expected[0].read_bytes()
+
+
+def test_tile_cdl_strip_schedule(cdl: Path, tmp_path: Path) -> None:
+    expected = tile.tile_geotiff(cdl, tmp_path, 500)
+    for engine in tile.Engine:
+        directory = tmp_path / engine.value
+        directory.mkdir()
+        paths = tile.tile_geotiff(
+            cdl, directory, 500, engine=engine, schedule=tile.Schedule.Strip
+        )
+        assert [path.name for path in paths] == [path.name for path in expected]
+        for path, expected_path in zip(paths, expected):
+            assert path.read_bytes() == expected_path.read_bytes()
+
+
+def test_read_ahead_reraises() -> None:
+    def items() -> Iterator[int]:
+        yield 1
+        raise ValueError("boom")
+
+    iterator = tile._read_ahead(items(), 1)
+    assert next(iterator) == 1
+    with pytest.raises(ValueError):
+        next(iterator)
+
+
+@pytest.mark.parametrize(
+    "fixture",
+    ["cdl", "confidence", "cultivated", "corn", "cotton", "soybeans", "wheat"],
+)
+def test_write_cog_matches_memory_file_copy(
+    fixture: str, request: pytest.FixtureRequest, tmp_path: Path
+) -> None:
+    infile = request.getfixturevalue(fixture)
+    metadata = Metadata.from_href(str(infile))
+    with rasterio.open(infile) as dataset:
+        # Big enough for a few overview levels.
+        data = np.tile(dataset.read(1), (3, 3))
+        height, width = data.shape
+        profile = {
+            "driver": "GTiff",
+            "width": width,
+            "height": height,
+            "count": 1,
+            "dtype": "uint8",
+            "transform": dataset.transform,
+            "crs": dataset.crs,
+        }
+        expected = tmp_path / "expected.tif"
+        with MemoryFile() as memory_file:
+            with memory_file.open(**profile) as open_memory_file:
+                open_memory_file.write(data, 1)
+                if metadata.colormap:
+                    open_memory_file.write_colormap(1, metadata.colormap)
+                rasterio.shutil.copy(open_memory_file, expected, **metadata.cog_profile)
+        actual = tmp_path / "actual.tif"
+        tile._write_cog(
+            actual, data, dataset.transform, dataset.crs, metadata, width, height
+        )
+
+    with rasterio.open(expected) as expected_dataset:
+        with rasterio.open(actual) as actual_dataset:
+            assert actual_dataset.profile == expected_dataset.profile
+            assert actual_dataset.overviews(1) == expected_dataset.overviews(1)
+            assert len(actual_dataset.overviews(1)) == 3
+            assert (actual_dataset.read(1) == expected_dataset.read(1)).all()
+            if metadata.colormap:
+                assert actual_dataset.colormap(1) == expected_dataset.colormap(1)
+    for level in range(3):
+        with rasterio.open(expected, overview_level=level) as expected_dataset:
+            with rasterio.open(actual, overview_level=level) as actual_dataset:
+                assert (actual_dataset.read(1) == expected_dataset.read(1)).all()
+
+
+def test_tile_many(
+    cdl: Path,
+    confidence: Path,
+    cultivated: Path,
+    corn: Path,
+    cotton: Path,
+    soybeans: Path,
+    wheat: Path,
+    tmp_path: Path,
+) -> None:
+    infiles = [corn, cotton, soybeans, wheat, confidence, cultivated, cdl]
+    groups = tile.tile_many(infiles, tmp_path, 500)
+    assert len(groups) == 12
+    assert [path.name for path in groups["cropland_2021_-91095_1807575_15000"]] == [
+        "2021_30m_cdls_-91095_1807575_15000.tif",
+        "2021_30m_confidence_layer_-91095_1807575_15000.tif",
+    ]
+    assert len(groups["frequency_2008-2021_-91095_1807575_15000"]) == 4
+    assert len(groups["cultivated_2021_-91095_1807575_15000"]) == 1
+
+    (tmp_path / "corn").mkdir()
+    expected = tile.tile_geotiff(corn, tmp_path / "corn", 500)
+    paths = [path for paths in groups.values() for path in paths]
+    for expected_path in expected:
+        (path,) = [path for path in paths if path.name == expected_path.name]
+        assert path.read_bytes() == expected_path.read_bytes()
+
+
+def test_tile_cdl_resume(cdl: Path, tmp_path: Path) -> None:
+    paths = tile.tile_geotiff(cdl, tmp_path, 500)
+    assert len(paths) == 4
+    manifest = Manifest.for_stem(tmp_path, "2021_30m_cdls")
+    assert set(manifest.completed) == set(path.name for path in paths)
+    assert manifest.completed[paths[0].name] == checksum(paths[0])
+    assert not list(tmp_path.glob("*.part"))
+
+    # A truncated tile that isn't in the manifest gets rewritten
+    del manifest.completed[paths[0].name]
+    manifest.save()
+    expected = paths[0].read_bytes()
+    paths[0].write_bytes(expected[:100])
+    assert tile.tile_geotiff(cdl, tmp_path, 500) == paths[:1]
+    assert paths[0].read_bytes() == expected
+
+    assert tile.tile_geotiff(cdl, tmp_path, 500) == []
+    assert len(tile.tile_geotiff(cdl, tmp_path, 500, resume=False)) == 4
+
+
+def test_tile_cdl_shards(cdl: Path, tmp_path: Path) -> None:
+    paths = list()
+    for shard_index in range(3):
+        paths.extend(
+            tile.tile_geotiff(
+                cdl, tmp_path, 500, shard_index=shard_index, shard_count=3
+            )
+        )
+    assert len(paths) == 4
+    assert len(set(paths)) == 4
+    manifests = [
+        Manifest.for_stem(tmp_path, "2021_30m_cdls", shard_index, 3)
+        for shard_index in range(3)
+    ]
+    merged = merge(manifests, tmp_path / "2021_30m_cdls.manifest.json")
+    assert len(merged.windows) == 6
+    assert set(merged.completed) == set(path.name for path in paths)
+    assert len(merged.empty) == 2
+
+
+def test_tile_cdl_strip_schedule_shards(cdl: Path, tmp_path: Path) -> None:
+    for shard_index in range(2):
+        tile.tile_geotiff(
+            cdl,
+            tmp_path,
+            500,
+            shard_index=shard_index,
+            shard_count=2,
+            schedule=tile.Schedule.Strip,
+        )
+    manifests = [
+        Manifest.for_stem(tmp_path, "2021_30m_cdls", shard_index, 2)
+        for shard_index in range(2)
+    ]
+    # Each shard gets whole strips, i.e. rows of windows
+    for manifest in manifests:
+        assert len(manifest.windows) == 3
+        assert len(set(name.split("_")[-2] for name in manifest.windows)) == 1
+    merged = merge(manifests, tmp_path / "2021_30m_cdls.manifest.json")
+    assert len(merged.completed) == 4
+
+
+def test_tile_many_shards(cdl: Path, confidence: Path, tmp_path: Path) -> None:
+    paths: List[Path] = list()
+    for shard_index in range(3):
+        groups = tile.tile_many(
+            [cdl, confidence],
+            tmp_path,
+            500,
+            shard_index=shard_index,
+            shard_count=3,
+        )
+        paths.extend(path for paths in groups.values() for path in paths)
+    assert len(paths) == 8
+    for stem in ["2021_30m_cdls", "2021_30m_confidence_layer"]:
+        manifests = [
+            Manifest.for_stem(tmp_path, stem, shard_index, 3)
+            for shard_index in range(3)
+        ]
+        merged = merge(manifests, tmp_path / f"{stem}.manifest.json")
+        assert len(merged.windows) == 6
+        assert len(merged.completed) == 4
+        assert len(merged.empty) == 2
+
+
+def test_tile_cdl_invalid_shard(cdl: Path, tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        tile.tile_geotiff(cdl, tmp_path, 500, shard_index=2, shard_count=2)
+
+
+def test_tile_pyramid(cdl: Path, tmp_path: Path) -> None:
+    groups = tile.tile_pyramid(cdl, tmp_path, [500, 250])
+    assert sorted(groups) == [250, 500]
+    assert len(groups[500]) == 4
+    assert len(groups[250]) == 16
+
+    for size, paths in groups.items():
+        directory = tmp_path / str(size)
+        directory.mkdir()
+        expected = tile.tile_geotiff(cdl, directory, size)
+        assert [path.name for path in paths] == [path.name for path in expected]
+        for path, expected_path in zip(paths, expected):
+            assert path.read_bytes() == expected_path.read_bytes()
+
+    assert tile.tile_pyramid(cdl, tmp_path, [500, 250]) == {250: [], 500: []}
+
+
+def test_tile_pyramid_sizes_must_nest(cdl: Path, tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        tile.tile_pyramid(cdl, tmp_path, [500, 300])
+
+
+def test_constant_value() -> None:
+    assert tile._constant_value(np.full((10, 10), 5, dtype=np.uint8)) == 5
+    data = np.full((10, 10), 5, dtype=np.uint8)
+    data[5, 5] = 6
+    assert tile._constant_value(data) is None
+    data[5, 5] = 5
+    data[-1, -1] = 6
+    assert tile._constant_value(data) is None
+
+
+@pytest.fixture
+def constant_cdl(cdl: Path, tmp_path: Path) -> Path:
+    path = tmp_path / "source" / cdl.name
+    path.parent.mkdir()
+    with rasterio.open(cdl) as dataset:
+        data = dataset.read(1)
+        profile = dataset.profile
+    data[:500, :500] = 1
+    with rasterio.open(path, "w", **profile) as dataset:
+        dataset.write(data, 1)
+    return path
+
+
+@pytest.mark.parametrize("mode", [tile.ConstantTiles.Fast, tile.ConstantTiles.Index])
+def test_tile_constant_tiles(
+    constant_cdl: Path, tmp_path: Path, mode: tile.ConstantTiles
+) -> None:
+    expected = tile.tile_geotiff(constant_cdl, tmp_path, 500)
+    directory = tmp_path / str(mode)
+    directory.mkdir()
+    paths = tile.tile_geotiff(constant_cdl, directory, 500, constant_tiles=mode)
+    manifest = Manifest.for_stem(directory, "2021_30m_cdls")
+    constant = expected[0]
+    if mode == tile.ConstantTiles.Index:
+        assert [path.name for path in paths] == [path.name for path in expected[1:]]
+        assert manifest.constant == {constant.name: 1}
+        assert not (directory / constant.name).exists()
+        assert tile.tile_geotiff(constant_cdl, directory, 500) == []
+    else:
+        assert [path.name for path in paths] == [path.name for path in expected]
+        assert manifest.constant == {}
+        assert paths[1:] and all(
+            path.read_bytes() == expected_path.read_bytes()
+            for path, expected_path in zip(paths[1:], expected[1:])
+        )
+        with rasterio.open(constant) as expected_dataset:
+            with rasterio.open(paths[0]) as dataset:
+                assert dataset.profile == expected_dataset.profile
+                assert (dataset.read(1) == expected_dataset.read(1)).all()
+
+
+def test_tile_many_constant_tiles(
+    constant_cdl: Path, tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    with caplog.at_level(logging.INFO, logger="stactools.usda_cdl.tile"):
+        tile.tile_many(
+            [constant_cdl], tmp_path, 500, constant_tiles=tile.ConstantTiles.Fast
+        )
+    assert "1 constant tiles took the fast path" in caplog.text
+
+
+def test_write_cog_fast_matches_for_constant_data(cdl: Path, tmp_path: Path) -> None:
+    metadata = Metadata.from_href(str(cdl))
+    data = np.full((2000, 2000), 5, dtype=np.uint8)
+    with rasterio.open(cdl) as dataset:
+        args = (data, dataset.transform, dataset.crs, metadata, 2000, 2000)
+    tile._write_cog(tmp_path / "expected.tif", *args)
+    tile._write_cog(tmp_path / "actual.tif", *args, fast=True)
+    for level in range(2):
+        with rasterio.open(
+            tmp_path / "expected.tif", overview_level=level
+        ) as expected_dataset:
+            with rasterio.open(
+                tmp_path / "actual.tif", overview_level=level
+            ) as dataset:
+                assert dataset.profile == expected_dataset.profile
+                assert (dataset.read(1) == expected_dataset.read(1)).all()
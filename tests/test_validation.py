@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pystac
+import pytest
+from pystac.stac_io import DefaultStacIO
+from pystac.validation import RegisteredValidator
+
+from stactools.usda_cdl import stac, validation
+from stactools.usda_cdl.constants import CLASSIFICATION_SCHEMA
+
+
+def fake_schema(uri: str) -> Dict[str, Any]:
+    schema: Dict[str, Any] = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "$id": uri,
+        "type": "object",
+    }
+    if uri == CLASSIFICATION_SCHEMA:
+        schema["allOf"] = [{"$ref": "./definitions.json"}]
+    return schema
+
+
+@pytest.fixture
+def schema_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    fetched: List[str] = list()
+
+    class FakeStacIO(DefaultStacIO):
+        def read_text(self, source: Any, *args: Any, **kwargs: Any) -> str:
+            fetched.append(str(source))
+            return json.dumps(fake_schema(str(source)))
+
+    monkeypatch.setattr(pystac.StacIO, "default", lambda: FakeStacIO())
+    path = tmp_path / "schemas.json"
+    uris = validation.cache_schemas(path)
+    assert uris == sorted(fetched)
+    assert (
+        "https://stac-extensions.github.io/classification/v1.1.0/definitions.json"
+        in uris
+    )
+    monkeypatch.undo()
+    return path
+
+
+@pytest.fixture
+def registered_validator() -> Iterator[None]:
+    previous = RegisteredValidator._validator
+    yield
+    RegisteredValidator._validator = previous
+
+
+@pytest.fixture
+def item_dicts(tiles: List[Path]) -> List[Dict[str, Any]]:
+    hrefs = [str(tile) for tile in tiles]
+    return [item.to_dict() for item in stac.create_items_from_tiles(hrefs)]
+
+
+def test_cache_schemas_skips_bundled_schemas(schema_cache: Path) -> None:
+    with open(schema_cache) as f:
+        schemas = json.load(f)
+    assert CLASSIFICATION_SCHEMA in schemas
+    assert not any(uri.startswith("https://schemas.stacspec.org") for uri in schemas)
+
+
+def test_use_schema_cache(
+    cdl_tile: Path, schema_cache: Path, registered_validator: None
+) -> None:
+    validation.use_schema_cache(schema_cache)
+    stac.create_item(str(cdl_tile)).validate()
+    stac.create_collection().validate()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_validate_dicts(
+    item_dicts: List[Dict[str, Any]], schema_cache: Path, max_workers: int
+) -> None:
+    item_dicts[1]["bbox"] = "not a bbox"
+    del item_dicts[2]["properties"]["datetime"]
+    report = validation.validate_dicts(
+        item_dicts, schema_cache, max_workers=max_workers, batch_size=2
+    )
+    assert report.count == len(item_dicts)
+    assert not report.ok
+    ids = [failure.id for failure in report.failures if failure.id is not None]
+    assert sorted(ids) == sorted([item_dicts[1]["id"], item_dicts[2]["id"]])
+    assert sum(count for *_, count in report.summary()) == 2
+    assert all(
+        failure.schema_uri
+        == "https://schemas.stacspec.org/v1.1.0/item-spec/json-schema/item.json"
+        for failure in report.failures
+    )
+
+
+def test_validate_dicts_reports_malformed_objects(
+    item_dicts: List[Dict[str, Any]],
+    schema_cache: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    class UnreachableStacIO(DefaultStacIO):
+        def read_text(self, source: Any, *args: Any, **kwargs: Any) -> str:
+            raise OSError(f"Can't reach {source}")
+
+    monkeypatch.setattr(pystac.StacIO, "default", lambda: UnreachableStacIO())
+    missing_schema = "https://example.com/missing/v1.0.0/schema.json"
+    item_dicts[1]["stac_extensions"].append(missing_schema)
+    stac_dicts = [{"id": "no-type"}] + item_dicts
+    report = validation.validate_dicts(stac_dicts, schema_cache)
+    assert report.count == len(stac_dicts)
+    assert [(failure.id, failure.schema_uri) for failure in report.failures] == [
+        ("no-type", ""),
+        (item_dicts[1]["id"], missing_schema),
+    ]
+
+
+def test_validate_ndjson(
+    item_dicts: List[Dict[str, Any]], schema_cache: Path, tmp_path: Path
+) -> None:
+    path = tmp_path / "items.ndjson"
+    path.write_text("".join(json.dumps(d) + "\n" for d in item_dicts))
+    report = validation.validate_ndjson(path, schema_cache)
+    assert report.ok
+    assert report.count == len(item_dicts)
+
+
+def test_validate_dicts_invalid_batch_size() -> None:
+    with pytest.raises(ValueError):
+        validation.validate_dicts([], batch_size=0)
+
+
+def test_cached_validator_compiles_once(
+    item_dicts: List[Dict[str, Any]], schema_cache: Path
+) -> None:
+    validator = validation.CachedValidator.from_file(schema_cache)
+    for item_dict in item_dicts:
+        pystac.validation.validate_dict(item_dict, validator=validator)
+    assert len(validator._validators) == 4